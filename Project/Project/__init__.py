@@ -0,0 +1,4 @@
+# load celery with django so shared tasks use this app
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
@@ -0,0 +1,25 @@
+import logging
+import os
+from celery import Celery
+from kombu.exceptions import OperationalError
+
+# celery app for background work such as plaid syncing
+# - worker: celery -A Project worker
+# - schedule: celery -A Project beat
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Project.settings')
+
+app = Celery('Project')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+logger = logging.getLogger(__name__)
+
+# queue a task, False when the broker cannot be reached
+# - request handlers use this so a broker outage does not fail work they have already saved
+def enqueue(task, args=(), kwargs=None, **options):
+    try:
+        task.apply_async(args, kwargs, **options)
+        return True
+    except OperationalError as e:
+        logger.warning("Could not queue %s: %s", task.name, e)
+        return False
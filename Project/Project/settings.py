@@ -1,3 +1,5 @@
+from datetime import timedelta
+from celery.schedules import crontab
 from pathlib import Path
 import os
 import environ
@@ -15,6 +17,13 @@ SECRET_KEY = env('SECRET_KEY')
 
 FIELD_ENCRYPTION_KEY = env("FIELD_ENCRYPTION_KEY")
 
+# key for blind indexes on encrypted columns (falls back to FIELD_ENCRYPTION_KEY)
+BLIND_INDEX_KEY = env("BLIND_INDEX_KEY", default=None)
+
+# pack a transaction's encrypted fields into one envelope per row
+# - existing rows are converted with `manage.py convert_transaction_storage`
+ENVELOPE_ENCRYPTION = env.bool("ENVELOPE_ENCRYPTION", default=False)
+
 # configure testing
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
 
@@ -41,6 +50,74 @@ PLAID_SECRET = env('PLAID_SECRET')
 PLAID_ENV = env('PLAID_ENV')
 PLAID_REDIRECT_URI = 'http://localhost:8000'
 
+# plaid http client, timeouts in seconds
+PLAID_CONNECT_TIMEOUT = env.float('PLAID_CONNECT_TIMEOUT', default=5.0)
+PLAID_READ_TIMEOUT = env.float('PLAID_READ_TIMEOUT', default=30.0)
+PLAID_POOL_SIZE = env.int('PLAID_POOL_SIZE', default=10)
+PLAID_MAX_RETRIES = env.int('PLAID_MAX_RETRIES', default=3)
+PLAID_RETRY_BACKOFF = env.float('PLAID_RETRY_BACKOFF', default=0.5)
+PLAID_RETRY_MAX_BACKOFF = env.float('PLAID_RETRY_MAX_BACKOFF', default=10.0)
+PLAID_REQUESTS_PER_SECOND = env.float('PLAID_REQUESTS_PER_SECOND', default=0) # shared through the cache, 0 for no limit
+
+# plaid webhooks, PLAID_WEBHOOK_URL is registered on new link tokens when set
+PLAID_WEBHOOK_URL = env('PLAID_WEBHOOK_URL', default=None)
+PLAID_WEBHOOK_VERIFY = env.bool('PLAID_WEBHOOK_VERIFY', default=True)
+PLAID_WEBHOOK_COALESCE_SECONDS = env.int('PLAID_WEBHOOK_COALESCE_SECONDS', default=30)
+PLAID_WEBHOOK_KEY_LOOKUPS_PER_MINUTE = env.int('PLAID_WEBHOOK_KEY_LOOKUPS_PER_MINUTE', default=10)
+
+# shared cache for webhook coalescing, plaid keys & plaid rate limits, use redis in production
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# background plaid syncing with celery
+# - CELERY_TASK_ALWAYS_EAGER runs tasks in process (with CELERY_BROKER_URL=memory:// for tests)
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+CELERY_TASK_ALWAYS_EAGER = env.bool('CELERY_TASK_ALWAYS_EAGER', default=False)
+CELERY_TASK_EAGER_PROPAGATES = True
+PLAID_SYNC_INTERVAL_MINUTES = env.int('PLAID_SYNC_INTERVAL_MINUTES', default=30)
+
+# publishing gives up within a few seconds when the broker is down, requests then
+# answer without queueing instead of hanging (see Project.celery.enqueue)
+CELERY_BROKER_CONNECTION_TIMEOUT = env.float('CELERY_BROKER_CONNECTION_TIMEOUT', default=2)
+CELERY_BROKER_CONNECTION_RETRY = True
+CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+CELERY_BROKER_TRANSPORT_OPTIONS = {'socket_connect_timeout': CELERY_BROKER_CONNECTION_TIMEOUT}
+CELERY_TASK_PUBLISH_RETRY_POLICY = {'max_retries': 1, 'interval_start': 0, 'interval_step': 0.2, 'interval_max': 0.5}
+
+# single-flight syncing, in seconds
+# - syncs finished within the freshness window are reused instead of rerun
+# - the sync lease on an item lasts PLAID_SYNC_LOCK_TIMEOUT & is renewed after every page
+PLAID_SYNC_FRESHNESS_SECONDS = env.int('PLAID_SYNC_FRESHNESS_SECONDS', default=60)
+PLAID_SYNC_LOCK_TIMEOUT = env.int('PLAID_SYNC_LOCK_TIMEOUT', default=300)
+# a forced sync that finds one running is queued again after this long
+PLAID_SYNC_RETRY_SECONDS = env.int('PLAID_SYNC_RETRY_SECONDS', default=30)
+
+# transactions fetched & written per page, plaid allows up to 500
+PLAID_SYNC_BATCH_SIZE = env.int('PLAID_SYNC_BATCH_SIZE', default=500)
+
+# linked items of one user are synced on up to this many threads
+PLAID_ITEM_WORKERS = env.int('PLAID_ITEM_WORKERS', default=4)
+# hour of the nightly balance refresh, & the fleet sync's pool & plaid rate
+PLAID_FLEET_SYNC_HOUR = env.int('PLAID_FLEET_SYNC_HOUR', default=2)
+PLAID_FLEET_WORKERS = env.int('PLAID_FLEET_WORKERS', default=16)
+PLAID_FLEET_REQUESTS_PER_SECOND = env.float('PLAID_FLEET_REQUESTS_PER_SECOND', default=10) # shared by every fleet worker through the cache
+
+# one scheduled sync path, the rate limited fleet sync of items not synced within the interval
+# - a run left queued past the next one expires instead of piling up
+CELERY_BEAT_SCHEDULE = {
+    'sync-fleet': {
+        'task': 'transactions.tasks.sync_fleet',
+        'schedule': timedelta(minutes=PLAID_SYNC_INTERVAL_MINUTES),
+        'kwargs': {'since_minutes': PLAID_SYNC_INTERVAL_MINUTES},
+        'options': {'expires': PLAID_SYNC_INTERVAL_MINUTES * 60},
+    },
+    'refresh-balances': {
+        'task': 'banking.tasks.refresh_all_balances',
+        'schedule': crontab(hour=PLAID_FLEET_SYNC_HOUR, minute=30),
+    },
+}
+
 # Including logging
 LOGGING = {
     'version': 1,
@@ -9,7 +9,6 @@ class CustomUserAdmin(UserAdmin):
     fieldsets = (
         (None, {'fields': ('email', 'username', 'password')}),
         ('Permissions', {'fields': ('is_staff', 'is_active', 'is_superuser', 'groups', 'user_permissions')}),
-        ('Plaid', {'fields': ('plaid_access_token',)}),
     )
     add_fieldsets = (
         (None, {
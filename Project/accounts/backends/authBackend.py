@@ -6,11 +6,16 @@ class EncryptedEmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         UserModel = get_user_model()
         email = kwargs.get('email', username)
+        if email is None or password is None:
+            return None
 
-        # loop through users & find matching email
-        try:
-            for user in UserModel.objects.all():
-                if user.email == email and user.check_password(password):
-                    return user
-        except UserModel.DoesNotExist:
+        # find matching email through the blind index
+        user = UserModel.objects.get_by_email(email)
+        if user is None:
+            # hash anyway so a missing user takes as long as a wrong password
+            UserModel().set_password(password)
             return None
+
+        if user.check_password(password):
+            return user
+        return None
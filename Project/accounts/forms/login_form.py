@@ -20,12 +20,8 @@ class LoginForm(forms.Form):
 
         # find user details
         if email and password:
-            found_user = None
-            for user in CustomUser.objects.all():
-                if user.email.lower() == email.lower():
-                    found_user = user
-                    break
-            
+            found_user = CustomUser.objects.get_by_email(email)
+
             if not found_user:
                 raise forms.ValidationError("Invalid email or password.")
             
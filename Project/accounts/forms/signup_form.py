@@ -36,20 +36,18 @@ class SignupForm(UserCreationForm):
         - Password must include at least one special character (!@#$%^&*.)
         - Password cannot be the same as your username or email"""
 
-    # fetch users and check if username exists  
+    # check if username exists
     def clean_username(self):
         username = self.cleaned_data.get('username')
-        for user in CustomUser.objects.all():
-            if user.username.lower() == username.lower():
-                raise ValidationError("This username is already taken. Please choose another one.")
+        if CustomUser.objects.username_taken(username):
+            raise ValidationError("This username is already taken. Please choose another one.")
         return username
 
-    # fetch users and check if email exists
+    # check if email exists
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        for user in CustomUser.objects.all():
-            if user.email.lower() == email.lower():
-                raise ValidationError("This email is already taken. Please use a different email.")
+        if CustomUser.objects.email_taken(email):
+            raise ValidationError("This email is already taken. Please use a different email.")
         return email
 
     # password checks
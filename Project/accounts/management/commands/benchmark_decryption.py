@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from encrypted_model_fields.fields import EncryptedCharField, encrypt_str
+from accounts.utils.bulk_decrypt import decrypt_column
+
+# compare per-field decryption with the bulk decryption path
+# - runs in memory so no database rows are created
+class Command(BaseCommand):
+    help = "Benchmark per-field decryption against bulk decrypt_column."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--columns', type=int, default=3, help="Encrypted columns per row.")
+
+    def handle(self, *args, **options):
+        cells = options['rows'] * options['columns']
+        self.stdout.write(f"Encrypting {cells} cells...")
+        tokens = [encrypt_str(f"value {i}").decode('utf-8') for i in range(cells)]
+
+        # current path: each field decrypts its own value
+        field = EncryptedCharField(max_length=255)
+        start = time.perf_counter()
+        expected = [field.from_db_value(token, None, None) for token in tokens]
+        baseline = time.perf_counter() - start
+        self.stdout.write(f"per-field          {baseline:8.3f}s")
+
+        # bulk path, one set of keys for the whole column
+        start = time.perf_counter()
+        values = decrypt_column(tokens)
+        elapsed = time.perf_counter() - start
+        if values != expected:
+            self.stderr.write(self.style.ERROR("bulk returned different values"))
+            return
+        self.stdout.write(f"bulk               {elapsed:8.3f}s  ({baseline / elapsed:.2f}x)")
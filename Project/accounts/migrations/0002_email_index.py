@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:55
+
+from django.db import migrations, models
+from accounts.utils.blind_index import blind_index, normalize_email
+
+
+# fill the email blind index for existing users
+def backfill_email_index(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    users = list(CustomUser.objects.all())
+    for user in users:
+        user.email_index = blind_index(normalize_email(user.email))
+    CustomUser.objects.bulk_update(users, ['email_index'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='email_index',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_email_index, migrations.RunPython.noop),
+    ]
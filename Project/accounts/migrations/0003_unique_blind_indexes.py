@@ -0,0 +1,39 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:56
+
+from django.db import migrations, models
+from accounts.utils.blind_index import blind_index, normalize_username
+
+
+# fill the username blind index for existing users
+def backfill_username_index(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    users = list(CustomUser.objects.all())
+    for user in users:
+        user.username_index = blind_index(normalize_username(user.username), 'username')
+    CustomUser.objects.bulk_update(users, ['username_index'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_email_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='username_index',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_username_index, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='customuser',
+            name='username_index',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='email_index',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
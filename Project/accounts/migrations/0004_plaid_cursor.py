@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_unique_blind_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='plaid_cursor',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_plaid_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='plaid_last_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
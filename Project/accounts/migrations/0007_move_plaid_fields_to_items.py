@@ -0,0 +1,34 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:11
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_plaid_item_id'),
+        ('banking', '0003_plaiditem'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='plaid_access_token',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='plaid_cursor',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='plaid_item_error',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='plaid_item_id',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='plaid_last_synced_at',
+        ),
+    ]
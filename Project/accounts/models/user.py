@@ -2,6 +2,7 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from encrypted_model_fields.fields import EncryptedTextField
+from accounts.utils.blind_index import blind_index, normalize_email, normalize_username
 
 # Class to manage users and superusers
 # - Allow for user details to be entered and validated
@@ -44,6 +45,32 @@ class CustomUserManager(BaseUserManager):
 
         return self.create_user(username, email, password, **extra_fields)
 
+    # find a user by email with one indexed query
+    # - decrypts at most one row instead of scanning the table
+    def get_by_email(self, email):
+        return self.filter(email_index=blind_index(normalize_email(email))).first()
+
+    # check if an email is already registered, optionally ignoring one user
+    def email_taken(self, email, exclude_id=None):
+        users = self.filter(email_index=blind_index(normalize_email(email)))
+        if exclude_id is not None:
+            users = users.exclude(id=exclude_id)
+        return users.exists()
+
+    # check if a username is already registered (case insensitive)
+    def username_taken(self, username, exclude_id=None):
+        users = self.filter(username_index=blind_index(normalize_username(username), 'username'))
+        if exclude_id is not None:
+            users = users.exclude(id=exclude_id)
+        return users.exists()
+
+    # used by django auth, email is encrypted so go through the index
+    def get_by_natural_key(self, email):
+        user = self.get_by_email(email)
+        if user is None:
+            raise self.model.DoesNotExist
+        return user
+
 # Defining User class
 # - Accepts user inputs
 # - Sets required fields
@@ -52,12 +79,13 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     # User data
     username = EncryptedTextField(_("Username"), max_length=150, unique=True)
     email = EncryptedTextField(_("Email Address"), unique=True)
+    username_index = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    email_index = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     password = models.CharField(_("Password"), max_length=255)
     date_joined = models.DateTimeField(auto_now_add=True)
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     is_verified = models.BooleanField(default=True)
-    plaid_access_token = EncryptedTextField(max_length=255, null=True, blank=True)
 
     # Custom manager
     objects = CustomUserManager()
@@ -66,6 +94,25 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    # keep the blind indexes in step with the encrypted username & email
+    def save(self, *args, **kwargs):
+        self.username_index = blind_index(normalize_username(self.username), 'username')
+        self.email_index = blind_index(normalize_email(self.email))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'username' in update_fields:
+                update_fields.add('username_index')
+            if 'email' in update_fields:
+                update_fields.add('email_index')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+    # linked banks live in banking.PlaidItem
+    @property
+    def has_linked_bank(self):
+        return self.plaid_items.exists()
+
     def __str__(self):
         return self.email
 
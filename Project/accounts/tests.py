@@ -0,0 +1,130 @@
+import json
+from datetime import date
+from cryptography.fernet import Fernet
+from django.contrib.auth import authenticate
+from django.core import mail
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from encrypted_model_fields.fields import encrypt_str
+from accounts.forms.signup_form import SignupForm
+from accounts.models import CustomUser
+from accounts.utils.blind_index import blind_index
+from accounts.utils.bulk_decrypt import decrypt_column
+from banking.models import BankAccount
+from transactions.models import Transaction
+
+
+# users are found by the blind index of their normalised email, nothing is decrypted to search
+class EmailLookupTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'Saver@Example.com', 'Password1!')
+
+    def test_email_is_indexed_normalised(self):
+        self.assertEqual(
+            CustomUser.objects.filter(id=self.user.id).values_list('email_index', flat=True).get(),
+            blind_index('saver@example.com'),
+        )
+
+    def test_lookup_is_one_indexed_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(CustomUser.objects.get_by_email('  SAVER@example.COM '), self.user)
+        self.assertIsNone(CustomUser.objects.get_by_email('other@example.com'))
+
+    def test_index_follows_an_email_change(self):
+        self.user.email = 'new@example.com'
+        self.user.save(update_fields=['email'])
+        self.assertIsNone(CustomUser.objects.get_by_email('saver@example.com'))
+        self.assertEqual(CustomUser.objects.get_by_email('new@example.com'), self.user)
+
+    def test_authenticate(self):
+        self.assertEqual(authenticate(username='saver@example.com', password='Password1!'), self.user)
+        self.assertIsNone(authenticate(username='saver@example.com', password='wrong'))
+        self.assertIsNone(authenticate(username='nobody@example.com', password='Password1!'))
+
+    def test_login_sends_a_code(self):
+        response = self.client.post('/login/', {'email': 'SAVER@example.com', 'password': 'Password1!'})
+        self.assertRedirects(response, '/verify-2fa/', fetch_redirect_response=False)
+        self.assertEqual(self.client.session['pending_user_id'], self.user.id)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+# usernames & emails are unique ignoring case, checked & enforced through their blind indexes
+class UniquenessTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('Saver', 'saver@example.com', 'Password1!')
+        self.other = CustomUser.objects.create_user('other', 'other@example.com', 'Password1!')
+
+    def test_taken_ignores_case(self):
+        self.assertTrue(CustomUser.objects.username_taken(' sAVER '))
+        self.assertTrue(CustomUser.objects.email_taken('SAVER@example.com'))
+        self.assertFalse(CustomUser.objects.username_taken('saver', exclude_id=self.user.id))
+        self.assertFalse(CustomUser.objects.email_taken('saver@example.com', exclude_id=self.user.id))
+
+    def test_database_rejects_duplicates(self):
+        for username, email in (('SAVER', 'new@example.com'), ('new', 'Saver@Example.com')):
+            with self.subTest(username=username, email=email):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    CustomUser.objects.create_user(username, email, 'Password1!')
+
+    def test_signup_rejects_taken_details(self):
+        form = SignupForm({
+            'username': 'saver', 'email': 'OTHER@example.com', 'password1': 'Sturdy9!pass', 'password2': 'Sturdy9!pass',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertEqual(set(form.errors), {'username', 'email'})
+
+    def edit(self, **data):
+        self.client.force_login(self.user)
+        body = {'username': 'Saver', 'email': 'saver@example.com', 'current_password': 'Password1!', **data}
+        return self.client.post(f'/edit-user/{self.user.id}/', data=json.dumps(body), content_type='application/json')
+
+    def test_profile_edit(self):
+        self.assertEqual(self.edit(username='OTHER').json(), {'error': 'Username already exists.'})
+        self.assertEqual(self.edit(email='Other@Example.com').json(), {'error': 'Email already exists.'})
+        # keeping your own details, in any case, is not a clash
+        self.assertEqual(self.edit(username='saver').json(), {'success': True})
+
+
+# columns decrypted together, as decrypted_values reads them
+class BulkDecryptTests(TestCase):
+
+    def test_decrypt_column(self):
+        tokens = [encrypt_str(value).decode('utf-8') for value in ('one', 'two', 'ü')]
+        self.assertEqual(decrypt_column(tokens + [None, 'not a token']), ['one', 'two', 'ü', None, 'not a token'])
+
+    def test_rotated_keys(self):
+        old, new = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+        token = Fernet(old).encrypt(b'before rotation').decode()
+        with override_settings(FIELD_ENCRYPTION_KEY=[new, old]):
+            self.assertEqual(decrypt_column([token, Fernet(new).encrypt(b'after').decode()]), ['before rotation', 'after'])
+        with override_settings(FIELD_ENCRYPTION_KEY=new):
+            # unreadable tokens come back as stored, as the field does
+            self.assertEqual(decrypt_column([token]), [token])
+
+    def test_decrypted_values_reads_both_layouts(self):
+        user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        account = BankAccount.objects.create(
+            user=user, bank_name='Bank', account_name='Current', account_id='acc-1', account_type='checking'
+        )
+        for transaction_id, enveloped in (('t1', False), ('t2', True)):
+            with override_settings(ENVELOPE_ENCRYPTION=enveloped):
+                Transaction.objects.create(
+                    user=user, bank_account=account, name=f'Shop {transaction_id}', amount='-5.00', date=date(2024, 1, 5),
+                    category='Food', is_received=False, transaction_id=transaction_id,
+                )
+
+        # the enveloped row keeps nothing in its own columns
+        raw = dict(Transaction.objects.values_list('transaction_id', 'envelope'))
+        self.assertIsNone(raw['t1'])
+        self.assertIsNotNone(raw['t2'])
+
+        rows = Transaction.objects.order_by('transaction_id').decrypted_values(
+            'transaction_id', 'name', 'amount', 'category', 'bank_account__account_name'
+        )
+        self.assertEqual(rows, [
+            {'transaction_id': transaction_id, 'name': f'Shop {transaction_id}', 'amount': '-5.00',
+             'category': 'Food', 'bank_account__account_name': 'Current'}
+            for transaction_id in ('t1', 't2')
+        ])
@@ -0,0 +1,3 @@
+from .blind_index import blind_index, normalize_email, normalize_username
+from .bulk_decrypt import DecryptingQuerySet, decrypt_column
+from .fields import BulkEncryptedCharField, ExpressionSafeMixin
@@ -0,0 +1,27 @@
+import hashlib
+import hmac
+from django.conf import settings
+
+# build the key used for blind indexes
+# - separate from the field encryption key when BLIND_INDEX_KEY is set
+def _index_key():
+    key = getattr(settings, 'BLIND_INDEX_KEY', None) or settings.FIELD_ENCRYPTION_KEY
+    if isinstance(key, (list, tuple)):
+        key = key[0]
+    return key.encode('utf-8') if isinstance(key, str) else key
+
+# normalise emails so lookups are case and whitespace insensitive
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+# usernames are unique regardless of case
+def normalize_username(username):
+    return (username or '').strip().lower()
+
+# keyed hash of a value for equality lookups on encrypted columns
+# - purpose keeps indexes for different columns unlinkable
+def blind_index(value, purpose='email'):
+    if value is None:
+        return None
+    message = f"{purpose}:{value}".encode('utf-8')
+    return hmac.new(_index_key(), message, hashlib.sha256).hexdigest()
@@ -0,0 +1,94 @@
+import json
+import cryptography.fernet
+from django.conf import settings
+from django.db import models
+from django.db.models import ExpressionWrapper, F, TextField
+from encrypted_model_fields.fields import EncryptedMixin
+from accounts.utils.envelope import get_envelope_field, get_sealed_fields
+
+# one MultiFernet over the configured keys, built per call so key changes
+# & rotations in settings are always picked up
+def _fernet():
+    configured = settings.FIELD_ENCRYPTION_KEY
+    if not isinstance(configured, (list, tuple)):
+        configured = [configured]
+    return cryptography.fernet.MultiFernet([cryptography.fernet.Fernet(key) for key in configured])
+
+# decrypt a whole column of Fernet tokens with one set of keys
+# - same rules as the field: None stays None, bad tokens are returned as is
+# - no thread pool, Fernet holds the GIL for most of a short token's work,
+#   see `manage.py benchmark_decryption`
+def decrypt_column(tokens):
+    fernet = _fernet()
+    values = []
+    for token in tokens:
+        if token is None:
+            values.append(None)
+            continue
+        if isinstance(token, str):
+            token = token.encode('utf-8')
+        try:
+            values.append(fernet.decrypt(token).decode('utf-8'))
+        except (cryptography.fernet.InvalidToken, UnicodeDecodeError):
+            values.append(token.decode('utf-8'))
+    return values
+
+# follow a values() lookup such as 'bank_account__account_name' to its field
+def _resolve_field(model, lookup):
+    field = None
+    for part in lookup.split('__'):
+        field = model._meta.get_field(part)
+        if field.is_relation and field.related_model is not None:
+            model = field.related_model
+    return field
+
+# queryset with a values()-style helper that decrypts columns in bulk
+class DecryptingQuerySet(models.QuerySet):
+
+    # like values(), but encrypted columns are read raw and decrypted together
+    # - sealed fields come from the row's envelope when it has one
+    def decrypted_values(self, *fields):
+        raw_columns = {}
+        plain_fields = []
+        for lookup in fields:
+            field = _resolve_field(self.model, lookup)
+            if isinstance(field, EncryptedMixin):
+                raw_columns[f"raw_{len(raw_columns)}"] = lookup
+            else:
+                plain_fields.append(lookup)
+
+        # wrap encrypted columns so the field does not decrypt row by row
+        raw_expressions = {
+            alias: ExpressionWrapper(F(lookup), output_field=TextField())
+            for alias, lookup in raw_columns.items()
+        }
+        envelope = get_envelope_field(self.model)
+        sealed_names = {field.name for field in get_sealed_fields(self.model)}
+        sealed = [lookup for lookup in raw_columns.values() if envelope and lookup in sealed_names]
+        if sealed:
+            raw_expressions['raw_envelope'] = F(envelope.attname)
+
+        rows = list(self.values(*plain_fields, **raw_expressions))
+        if not rows or not raw_columns:
+            return rows
+
+        # decrypt every encrypted cell in one pass
+        aliases = list(raw_columns)
+        tokens = [row[alias] for row in rows for alias in aliases]
+        values = iter(decrypt_column(tokens))
+        for row in rows:
+            for alias in aliases:
+                row.pop(alias)
+                row[raw_columns[alias]] = next(values)
+
+        # one decrypt per enveloped row covers all of its sealed fields
+        if sealed:
+            envelopes = [row.pop('raw_envelope') for row in rows]
+            packed = [(row, token) for row, token in zip(rows, envelopes) if token]
+            opened = decrypt_column(token for _, token in packed)
+            for (row, _), payload in zip(packed, opened):
+                payload = json.loads(payload)
+                for lookup in sealed:
+                    if row[lookup] is None:
+                        row[lookup] = payload.get(lookup)
+        return rows
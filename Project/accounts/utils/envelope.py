@@ -0,0 +1,134 @@
+import json
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+from encrypted_model_fields.fields import EncryptedCharField, EncryptedTextField, decrypt_str, encrypt_str
+from accounts.utils.fields import ExpressionSafeMixin
+
+# Envelope storage
+# - a model's sealed fields can be packed into one encrypted blob per row
+# - one decrypt per row instead of one per field, and one token's overhead
+# - enabled with the ENVELOPE_ENCRYPTION setting, rows written while it is off
+#   keep one ciphertext per column, so both layouts can be read at any time
+
+OPEN_FLAG = '_envelope_open'
+
+def envelope_enabled():
+    return getattr(settings, 'ENVELOPE_ENCRYPTION', False)
+
+# find the envelope column of a model, if it has one
+def get_envelope_field(model):
+    for field in model._meta.concrete_fields:
+        if isinstance(field, EnvelopeField):
+            return field
+    return None
+
+# fields stored inside the envelope
+def get_sealed_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, SealedFieldMixin)]
+
+# unpack an envelope token into a dict of field values
+def open_envelope(token):
+    return json.loads(decrypt_str(token))
+
+# decrypt a row's envelope the first time one of its sealed fields is used
+def unseal(instance):
+    data = instance.__dict__
+    if data.get(OPEN_FLAG):
+        return
+    envelope = get_envelope_field(type(instance))
+    token = data.get(envelope.attname)
+    if not token:
+        return
+
+    values = open_envelope(token)
+    for field in get_sealed_fields(type(instance)):
+        if data.get(field.attname) is None:
+            data[field.attname] = values.get(field.name)
+    data[OPEN_FLAG] = True
+
+# move a loaded row's sealed values into its envelope
+# - returns the fields to pass to bulk_update
+def seal_instance(instance):
+    envelope = get_envelope_field(type(instance))
+    sealed = get_sealed_fields(type(instance))
+    setattr(instance, envelope.attname, envelope.pack(instance))
+    for field in sealed:
+        instance.__dict__[field.attname] = None
+    instance.__dict__[OPEN_FLAG] = True
+    return [field.name for field in sealed] + [envelope.name]
+
+# move a loaded row's envelope back into its own columns
+# - returns the fields to pass to bulk_update
+def unseal_instance(instance):
+    envelope = get_envelope_field(type(instance))
+    sealed = get_sealed_fields(type(instance))
+    unseal(instance)
+    instance.__dict__[envelope.attname] = None
+    return [field.name for field in sealed] + [envelope.name]
+
+# lay a loaded row's sealed values out the way save() would under the current setting
+# - bulk_update & update() skip pre_save, so bulk writers call this instead
+# - returns the fields to pass to bulk_update
+def store_instance(instance):
+    return seal_instance(instance) if envelope_enabled() else unseal_instance(instance)
+
+
+# lazily fills sealed values from the envelope
+class SealedAttribute(DeferredAttribute):
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        unseal(instance)
+        return super().__get__(instance, cls)
+
+    # open first so a new value is not overwritten by the envelope later
+    def __set__(self, instance, value):
+        unseal(instance)
+        instance.__dict__[self.field.attname] = value
+
+
+class SealedFieldMixin(ExpressionSafeMixin):
+    descriptor_class = SealedAttribute
+
+    # the column stays empty when the value goes into the envelope
+    def pre_save(self, model_instance, add):
+        value = super().pre_save(model_instance, add)
+        if envelope_enabled():
+            return None
+        return value
+
+
+class SealedCharField(SealedFieldMixin, EncryptedCharField):
+    pass
+
+
+class SealedTextField(SealedFieldMixin, EncryptedTextField):
+    pass
+
+
+# one encrypted JSON blob holding every sealed field of the row
+# - read raw and only decrypted when a sealed field is used
+class EnvelopeField(models.TextField):
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('null', True)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def pack(self, model_instance):
+        values = {field.name: getattr(model_instance, field.attname) for field in get_sealed_fields(self.model)}
+        return encrypt_str(json.dumps(values, default=str)).decode('utf-8')
+
+    def pre_save(self, model_instance, add):
+        if envelope_enabled():
+            token = self.pack(model_instance)
+            model_instance.__dict__[OPEN_FLAG] = True
+        else:
+            # values are back in their own columns
+            unseal(model_instance)
+            token = None
+        setattr(model_instance, self.attname, token)
+        return token
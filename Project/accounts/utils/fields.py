@@ -0,0 +1,14 @@
+from encrypted_model_fields.fields import EncryptedCharField
+
+# lets bulk_update's CASE expressions through instead of encrypting them as text
+# - the values inside the expression are still encrypted by the field
+class ExpressionSafeMixin:
+
+    def get_db_prep_save(self, value, connection):
+        if hasattr(value, 'as_sql'):
+            return value
+        return super().get_db_prep_save(value, connection)
+
+
+class BulkEncryptedCharField(ExpressionSafeMixin, EncryptedCharField):
+    pass
@@ -17,11 +17,7 @@ def login_view(request):
             password = form.cleaned_data['password']
             
             # find user
-            found_user = None
-            for user in CustomUser.objects.all():
-                if user.email.lower() == email.lower():
-                    found_user = user
-                    break
+            found_user = CustomUser.objects.get_by_email(email)
 
             if not found_user:
                 messages.error(request, "User not found. Please check your email address.")
@@ -14,11 +14,7 @@ def password_reset_request(request):
             email = form.cleaned_data['email'].strip().lower()
 
             # find user
-            found_user = None
-            for user in CustomUser.objects.all():
-                if user.email.lower() == email.lower():
-                    found_user = user
-                    break
+            found_user = CustomUser.objects.get_by_email(email)
             
             if found_user:
                 reset_url = request.build_absolute_uri(
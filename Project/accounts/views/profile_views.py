@@ -1,6 +1,7 @@
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404
@@ -39,23 +40,11 @@ def edit_user(request, user_id):
             return JsonResponse({'error': 'Incorrect current password.'}, status=400)
         
         # check for duplicate username
-        duplicate_username = False
-        for existing_user in CustomUser.objects.exclude(id=user.id):
-            if existing_user.username.lower() == username.lower():
-                duplicate_username = True
-                break
-        
-        if duplicate_username:
+        if CustomUser.objects.username_taken(username, exclude_id=user.id):
             return JsonResponse({'error': 'Username already exists.'}, status=400)
-        
+
         # check for duplicate email
-        duplicate_email = False
-        for existing_user in CustomUser.objects.exclude(id=user.id):
-            if existing_user.email.lower() == email.lower():
-                duplicate_email = True
-                break
-        
-        if duplicate_email:
+        if CustomUser.objects.email_taken(email, exclude_id=user.id):
             return JsonResponse({'error': 'Email already exists.'}, status=400)
 
         # validation - new passwords
@@ -82,8 +71,15 @@ def edit_user(request, user_id):
             user.email = email
         if password:
             user.set_password(password)
+
+        # database constraint catches a concurrent save with the same details
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            return JsonResponse({'error': 'Username or email already exists.'}, status=400)
+        if password:
             update_session_auth_hash(request, user)
-        user.save()
         return JsonResponse({'success': True})
 
     except Exception as e:
@@ -3,6 +3,7 @@ from django.core.mail import send_mail
 from accounts.forms.signup_form import SignupForm
 from django.urls import reverse
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.views.decorators.http import require_http_methods
 import secrets
 
@@ -32,7 +33,13 @@ def signup_view(request):
 
     # send the form with data
     def handle_post_request(form):
-        user = form.save()
+        # database constraint catches a concurrent signup with the same details
+        try:
+            with transaction.atomic():
+                user = form.save()
+        except IntegrityError:
+            form.add_error(None, "This username or email is already taken.")
+            return render(request, 'accounts/signup.html', {'form': form})
         request.session['pending_user_id'] = user.id
         verification_code = secrets.token_urlsafe(6)
         request.session['verification_code'] = verification_code
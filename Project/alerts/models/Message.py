@@ -1,6 +1,7 @@
 from django.db import models
 from accounts.models.user import CustomUser
 from encrypted_model_fields.fields import EncryptedTextField
+from accounts.utils.bulk_decrypt import DecryptingQuerySet
 
 class Message(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='messages')
@@ -9,5 +10,7 @@ class Message(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = DecryptingQuerySet.as_manager()
+
     def __str__(self):
         return self.title
\ No newline at end of file
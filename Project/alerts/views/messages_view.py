@@ -16,15 +16,18 @@ def messages_view(request):
 def get_messages(request):
     messages = Message.objects.filter(user=request.user).order_by('-created_at')
     messages.update(is_read=True)
+
+    # decrypt message content in bulk
+    rows = messages.decrypted_values('id', 'title', 'content', 'is_read', 'created_at')
     messages_data = [
         {
-            'id': message.id,
-            'title': message.title,
-            'content': message.content,
-            'is_read': message.is_read,
-            'created_at': message.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            'id': message['id'],
+            'title': message['title'],
+            'content': message['content'],
+            'is_read': message['is_read'],
+            'created_at': message['created_at'].strftime('%Y-%m-%d %H:%M:%S')
         }
-        for message in messages
+        for message in rows
     ]
     return JsonResponse({'messages': messages_data})
 
@@ -1,3 +1,11 @@
 from django.contrib import admin
+from analytics.models import SpendingRollup
 
-# Register your models here.
+# pre-aggregated spending, rebuilt with rebuild_spending_rollups if it drifts
+class SpendingRollupAdmin(admin.ModelAdmin):
+    model = SpendingRollup
+
+    list_display = ('user', 'period', 'period_start', 'bank_account', 'is_received', 'transaction_count', 'total')
+    list_filter = ('period', 'is_received')
+
+admin.site.register(SpendingRollup, SpendingRollupAdmin)
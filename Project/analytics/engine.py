@@ -0,0 +1,224 @@
+from datetime import date
+import numpy as np
+from analytics.models import SpendingRollup
+
+# Columnar analytics
+# - a user's spending is loaded once into NumPy arrays, one per column,
+#   & every aggregate is a vectorized pass instead of a Python loop over dicts
+# - rows can be single transactions or daily rollups, a transaction is a rollup of one:
+#   amounts hold totals, counts the transactions behind each row & max_* the largest one
+# - days are int32 day numbers since 1970-01-01, categories & accounts are dense integer codes
+#   with the database ids kept in category_keys / account_keys (-1 for none)
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+GRANULARITIES = ('day', 'week', 'month', 'year')
+
+def to_day_number(day):
+    return day.toordinal() - EPOCH_ORDINAL
+
+def from_day_number(number):
+    return date.fromordinal(int(number) + EPOCH_ORDINAL)
+
+# dense codes for a column of ids, None becomes -1 in the keys
+def encode(values):
+    if isinstance(values, np.ndarray):
+        raw = values.astype(np.int64)
+    else:
+        raw = np.fromiter((-1 if value is None else value for value in values), dtype=np.int64, count=len(values))
+    keys, codes = np.unique(raw, return_inverse=True)
+    return keys, codes.astype(np.int32)
+
+# start day of each day's bucket
+# - weeks start on sunday, 1970-01-01 was a thursday
+def bucket_days(days, granularity):
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        return days - (days + 4) % 7
+    unit = {'month': 'M', 'year': 'Y'}[granularity]
+    return days.astype('datetime64[D]').astype(f'datetime64[{unit}]').astype('datetime64[D]').astype(np.int32)
+
+# bucket start days covering two day numbers, in date order
+def bucket_range(start, end, granularity):
+    return np.unique(bucket_days(np.arange(start, end + 1, dtype=np.int32), granularity))
+
+
+class SpendingFrame:
+
+    def __init__(self, days, amounts, categories, accounts, received, counts=None, max_amounts=None, max_ids=None):
+        self.days = np.asarray(days, dtype=np.int32)
+        self.amounts = np.asarray(amounts, dtype=np.float64)
+        self.received = np.asarray(received, dtype=bool)
+        self.counts = np.ones(len(self.days), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.max_amounts = self.amounts if max_amounts is None else np.asarray(max_amounts, dtype=np.float64)
+        self.max_ids = np.full(len(self.days), -1, dtype=np.int64) if max_ids is None else np.asarray(max_ids, dtype=np.int64)
+        self.category_keys, self.category_codes = encode(categories)
+        self.account_keys, self.account_codes = encode(accounts)
+
+    def __len__(self):
+        return len(self.days)
+
+    # one row per daily rollup, the cheapest full history of a user
+    @classmethod
+    def from_rollups(cls, user, start=None, end=None):
+        rows = SpendingRollup.objects.filter(user=user, period='day')
+        if start:
+            rows = rows.filter(period_start__gte=start)
+        if end:
+            rows = rows.filter(period_start__lte=end)
+        rows = rows.values_list(
+            'period_start', 'total', 'category_id', 'bank_account_id', 'is_received',
+            'transaction_count', 'max_amount', 'max_transaction_id',
+        )
+        return cls.from_rows(rows)
+
+    # rows of (day, amount, category, account, received, count, max amount, max id)
+    @classmethod
+    def from_rows(cls, rows):
+        rows = list(rows)
+        columns = list(zip(*rows)) if rows else [()] * 8
+        days, amounts, categories, accounts, received, counts, max_amounts, max_ids = columns
+        return cls(
+            days=np.fromiter((to_day_number(day) for day in days), dtype=np.int32, count=len(days)),
+            amounts=np.fromiter((float(amount or 0) for amount in amounts), dtype=np.float64, count=len(amounts)),
+            categories=categories,
+            accounts=accounts,
+            received=np.fromiter(received, dtype=bool, count=len(received)),
+            counts=np.fromiter(counts, dtype=np.int64, count=len(counts)),
+            max_amounts=np.fromiter((float(amount or 0) for amount in max_amounts), dtype=np.float64, count=len(max_amounts)),
+            max_ids=np.fromiter((-1 if pk is None else pk for pk in max_ids), dtype=np.int64, count=len(max_ids)),
+        )
+
+    def mask(self, received=None):
+        if received is None:
+            return np.ones(len(self), dtype=bool)
+        return self.received if received else ~self.received
+
+    # per group sums of a column, indexed by code
+    def group_sum(self, codes, values, size, mask=None):
+        if mask is not None:
+            codes, values = codes[mask], values[mask]
+        return np.bincount(codes, weights=values, minlength=size)
+
+    # per group row counts, weighted by the transactions behind each row
+    def group_count(self, codes, size, mask=None):
+        return self.group_sum(codes, self.counts, size, mask).astype(np.int64)
+
+    # bucket start days & each row's bucket code, buckets in date order
+    def buckets(self, granularity):
+        keys, codes = np.unique(bucket_days(self.days, granularity), return_inverse=True)
+        return keys, codes.astype(np.int32)
+
+    # amounts per group & bucket between two day numbers, every bucket present & in date order
+    # - returns the bucket start days & a (groups, buckets) array
+    def pivot(self, granularity, codes, size, start, end, mask=None):
+        keys = bucket_range(start, end, granularity)
+        rows = (self.days >= start) & (self.days <= end)
+        if mask is not None:
+            rows &= mask
+        buckets = np.searchsorted(keys, bucket_days(self.days[rows], granularity))
+        cells = np.bincount(
+            codes[rows].astype(np.int64) * len(keys) + buckets, weights=self.amounts[rows], minlength=size * len(keys)
+        )
+        return keys, cells.reshape(size, len(keys))
+
+    # amount per bucket, in date order
+    def series(self, granularity, received=None):
+        keys, codes = self.buckets(granularity)
+        return keys, self.group_sum(codes, self.amounts, len(keys), self.mask(received))
+
+    # the row holding the largest transaction, None when there are none
+    def largest_row(self, received=None):
+        candidates = self.mask(received) & (self.max_ids >= 0)
+        if not candidates.any():
+            return None
+        rows = np.flatnonzero(candidates)
+        return int(rows[np.argmax(self.max_amounts[rows])])
+
+    # percentiles of daily totals, over days with any
+    def daily_percentiles(self, percentiles, received=None):
+        _, totals = self.series('day', received)
+        totals = totals[totals > 0]
+        if not len(totals):
+            return [0.0 for _ in percentiles]
+        return np.percentile(totals, percentiles).tolist()
+
+
+# optional max_points request parameter, None when not given
+def parse_max_points(value):
+    if not value:
+        return None
+    max_points = int(value)
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3.")
+    return max_points
+
+# Largest-Triangle-Three-Buckets downsampling, the indexes of the points to keep
+# - first & last points are kept, the rest are split into max_points - 2 buckets & each bucket
+#   keeps the point making the largest triangle with the last kept point & the next bucket's average
+# - bucket averages & each bucket's triangle areas are vectorized, only the walk over buckets loops
+def lttb(x, y, max_points):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    points = len(y)
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3.")
+    if points <= max_points:
+        return np.arange(points)
+
+    edges = np.linspace(1, points - 1, max_points - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+
+    # average of every bucket, the point after the last bucket stands in for its next bucket
+    sums_x = np.concatenate(([0.0], np.cumsum(x)))
+    sums_y = np.concatenate(([0.0], np.cumsum(y)))
+    widths = ends - starts
+    next_x = np.append(((sums_x[ends] - sums_x[starts]) / widths)[1:], x[-1])
+    next_y = np.append(((sums_y[ends] - sums_y[starts]) / widths)[1:], y[-1])
+
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, points - 1
+    kept = 0
+    for bucket, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        areas = np.abs(
+            (x[kept] - next_x[bucket]) * (y[start:end] - y[kept])
+            - (x[kept] - x[start:end]) * (next_y[bucket] - y[kept])
+        )
+        kept = start + int(np.argmax(areas))
+        keep[bucket + 1] = kept
+    return keep
+
+# a spending-like daily series, a noisy random walk with occasional spikes
+def synthetic_series(points, seed=0):
+    rng = np.random.default_rng(seed)
+    y = np.cumsum(rng.normal(0, 1, points)) + 100
+    spikes = rng.choice(points, size=max(points // 500, 1), replace=False)
+    y[spikes] += rng.choice([-1, 1], len(spikes)) * rng.uniform(20, 60, len(spikes))
+    return np.arange(points, dtype=np.float64), y, spikes
+
+# plain Python LTTB, the reference lttb is checked & timed against
+def lttb_loop(x, y, max_points):
+    points = len(y)
+    if points <= max_points:
+        return list(range(points))
+    every = (points - 2) / (max_points - 2)
+    keep, kept = [0], 0
+    for bucket in range(max_points - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, points)
+        if end < next_end:
+            avg_x = sum(x[end:next_end]) / (next_end - end)
+            avg_y = sum(y[end:next_end]) / (next_end - end)
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            area = abs((x[kept] - avg_x) * (y[i] - y[kept]) - (x[kept] - x[i]) * (avg_y - y[kept]))
+            if area > best_area:
+                best, best_area = i, area
+        keep.append(best)
+        kept = best
+    keep.append(points - 1)
+    return keep
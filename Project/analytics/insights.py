@@ -0,0 +1,179 @@
+from collections import defaultdict
+import numpy as np
+from analytics.engine import SpendingFrame, from_day_number, lttb, to_day_number
+from banking.models import BankAccount
+from transactions.models import Category, Transaction
+
+# Insights summary
+# - everything the insights page shows, from one read of the user's daily rollups
+#   into a SpendingFrame, every aggregate is then a vectorized pass over its columns
+# - only names & the two largest transactions are looked up afterwards
+
+# chart periods, the frame granularity & how a bucket's first day is labelled
+# - weeks start on sunday & are labelled by their first day, as the charts always have
+SERIES_PERIODS = {
+    'weekly': ('week', lambda day: day.isoformat()),
+    'monthly': ('month', lambda day: day.strftime('%B %Y')),
+    'annual': ('year', lambda day: str(day.year)),
+}
+
+# percentiles of daily spending reported with the statistics
+DAILY_PERCENTILES = (50, 90)
+
+# spending series options, a request can cover at most MAX_SERIES_BUCKETS buckets,
+# or MAX_DOWNSAMPLED_BUCKETS when it is downsampled to max_points
+SERIES_GRANULARITIES = ('day', 'week', 'month', 'year')
+SERIES_GROUPS = ('category', 'account', 'direction')
+MAX_SERIES_BUCKETS = 1000
+MAX_DOWNSAMPLED_BUCKETS = 50000
+
+# decrypt & format transactions for the insights page
+def format_transactions(queryset):
+    # decrypting columns in bulk
+    transactions = queryset.decrypted_values(
+        'id', 'name', 'amount', 'date', 'category', 'is_received', 'bank_account_id', 'bank_account__account_name'
+    )
+
+    # format transactions
+    formatted_transactions = [
+        {
+            'id': txn['id'],
+            'name': txn['name'].strip(),
+            'amount': abs(float(txn['amount'])),
+            'date': txn['date'].strftime('%Y-%m-%d'),
+            'category': txn['category'] or 'Uncategorized',
+            'is_received': txn['is_received'],
+            'bank_account_id': txn['bank_account_id'],
+            'account_name': txn['bank_account__account_name']
+        }
+        for txn in transactions
+    ]
+
+    return formatted_transactions
+
+# sum totals under decrypted names, ids that share a name are merged
+# - keys are the frame's ids for each code, -1 for none
+def totals_by_name(keys, totals, names, default):
+    merged = defaultdict(float)
+    for pk, total in zip(keys.tolist(), totals.tolist()):
+        if total:
+            merged[names.get(pk) or default] += total
+    return merged
+
+def percentages_of(values):
+    total = sum(values)
+    return [round((value / total) * 100) for value in values]
+
+def category_names(ids):
+    rows = Category.objects.filter(id__in=[pk for pk in ids.tolist() if pk >= 0]).decrypted_values('id', 'name')
+    return {row['id']: row['name'] for row in rows}
+
+def account_names(ids):
+    rows = BankAccount.objects.filter(id__in=ids.tolist()).decrypted_values('id', 'account_name')
+    return {row['id']: row['account_name'] for row in rows}
+
+# the largest transaction behind a frame row, formatted
+def pointed_transaction(frame, row):
+    if row is None:
+        return None
+    return format_transactions(Transaction.objects.filter(id=int(frame.max_ids[row])))[0]
+
+# spending per category, merged by name
+def category_breakdown(frame):
+    spent = frame.mask(received=False)
+    totals = frame.group_sum(frame.category_codes, frame.amounts, len(frame.category_keys), spent)
+    categories = totals_by_name(frame.category_keys, totals, category_names(frame.category_keys), 'Uncategorized')
+    return {
+        'categories': list(categories),
+        'amounts': list(categories.values()),
+        'percentages': percentages_of(list(categories.values())),
+        'total_spent': sum(categories.values()),
+    }
+
+# transactions per account, merged by name
+def account_breakdown(frame):
+    counts = frame.group_count(frame.account_codes, len(frame.account_keys))
+    accounts = totals_by_name(frame.account_keys, counts, account_names(frame.account_keys), None)
+    return {
+        'accounts': list(accounts),
+        'transaction_counts': [int(count) for count in accounts.values()],
+        'percentages': percentages_of(list(accounts.values())),
+        'total_transactions': int(frame.counts.sum()),
+    }
+
+# largest transactions, count & daily spending percentiles
+def spending_statistics(frame):
+    return {
+        'highest_received_transaction': pointed_transaction(frame, frame.largest_row(received=True)),
+        'highest_spent_transaction': pointed_transaction(frame, frame.largest_row(received=False)),
+        'transaction_count': int(frame.counts.sum()),
+        'daily_spending_percentiles': dict(zip(
+            map(str, DAILY_PERCENTILES), frame.daily_percentiles(DAILY_PERCENTILES, received=False)
+        )),
+    }
+
+# weekly, monthly & annual spending & income
+def period_series(frame):
+    series = {}
+    for period, (granularity, label) in SERIES_PERIODS.items():
+        keys, spending = frame.series(granularity, received=False)
+        _, income = frame.series(granularity, received=True)
+        series[period] = {
+            'labels': [label(from_day_number(key)) for key in keys],
+            'spending': spending.tolist(),
+            'income': income.tolist(),
+        }
+    return series
+
+# the summary's parts, each built from the user's frame alone
+SUMMARY_PARTS = {
+    'category_breakdown': category_breakdown,
+    'account_breakdown': account_breakdown,
+    'spending_statistics': spending_statistics,
+    'series': period_series,
+}
+
+# category & account breakdowns, statistics & chart series for a user
+# - `parts` limits the summary to some of SUMMARY_PARTS, the frame is read once for all of them
+def insights_summary(user, parts=tuple(SUMMARY_PARTS)):
+    frame = SpendingFrame.from_rollups(user)
+    return {part: SUMMARY_PARTS[part](frame) for part in parts}
+
+# time-bucketed spending between two dates, one series per group
+# - category & account series count spending, direction splits spending & income
+# - every bucket in the range is returned, empty ones as zero, unless max_points
+#   downsamples them with LTTB, the buckets kept are chosen on the groups' total
+def spending_series(user, start, end, granularity, group_by, max_points=None):
+    frame = SpendingFrame.from_rollups(user, start, end)
+    first, last = to_day_number(start), to_day_number(end)
+
+    if group_by == 'direction':
+        codes, names, mask = frame.received.astype(np.int32), ['spending', 'income'], None
+    elif group_by == 'category':
+        codes, mask = frame.category_codes, frame.mask(received=False)
+        found = category_names(frame.category_keys)
+        names = [found.get(pk) or 'Uncategorized' for pk in frame.category_keys.tolist()]
+    else:
+        codes, mask = frame.account_codes, frame.mask(received=False)
+        found = account_names(frame.account_keys)
+        names = [found.get(pk) for pk in frame.account_keys.tolist()]
+
+    keys, cells = frame.pivot(granularity, codes, len(names), first, last, mask)
+
+    # groups that share a name are merged
+    merged = {}
+    for name, values in zip(names, cells):
+        merged[name] = merged[name] + values if name in merged else values
+
+    merged = {name: values for name, values in merged.items() if group_by == 'direction' or values.any()}
+
+    if max_points:
+        total = np.sum(list(merged.values()), axis=0) if merged else np.zeros(len(keys))
+        kept = lttb(keys, total, max_points)
+        keys = keys[kept]
+        merged = {name: values[kept] for name, values in merged.items()}
+
+    return {
+        'labels': [from_day_number(key).isoformat() for key in keys],
+        'series': [{'name': name, 'values': values.tolist()} for name, values in merged.items()],
+    }
@@ -0,0 +1,89 @@
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+import numpy as np
+from django.core.management.base import BaseCommand
+from analytics.engine import SpendingFrame, to_day_number
+
+# synthetic transactions as the columns a SpendingFrame is built from
+# - five years of days, 40 categories, 5 accounts & a fifth of rows received
+def synthetic_columns(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = to_day_number(date(2020, 1, 1))
+    return {
+        'days': start + rng.integers(0, 5 * 365, rows),
+        'amounts': np.round(rng.lognormal(3, 1, rows), 2),
+        'categories': rng.integers(1, 41, rows),
+        'accounts': rng.integers(1, 6, rows),
+        'received': rng.random(rows) < 0.2,
+    }
+
+# the same data as the list of dicts the views used to loop over
+def as_dicts(columns):
+    epoch = date(1970, 1, 1)
+    return [
+        {'date': epoch + timedelta(days=int(day)), 'amount': float(amount), 'category': int(category),
+         'account': int(account), 'is_received': bool(received)}
+        for day, amount, category, account, received in zip(
+            columns['days'], columns['amounts'], columns['categories'], columns['accounts'], columns['received']
+        )
+    ]
+
+# category sums, account counts, largest spent & received, monthly series
+def loop_aggregates(transactions):
+    category_spending = defaultdict(float)
+    account_counts = defaultdict(int)
+    monthly = defaultdict(float)
+    for txn in transactions:
+        account_counts[txn['account']] += 1
+        if not txn['is_received']:
+            category_spending[txn['category']] += txn['amount']
+            monthly[txn['date'].strftime('%Y-%m')] += txn['amount']
+    max((txn for txn in transactions if txn['is_received']), key=lambda txn: txn['amount'], default=None)
+    max((txn for txn in transactions if not txn['is_received']), key=lambda txn: txn['amount'], default=None)
+    return category_spending, account_counts, monthly
+
+def frame_aggregates(frame):
+    spent = frame.mask(received=False)
+    frame.group_sum(frame.category_codes, frame.amounts, len(frame.category_keys), spent)
+    frame.group_count(frame.account_codes, len(frame.account_keys))
+    frame.largest_row(received=True)
+    frame.largest_row(received=False)
+    frame.series('month', received=False)
+    frame.daily_percentiles((50, 90, 99), received=False)
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+# compare the NumPy engine with the dict loops it replaced, on synthetic data
+class Command(BaseCommand):
+    help = "Benchmark the columnar analytics engine against Python loops over transaction dicts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--skip-loops', action='store_true', help="Only time the engine.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>10} {'load':>9} {'engine':>9} {'loops':>9} {'speedup':>8}")
+        for rows in options['rows']:
+            columns = synthetic_columns(rows)
+
+            started = time.perf_counter()
+            frame = SpendingFrame(**columns)
+            load = time.perf_counter() - started
+
+            engine = best_of(options['repeat'], frame_aggregates, frame)
+            if options['skip_loops']:
+                self.stdout.write(f"{rows:>10} {load * 1000:>7.1f}ms {engine * 1000:>7.1f}ms")
+                continue
+
+            loops = best_of(options['repeat'], loop_aggregates, as_dicts(columns))
+            self.stdout.write(
+                f"{rows:>10} {load * 1000:>7.1f}ms {engine * 1000:>7.1f}ms {loops * 1000:>7.1f}ms {loops / engine:>7.1f}x"
+            )
@@ -0,0 +1,48 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from analytics.engine import lttb, lttb_loop, synthetic_series
+
+# how much of the visual shape survives
+# - the share of the series' range still spanned & the share of its spikes still drawn
+def shape_kept(y, spikes, kept):
+    span = (y[kept].max() - y[kept].min()) / (y.max() - y.min())
+    return float(span), float(np.isin(spikes, kept).mean())
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+# time LTTB & check it keeps the series' shape better than picking every nth point
+class Command(BaseCommand):
+    help = "Benchmark LTTB downsampling & compare how much shape it keeps with plain decimation."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+        parser.add_argument('--max-points', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        max_points = options['max_points']
+        self.stdout.write(
+            f"{'points':>9} {'kept':>5} {'lttb':>9} {'loop':>9} "
+            f"{'range':>6} {'spikes':>7} {'nth range':>10} {'nth spikes':>11}"
+        )
+        for points in options['points']:
+            x, y, spikes = synthetic_series(points)
+            seconds, kept = best_of(options['repeat'], lttb, x, y, max_points)
+            loop_seconds, loop_kept = best_of(1, lttb_loop, x.tolist(), y.tolist(), max_points)
+            if loop_kept != kept.tolist():
+                self.stderr.write(f"{points} points: vectorized & loop LTTB kept different points.")
+
+            decimated = np.unique(np.linspace(0, points - 1, min(max_points, points)).astype(np.int64))
+            span, spiked = shape_kept(y, spikes, kept)
+            nth_span, nth_spiked = shape_kept(y, spikes, decimated)
+            self.stdout.write(
+                f"{points:>9} {len(kept):>5} {seconds * 1000:>7.2f}ms {loop_seconds * 1000:>7.1f}ms "
+                f"{span:>6.0%} {spiked:>7.0%} {nth_span:>10.0%} {nth_spiked:>11.0%}"
+            )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from accounts.models import CustomUser
+from analytics.rollups import rebuild_rollups
+
+# recompute spending rollups from stored transactions, repairing any drift
+class Command(BaseCommand):
+    help = "Rebuild the daily & monthly spending rollups from stored transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help="Only rebuild this user id, can be repeated.")
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.order_by('id')
+        if options['user']:
+            users = users.filter(id__in=options['user'])
+
+        total = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            total += rebuild_rollups(user_id)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} rollup rows."))
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:24
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+# roll up every user's existing transactions
+# - daily & monthly count, total & largest transaction per category, account & direction,
+#   computed here rather than with analytics.rollups so later changes there can't alter it
+def backfill_spending_rollups(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    SpendingRollup = apps.get_model('analytics', 'SpendingRollup')
+    rows = Transaction.objects.annotate(
+        rollup_category=Coalesce('category_ref__parent_id', 'category_ref_id')
+    ).values(
+        'id', 'user_id', 'date', 'abs_amount', 'is_received', 'bank_account_id', 'rollup_category'
+    ).iterator(chunk_size=2000)
+
+    buckets = {}
+    for row in rows:
+        amount = row['abs_amount'] or Decimal('0')
+        for period, start in (('day', row['date']), ('month', row['date'].replace(day=1))):
+            key = (row['user_id'], period, start, row['rollup_category'], row['bank_account_id'], row['is_received'])
+            count, total, largest, largest_id = buckets.get(key, (0, Decimal('0'), None, None))
+            if largest is None or amount > largest:
+                largest, largest_id = amount, row['id']
+            buckets[key] = (count + 1, total + amount, largest, largest_id)
+
+    rollups = []
+    for key, (count, total, largest, largest_id) in buckets.items():
+        user_id, period, start, category_id, bank_account_id, is_received = key
+        rollups.append(SpendingRollup(
+            user_id=user_id, period=period, period_start=start, category_id=category_id,
+            bank_account_id=bank_account_id, is_received=is_received,
+            transaction_count=count, total=total, max_amount=largest, max_transaction_id=largest_id,
+        ))
+    SpendingRollup.objects.bulk_create(rollups, batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('banking', '0005_balance_snapshots'),
+        ('transactions', '0008_category_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('is_received', models.BooleanField()),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('max_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('bank_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='banking.bankaccount')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='transactions.category')),
+                ('max_transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transactions.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'period', 'period_start'], name='rollup_user_period_idx')],
+                'unique_together': {('user', 'period', 'period_start', 'category', 'bank_account', 'is_received')},
+            },
+        ),
+        migrations.RunPython(backfill_spending_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:52
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# uncategorized rollups could be inserted twice, fold each set of duplicates into its first row
+def merge_uncategorized_duplicates(apps, schema_editor):
+    SpendingRollup = apps.get_model('analytics', 'SpendingRollup')
+    duplicated = SpendingRollup.objects.filter(category__isnull=True).values(
+        'user_id', 'period', 'period_start', 'bank_account_id', 'is_received'
+    ).annotate(rows=Count('id')).filter(rows__gt=1)
+
+    for key in duplicated:
+        key.pop('rows')
+        kept, *merged = SpendingRollup.objects.filter(category__isnull=True, **key).order_by('id')
+        for rollup in merged:
+            kept.transaction_count += rollup.transaction_count
+            kept.total += rollup.total
+            if rollup.max_amount is not None and (kept.max_amount is None or rollup.max_amount > kept.max_amount):
+                kept.max_amount, kept.max_transaction_id = rollup.max_amount, rollup.max_transaction_id
+        kept.save()
+        SpendingRollup.objects.filter(id__in=[rollup.id for rollup in merged]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_spending_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_uncategorized_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='spendingrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'period', 'period_start', 'bank_account', 'is_received'), name='rollup_uncategorized_unique'),
+        ),
+    ]
@@ -0,0 +1 @@
+from .spendingRollup import SpendingRollup
@@ -0,0 +1,40 @@
+from django.db import models
+from accounts.models.user import CustomUser
+from banking.models import BankAccount
+from transactions.models import Category, Transaction
+
+# pre-aggregated spending for one user, day or month, category, account & direction
+# - kept up to date by deltas as transactions change, see analytics.rollups
+# - category is the primary category, detailed categories roll up into it
+class SpendingRollup(models.Model):
+    PERIOD_CHOICES = [('day', 'Day'), ('month', 'Month')]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='spending_rollups')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
+    bank_account = models.ForeignKey(BankAccount, on_delete=models.CASCADE)
+    is_received = models.BooleanField()
+    transaction_count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    max_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    max_transaction = models.ForeignKey(Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        unique_together = ('user', 'period', 'period_start', 'category', 'bank_account', 'is_received')
+        # nulls never conflict in a unique index, uncategorized rollups need their own
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'period', 'period_start', 'bank_account', 'is_received'],
+                condition=models.Q(category__isnull=True),
+                name='rollup_uncategorized_unique',
+            ),
+        ]
+        indexes = [models.Index(fields=['user', 'period', 'period_start'], name='rollup_user_period_idx')]
+
+    @property
+    def key(self):
+        return (self.user_id, self.period, self.period_start, self.category_id, self.bank_account_id, self.is_received)
+
+    def __str__(self):
+        return f"{self.user_id} {self.period} {self.period_start}: {self.transaction_count} / {self.total}"
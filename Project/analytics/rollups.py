@@ -0,0 +1,153 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models.functions import Coalesce
+from analytics.models import SpendingRollup
+from transactions.categories import category_tree
+from transactions.models import Transaction
+
+# Spending rollups
+# - daily & monthly count, total & largest transaction per category, account & direction
+# - every path that adds, edits or removes transactions reports the rows here,
+#   so analytics read a few rollup rows instead of decrypting the history
+# - edits are reported as the old rows removed & the new rows added
+# - rebuild_spending_rollups recomputes a user's rollups if they drift
+
+PERIODS = ('day', 'month')
+
+# transaction columns a rollup needs, none of them encrypted
+ROLLUP_FIELDS = ('id', 'user_id', 'date', 'abs_amount', 'is_received', 'bank_account_id', 'rollup_category')
+
+def rollup_rows(queryset):
+    return queryset.annotate(
+        rollup_category=Coalesce('category_ref__parent_id', 'category_ref_id')
+    ).values(*ROLLUP_FIELDS)
+
+def period_start(day, period):
+    return day.replace(day=1) if period == 'month' else day
+
+def period_end(start, period):
+    if period == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+def rollup_key(row, period):
+    return (
+        row['user_id'], period, period_start(row['date'], period),
+        row['rollup_category'], row['bank_account_id'], row['is_received'],
+    )
+
+# count, total & largest transaction per rollup key
+def summarise(rows):
+    buckets = {}
+    for row in rows:
+        amount = row['abs_amount'] or Decimal('0')
+        for period in PERIODS:
+            key = rollup_key(row, period)
+            count, total, largest, largest_id = buckets.get(key, (0, Decimal('0'), None, None))
+            if largest is None or amount > largest:
+                largest, largest_id = amount, row['id']
+            buckets[key] = (count + 1, total + amount, largest, largest_id)
+    return buckets
+
+def new_rollup(key, count, total, largest, largest_id):
+    user_id, period, start, category_id, bank_account_id, is_received = key
+    return SpendingRollup(
+        user_id=user_id, period=period, period_start=start, category_id=category_id,
+        bank_account_id=bank_account_id, is_received=is_received,
+        transaction_count=count, total=total, max_amount=largest, max_transaction_id=largest_id,
+    )
+
+# transactions counted in a rollup
+def rollup_transactions(rollup):
+    transactions = Transaction.objects.filter(
+        user_id=rollup.user_id,
+        bank_account_id=rollup.bank_account_id,
+        is_received=rollup.is_received,
+        date__gte=rollup.period_start,
+        date__lt=period_end(rollup.period_start, rollup.period),
+    )
+    if rollup.category_id is None:
+        return transactions.filter(category_ref__isnull=True)
+    return transactions.filter(category_ref__in=category_tree([rollup.category_id]))
+
+# find a rollup's largest transaction again once the previous one is gone
+def refresh_max(rollup, exclude_ids):
+    largest = rollup_transactions(rollup).exclude(id__in=exclude_ids).order_by('-abs_amount', 'id').values('id', 'abs_amount').first()
+    rollup.max_amount = largest['abs_amount'] if largest else None
+    rollup.max_transaction_id = largest['id'] if largest else None
+
+# attempts at applying deltas when another writer creates the same rollup first
+ROLLUP_ATTEMPTS = 3
+
+# add (sign 1) or remove (sign -1) transactions from their rollups
+# - removals must be reported before the rows are deleted or changed
+# - rows are locked while their deltas are applied, a rollup another writer inserted
+#   first fails our insert, the deltas are then applied again onto its row
+def apply_rollups(rows, sign):
+    rows = list(rows)
+    buckets = summarise(rows)
+    if not buckets:
+        return
+    removed_ids = {row['id'] for row in rows} if sign < 0 else set()
+
+    for attempt in range(ROLLUP_ATTEMPTS):
+        try:
+            with db_transaction.atomic():
+                _apply_buckets(buckets, sign, removed_ids)
+            return
+        except IntegrityError:
+            if attempt == ROLLUP_ATTEMPTS - 1:
+                raise
+
+def _apply_buckets(buckets, sign, removed_ids):
+    existing = {
+        rollup.key: rollup
+        for rollup in SpendingRollup.objects.select_for_update().filter(
+            user_id__in={key[0] for key in buckets},
+            period_start__in={key[2] for key in buckets},
+        )
+    }
+
+    created, updated, emptied = [], [], []
+    for key, (count, total, largest, largest_id) in buckets.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            if sign > 0:
+                created.append(new_rollup(key, count, total, largest, largest_id))
+            continue
+
+        rollup.transaction_count += sign * count
+        rollup.total += sign * total
+        if rollup.transaction_count <= 0:
+            emptied.append(rollup.id)
+            continue
+        if sign > 0 and (rollup.max_amount is None or largest > rollup.max_amount):
+            rollup.max_amount, rollup.max_transaction_id = largest, largest_id
+        elif sign < 0 and (rollup.max_transaction_id is None or rollup.max_transaction_id in removed_ids):
+            refresh_max(rollup, removed_ids)
+        updated.append(rollup)
+
+    if created:
+        SpendingRollup.objects.bulk_create(created)
+    if updated:
+        SpendingRollup.objects.bulk_update(updated, ['transaction_count', 'total', 'max_amount', 'max_transaction'])
+    if emptied:
+        SpendingRollup.objects.filter(id__in=emptied).delete()
+
+def record_transactions(queryset):
+    apply_rollups(rollup_rows(queryset), 1)
+
+def forget_transactions(queryset):
+    apply_rollups(rollup_rows(queryset), -1)
+
+# recompute a user's rollups from their transactions
+def rebuild_rollups(user_id, batch_size=1000):
+    rows = rollup_rows(Transaction.objects.filter(user_id=user_id)).iterator(chunk_size=2000)
+    buckets = summarise(rows)
+    with db_transaction.atomic():
+        SpendingRollup.objects.filter(user_id=user_id).delete()
+        SpendingRollup.objects.bulk_create(
+            [new_rollup(key, *values) for key, values in buckets.items()], batch_size=batch_size
+        )
+    return len(buckets)
@@ -4,23 +4,20 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 });
 
-// get all transactions for insights
-async function getAllTransactionsInsights() {
-    try {
-        const response = await fetch('/get-all-transactions-insights/');
-        const data = await response.json();
-        return data.transactions;
-    } catch (error) {
-        console.error('Error fetching transactions:', error);
+// fetch everything the page shows in one request, shared by every chart
+let insightsSummary;
+function getInsightsSummary() {
+    if (!insightsSummary) {
+        insightsSummary = fetch('/insights-summary/').then(response => response.json());
     }
+    return insightsSummary;
 }
 
 // fetch category breakdown data
 async function getCategoryBreakdown() {
     try {
-        const response = await fetch('/get-category-breakdown/');
-        const data = await response.json();
-        return data;
+        const data = await getInsightsSummary();
+        return data.category_breakdown;
     } catch (error) {
         console.error('Error fetching transactions:', error);
     }
@@ -30,9 +27,8 @@ async function getCategoryBreakdown() {
 // fetch account breakdown data
 async function getAccountBreakdown() {
     try {
-        const response = await fetch('/get-account-breakdown/');
-        const data = await response.json();
-        return data;
+        const data = await getInsightsSummary();
+        return data.account_breakdown;
     } catch (error) {
         console.error('Error fetching transactions:', error);
     }
@@ -42,11 +38,10 @@ async function getAccountBreakdown() {
 // fetch stats
 async function getSpendingStatistics() {
     try {
-        const response = await fetch('/get-spending-statistics/');
-        const data = await response.json();
+        const data = await getInsightsSummary();
 
         if (data && !data.error) {
-            displaySpendingStatistics(data);
+            displaySpendingStatistics(data.spending_statistics);
         } else {
             console.error('Error:', data ? data.error : 'Unknown error');
             displaySpendingStatistics({ highest_received_transaction: null, highest_spent_transaction: null });
@@ -57,81 +52,38 @@ async function getSpendingStatistics() {
     }
 }
 
+// chart periods & the series granularity behind them
+const SERIES_GRANULARITIES = { weekly: 'week', monthly: 'month', annual: 'year' };
+
+// label a bucket by its first day, parsed as a local date
+function formatPeriodLabel(day, timePeriod) {
+    const [year, month, date] = day.split('-').map(Number);
+    if (timePeriod === 'monthly') {
+        return new Date(year, month - 1, date).toLocaleString('default', { month: 'long', year: 'numeric' });
+    }
+    return timePeriod === 'annual' ? String(year) : day;
+}
+
+// spending & income per period over the whole history, bucketed by the server
+async function getSpendingSeries(timePeriod) {
+    const response = await fetch(`/spending-series/?granularity=${SERIES_GRANULARITIES[timePeriod]}&group_by=direction`);
+    const data = await response.json();
+    const values = name => (data.series.find(group => group.name === name) || { values: [] }).values;
+    return {
+        labels: data.labels.map(day => formatPeriodLabel(day, timePeriod)),
+        spending: values('spending'),
+        income: values('income'),
+    };
+}
+
 // create spending analytics chart
 async function createSpendingAnalyticsChart() {
     try {
-        // fetch transactions
-        const transactions = await getAllTransactionsInsights();
-
-        // group transactions by time period
-        function groupTransactions(transactions, timePeriod) {
-            const groupedData = {};
-            const monthOrder = ['January', 'February', 'March', 'April', 'May', 'June', 
-                                'July', 'August', 'September', 'October', 'November', 'December'];
-        
-            transactions.forEach(transaction => {
-                const date = new Date(transaction.date);
-                let key;
-                
-                // select correct transactions 
-                switch(timePeriod) {
-                    case 'weekly':
-                        const startOfWeek = new Date(date);
-                        startOfWeek.setDate(date.getDate() - date.getDay());
-                        key = startOfWeek.toISOString().split('T')[0];
-                        break;
-                    case 'monthly':
-                        key = date.toLocaleString('default', { month: 'long', year: 'numeric' });
-                        break;
-                    case 'annual':
-                        key = date.getFullYear().toString();
-                        break;
-                }
-        
-                if (!groupedData[key]) {
-                    groupedData[key] = {
-                        spending: 0,
-                        income: 0
-                    };
-                }
-        
-                // separate income and spending 
-                if (transaction.is_received) {
-                    groupedData[key].income += transaction.amount;
-                } else {
-                    groupedData[key].spending += transaction.amount;
-                }
-            });
-        
-            // sort by time period
-            const sortedKeys = Object.keys(groupedData).sort((a, b) => {
-                if (timePeriod === 'weekly') {
-                    return new Date(a) - new Date(b);
-                } else if (timePeriod === 'monthly') {
-                    const [monthA, yearA] = a.split(' ');
-                    const [monthB, yearB] = b.split(' ');
-                    
-                    if (yearA !== yearB) return parseInt(yearA) - parseInt(yearB);
-                    return monthOrder.indexOf(monthA) - monthOrder.indexOf(monthB);
-                } else if (timePeriod === 'annual') {
-                    return parseInt(a) - parseInt(b);
-                }
-            });
-        
-            // create a new object with the sorted keys
-            const sortedGroupedData = {};
-            sortedKeys.forEach(key => {
-                sortedGroupedData[key] = groupedData[key];
-            });
-        
-            return sortedGroupedData;
-        }
-
         // create chart
-        function createChart(groupedData, timePeriod) {
-            const labels = Object.keys(groupedData);
-            const spending = labels.map(label => groupedData[label].spending);
-            const income = labels.map(label => groupedData[label].income);
+        function createChart(periodSeries, timePeriod) {
+            const labels = periodSeries.labels;
+            const spending = periodSeries.spending;
+            const income = periodSeries.income;
         
             // calc averages
             const averageSpending = spending.reduce((a, b) => a + b, 0) / spending.length;
@@ -236,16 +188,15 @@ async function createSpendingAnalyticsChart() {
         const timePeriodSelect = document.getElementById('spending-time-period-select');
         
         // update chart
-        function updateChart() {
+        async function updateChart() {
             const timePeriod = timePeriodSelect.value;
-            const groupedData = groupTransactions(transactions, timePeriod);
-            createChart(groupedData, timePeriod);
+            createChart(await getSpendingSeries(timePeriod), timePeriod);
         }
 
         // monitor time changes
         timePeriodSelect.addEventListener('change', updateChart);
 
-        updateChart();
+        await updateChart();
 
     } catch (error) {
         console.error('Error in createSpendingAnalyticsChart:', error);
@@ -0,0 +1,295 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+import numpy as np
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.test import TestCase
+from accounts.models import CustomUser
+from analytics.engine import (
+    SpendingFrame, from_day_number, lttb, lttb_loop, parse_max_points, synthetic_series, to_day_number,
+)
+from analytics.models import SpendingRollup
+from analytics.rollups import record_transactions, rebuild_rollups
+from banking.models import BankAccount
+from transactions.categories import resolve_categories
+from transactions.models import Transaction
+
+
+class SpendingRollupTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        self.account = BankAccount.objects.create(
+            user=self.user, bank_name='Bank', account_name='Current', account_id='acc-1', account_type='checking'
+        )
+
+    def add(self, transaction_id, amount):
+        Transaction.objects.create(
+            user=self.user, bank_account=self.account, name='Shop', amount=str(-amount), date=date(2024, 1, 5),
+            is_received=False, transaction_id=transaction_id,
+        )
+        return Transaction.objects.filter(transaction_id=transaction_id)
+
+    def rollups(self):
+        return list(SpendingRollup.objects.order_by('period').values_list('period', 'transaction_count', 'total'))
+
+    def test_one_uncategorized_rollup_per_bucket(self):
+        record_transactions(self.add('t1', 5))
+        record_transactions(self.add('t2', 7))
+        self.assertEqual(self.rollups(), [('day', 2, Decimal('12')), ('month', 2, Decimal('12'))])
+
+        rollup = SpendingRollup.objects.get(period='day')
+        with self.assertRaises(IntegrityError), db_transaction.atomic():
+            SpendingRollup.objects.create(
+                user=self.user, period='day', period_start=rollup.period_start, bank_account=self.account, is_received=False
+            )
+
+    def test_rollup_created_by_another_writer_keeps_both_deltas(self):
+        first, second = self.add('t1', 5), self.add('t2', 7)
+        record_transactions(first)
+
+        # our first read misses the rollups the other writer has just inserted, so our insert conflicts
+        def stale_read():
+            reads.stop()
+            return SpendingRollup.objects.none()
+
+        reads = mock.patch.object(SpendingRollup.objects, 'select_for_update', side_effect=stale_read)
+        reads.start()
+        record_transactions(second)
+
+        self.assertEqual(self.rollups(), [('day', 2, Decimal('12')), ('month', 2, Decimal('12'))])
+        day = SpendingRollup.objects.get(period='day')
+        self.assertEqual((day.max_amount, day.max_transaction_id), (Decimal('7'), second.get().id))
+        rebuild_rollups(self.user.id)
+        self.assertEqual(self.rollups(), [('day', 2, Decimal('12')), ('month', 2, Decimal('12'))])
+
+
+class InsightsSummaryTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        account = BankAccount.objects.create(
+            user=self.user, bank_name='Bank', account_name='Current', account_id='acc-1', account_type='checking'
+        )
+        for transaction_id, amount, received in (('t1', '-5', False), ('t2', '-7', False), ('t3', '100', True)):
+            Transaction.objects.create(
+                user=self.user, bank_account=account, name='Shop', amount=amount, date=date(2024, 1, 5),
+                is_received=received, transaction_id=transaction_id,
+            )
+        record_transactions(Transaction.objects.all())
+        self.client.force_login(self.user)
+
+    def test_each_endpoint_builds_only_its_part(self):
+        with mock.patch('analytics.insights.account_names') as account_names, \
+                mock.patch('analytics.insights.pointed_transaction') as pointed_transaction:
+            response = self.client.get('/get-category-breakdown/')
+        account_names.assert_not_called()
+        pointed_transaction.assert_not_called()
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['categories'], ['Uncategorized'])
+        self.assertEqual(response.json()['total_spent'], 12.0)
+
+        with mock.patch('analytics.insights.category_names') as category_names:
+            response = self.client.get('/get-account-breakdown/')
+        category_names.assert_not_called()
+        self.assertEqual(response.json()['transaction_counts'], [3])
+
+    def test_parts_match_the_full_summary(self):
+        summary = self.client.get('/insights-summary/').json()
+        for part, url in (
+            ('category_breakdown', '/get-category-breakdown/'),
+            ('account_breakdown', '/get-account-breakdown/'),
+            ('spending_statistics', '/get-spending-statistics/'),
+        ):
+            with self.subTest(part=part):
+                response = self.client.get(url).json()
+                response.pop('last_synced_at')
+                self.assertEqual(response, summary[part])
+
+
+class SpendingSeriesViewTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        account = BankAccount.objects.create(
+            user=self.user, bank_name='Bank', account_name='Current', account_id='acc-1', account_type='checking'
+        )
+        food = resolve_categories(self.user.id, ['Food'])['Food']
+        for transaction_id, amount, day, category in (
+            ('t1', '-5', date(2024, 1, 2), food),
+            ('t2', '-7', date(2024, 1, 9), None),
+            ('t3', '100', date(2024, 1, 9), None),
+        ):
+            Transaction.objects.create(
+                user=self.user, bank_account=account, name='Shop', amount=amount, date=day,
+                is_received=not amount.startswith('-'), transaction_id=transaction_id, category_ref_id=category,
+            )
+        record_transactions(Transaction.objects.all())
+        self.client.force_login(self.user)
+
+    def series(self, **params):
+        return self.client.get('/spending-series/', params)
+
+    def test_weekly_series_by_direction(self):
+        response = self.series(granularity='week', start='2024-01-01', end='2024-01-20')
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual(body['labels'], ['2023-12-31', '2024-01-07', '2024-01-14'])
+        self.assertEqual(body['series'], [
+            {'name': 'spending', 'values': [5.0, 7.0, 0.0]},
+            {'name': 'income', 'values': [0.0, 100.0, 0.0]},
+        ])
+
+    def test_series_by_category_from_the_first_transaction(self):
+        body = self.series(group_by='category', end='2024-01-09').json()
+        self.assertEqual((body['start'], len(body['labels'])), ('2024-01-02', 8))
+        totals = {series['name']: sum(series['values']) for series in body['series']}
+        self.assertEqual(totals, {'Food': 5.0, 'Uncategorized': 7.0})
+
+    def test_downsampled_series(self):
+        body = self.series(start='2024-01-01', end='2024-03-31', max_points='10').json()
+        self.assertEqual(len(body['labels']), 10)
+        self.assertEqual((body['labels'][0], body['labels'][-1]), ('2024-01-01', '2024-03-31'))
+
+    def test_bad_requests(self):
+        for params, error in (
+            ({'granularity': 'hour'}, "Invalid granularity or group_by."),
+            ({'group_by': 'merchant'}, "Invalid granularity or group_by."),
+            ({'start': '2024-02-01', 'end': '2024-01-01'}, "Invalid date range."),
+            ({'start': '2024-13-01'}, "Invalid date range."),
+            ({'end': 'yesterday'}, "Invalid date range."),
+            ({'max_points': '2'}, "max_points must be a number of at least 3."),
+            ({'max_points': 'many'}, "max_points must be a number of at least 3."),
+            ({'start': '2000-01-01', 'end': '2024-01-01'}, "Range covers more than 1000 buckets."),
+        ):
+            with self.subTest(params=params):
+                response = self.series(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': error})
+
+
+# frame aggregates over daily rollups agree with the same aggregates over transactions
+class SpendingFrameTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        accounts = [
+            BankAccount.objects.create(
+                user=self.user, bank_name='Bank', account_name=f'Account {i}', account_id=f'acc-{i}', account_type='checking'
+            )
+            for i in range(3)
+        ]
+        categories = resolve_categories(self.user.id, ['Food', 'Travel', 'Flights'], {'Flights': 'Travel'})
+        names = ['Food', 'Travel', 'Flights', None]
+        for i in range(120):
+            received = i % 5 == 0
+            Transaction.objects.create(
+                user=self.user, bank_account=accounts[i % 3], name='Shop',
+                amount=str(((i * 37) % 200 + 1) * (1 if received else -1)),
+                date=date(2024, 1, 1) + timedelta(days=(i * 7) % 90),
+                is_received=received, transaction_id=f't{i}',
+                category_ref_id=categories[names[i % 4]] if names[i % 4] else None,
+            )
+        rebuild_rollups(self.user.id)
+        self.frame = SpendingFrame.from_rollups(self.user)
+        self.transactions = Transaction.objects.filter(user=self.user).annotate(
+            rollup_category=Coalesce('category_ref__parent_id', 'category_ref_id')
+        )
+
+    def by_key(self, keys, values):
+        return {key: value for key, value in zip(keys.tolist(), values.tolist()) if value}
+
+    def test_group_sum(self):
+        frame = self.frame
+        totals = frame.group_sum(frame.category_codes, frame.amounts, len(frame.category_keys), frame.mask(received=False))
+        expected = self.transactions.filter(is_received=False).values('rollup_category').annotate(total=Sum('abs_amount'))
+        self.assertEqual(
+            self.by_key(frame.category_keys, totals),
+            {-1 if row['rollup_category'] is None else row['rollup_category']: float(row['total']) for row in expected},
+        )
+
+    def test_group_count(self):
+        frame = self.frame
+        counts = frame.group_count(frame.account_codes, len(frame.account_keys))
+        expected = self.transactions.values('bank_account_id').annotate(count=Count('id'))
+        self.assertEqual(self.by_key(frame.account_keys, counts), {row['bank_account_id']: row['count'] for row in expected})
+        self.assertEqual(int(frame.counts.sum()), 120)
+
+    def test_series(self):
+        keys, totals = self.frame.series('month', received=True)
+        expected = self.transactions.filter(is_received=True).annotate(month=TruncMonth('date')).values('month').annotate(
+            total=Sum('abs_amount')
+        ).order_by('month')
+        self.assertEqual([from_day_number(key) for key in keys], [row['month'] for row in expected])
+        self.assertEqual(totals.tolist(), [float(row['total']) for row in expected])
+
+    def test_pivot(self):
+        frame = self.frame
+        start, end = date(2024, 1, 10), date(2024, 2, 20)
+        keys, cells = frame.pivot(
+            'week', frame.account_codes, len(frame.account_keys),
+            to_day_number(start), to_day_number(end), frame.mask(received=False),
+        )
+        # every week in the range, even without spending
+        self.assertEqual(from_day_number(keys[0]), date(2024, 1, 7))
+        self.assertTrue(np.all(np.diff(keys) == 7))
+        for account, row in zip(frame.account_keys.tolist(), cells):
+            expected = self.transactions.filter(
+                is_received=False, bank_account_id=account, date__range=(start, end)
+            ).aggregate(total=Sum('abs_amount'))['total']
+            self.assertAlmostEqual(row.sum(), float(expected))
+
+    def test_largest_row(self):
+        for received in (True, False):
+            with self.subTest(received=received):
+                row = self.frame.largest_row(received=received)
+                largest = self.transactions.filter(is_received=received).order_by('-abs_amount', 'id').first()
+                self.assertEqual(self.frame.max_amounts[row], float(largest.abs_amount))
+                self.assertEqual(
+                    Transaction.objects.get(id=self.frame.max_ids[row]).abs_amount, largest.abs_amount
+                )
+        self.assertIsNone(SpendingFrame.from_rows([]).largest_row())
+
+    def test_daily_percentiles(self):
+        daily = self.transactions.filter(is_received=False).values('date').annotate(total=Sum('abs_amount'))
+        expected = np.percentile([float(row['total']) for row in daily], (50, 90))
+        self.assertEqual(self.frame.daily_percentiles((50, 90), received=False), expected.tolist())
+
+
+class LttbTests(TestCase):
+
+    def test_keeps_the_ends_in_max_points(self):
+        x, y, _ = synthetic_series(10_000)
+        kept = lttb(x, y, 500)
+        self.assertEqual(len(kept), 500)
+        self.assertEqual((kept[0], kept[-1]), (0, 9_999))
+        self.assertTrue(np.all(np.diff(kept) > 0))
+
+    def test_spikes_survive(self):
+        y = np.zeros(1_000)
+        y[[137, 501, 862]] = [50, -40, 80]
+        kept = lttb(np.arange(1_000), y, 50)
+        self.assertTrue(set(kept.tolist()) >= {137, 501, 862})
+
+    def test_matches_the_reference_loop(self):
+        for points, max_points in ((1_000, 3), (1_000, 10), (5_000, 333), (10_001, 500)):
+            with self.subTest(points=points, max_points=max_points):
+                x, y, _ = synthetic_series(points, seed=points)
+                self.assertEqual(lttb(x, y, max_points).tolist(), lttb_loop(x.tolist(), y.tolist(), max_points))
+
+    def test_short_series_are_kept_whole(self):
+        for points in (0, 1, 3, 500):
+            with self.subTest(points=points):
+                self.assertEqual(lttb(np.arange(points), np.ones(points), 500).tolist(), list(range(points)))
+
+    def test_at_least_three_points(self):
+        for max_points in (2, 1, 0, -5):
+            with self.subTest(max_points=max_points):
+                with self.assertRaises(ValueError):
+                    lttb(np.arange(10), np.arange(10), max_points)
+        with self.assertRaises(ValueError):
+            parse_max_points('2')
+        self.assertIsNone(parse_max_points(''))
+        self.assertEqual(parse_max_points('3'), 3)
@@ -7,5 +7,7 @@ urlpatterns = [
     path('get-category-breakdown/', get_category_breakdown, name='get_category_breakdown'),
     path('get-account-breakdown/', get_account_breakdown, name='get_account_breakdown'),
     path('get-spending-statistics/', get_spending_statistics, name='get_spending_statistics'),
+    path('insights-summary/', get_insights_summary, name='insights_summary'),
+    path('spending-series/', get_spending_series, name='spending_series'),
     path('insights/', insights_view, name='insights'),
 ]
\ No newline at end of file
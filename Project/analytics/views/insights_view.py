@@ -1,10 +1,18 @@
 from banking.views.plaid_client import *
 from transactions.models import Transaction
+from analytics.insights import (
+    format_transactions, insights_summary, spending_series,
+    MAX_DOWNSAMPLED_BUCKETS, MAX_SERIES_BUCKETS, SERIES_GRANULARITIES, SERIES_GROUPS
+)
+from analytics.engine import bucket_range, parse_max_points, to_day_number
+from analytics.models import SpendingRollup
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import datetime
-from transactions.views.transactions_view import sync_transactions
+from transactions.sync import last_synced_at
 from django.http import JsonResponse
 from django.shortcuts import render
-from collections import defaultdict
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_GET
 
@@ -16,30 +24,9 @@ def insights_view(request):
     })
 
 # fetch all transactions
+# - served from the database, plaid syncing happens in the background
 def fetch_transactions(user):
-    sync_transactions(user)
-
-    # fetch transactions the database
-    transactions = Transaction.objects.filter(user=user, bank_account__isnull=False).values(
-        'id', 'name', 'amount', 'date', 'category', 'is_received', 'bank_account_id', 'bank_account__account_name'
-    )
-
-    # format transactions
-    formatted_transactions = [
-        {
-            'id': txn['id'],
-            'name': txn['name'].strip(),
-            'amount': abs(float(txn['amount'])),
-            'date': txn['date'].strftime('%Y-%m-%d'),
-            'category': txn['category'] or 'Uncategorized',
-            'is_received': txn['is_received'],
-            'bank_account_id': txn['bank_account_id'],
-            'account_name': txn['bank_account__account_name']
-        }
-        for txn in transactions
-    ]
-
-    return formatted_transactions
+    return format_transactions(Transaction.objects.filter(user=user, bank_account__isnull=False))
 
 # get all transactions for insights
 @login_required
@@ -52,7 +39,7 @@ def get_all_transactions_insights(request):
         transactions = fetch_transactions(request.user)
 
         if not transactions:
-            return JsonResponse({"transactions": []})
+            return JsonResponse({"transactions": [], 'last_synced_at': last_synced_at(request.user)})
 
         # sort transactions in descending order
         sorted_transactions = sorted(
@@ -63,114 +50,98 @@ def get_all_transactions_insights(request):
 
         return JsonResponse({
             'transactions': sorted_transactions,
+            'last_synced_at': last_synced_at(request.user),
         })
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
-# get category breakdown data
+# everything the insights page shows, in one response
 @login_required
 @require_GET
-def get_category_breakdown(request):
+def get_insights_summary(request):
     if not request.user.is_authenticated:
         return JsonResponse({'error': 'User is not authenticated.'}, status=401)
 
     try:
-        # fetch all transactions
-        transactions = fetch_transactions(request.user)
-
-        # filter for spent transactions
-        spent_transactions = [txn for txn in transactions if not txn['is_received']]
-
-        # calculate spending per category & collect dates
-        total_spent = 0
-        category_spending = defaultdict(float)
-
-        for transaction in spent_transactions:
-            amount = transaction['amount']
-            total_spent += amount
-            category_spending[transaction['category']] += amount
-
-        # split data into lists for charts
-        categories = list(category_spending.keys())
-        amounts = [category_spending[cat] for cat in categories]
-        percentages = [round((amount / total_spent) * 100) for amount in amounts]
-
-        return JsonResponse({
-            'categories': categories,
-            'amounts': amounts,
-            'percentages': percentages,
-            'total_spent': total_spent,
-        })
+        return JsonResponse({**insights_summary(request.user), 'last_synced_at': last_synced_at(request.user)})
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
-    
-# get account breakdown
+
+# time-bucketed spending for charts, only the aggregated points are returned
+# - start defaults to the user's first transaction & end to today
+# - max_points downsamples long series with LTTB, keeping their shape
 @login_required
 @require_GET
-def get_account_breakdown(request):
+def get_spending_series(request):
     if not request.user.is_authenticated:
         return JsonResponse({'error': 'User is not authenticated.'}, status=401)
 
-    try:
-        # fetch all transactions
-        transactions = fetch_transactions(request.user)
-
-        # calculate transaction count per account
-        account_transaction_count = defaultdict(int)
+    granularity = request.GET.get('granularity', 'day')
+    group_by = request.GET.get('group_by', 'direction')
+    if granularity not in SERIES_GRANULARITIES or group_by not in SERIES_GROUPS:
+        return JsonResponse({"error": "Invalid granularity or group_by."}, status=400)
 
-        for transaction in transactions:
-            account_transaction_count[transaction['account_name']] += 1
+    # validate the date range
+    try:
+        end = parse_date(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+        if request.GET.get('start'):
+            start = parse_date(request.GET['start'])
+        elif end is None:
+            start = None
+        else:
+            first = SpendingRollup.objects.filter(user=request.user, period='day').aggregate(first=Min('period_start'))['first']
+            start = min(first or end, end)
+    except ValueError:
+        start = end = None
+    if start is None or end is None or start > end:
+        return JsonResponse({"error": "Invalid date range."}, status=400)
 
-        # calculate total number of transactions
-        total_transactions = len(transactions)
+    try:
+        max_points = parse_max_points(request.GET.get('max_points'))
+    except ValueError:
+        return JsonResponse({"error": "max_points must be a number of at least 3."}, status=400)
 
-        # split data into lists for charts
-        accounts = list(account_transaction_count.keys())
-        transaction_counts = [account_transaction_count[account] for account in accounts]
-        percentages = [round((count / total_transactions) * 100) for count in transaction_counts]
+    limit = MAX_DOWNSAMPLED_BUCKETS if max_points else MAX_SERIES_BUCKETS
+    if len(bucket_range(to_day_number(start), to_day_number(end), granularity)) > limit:
+        return JsonResponse({"error": f"Range covers more than {limit} buckets."}, status=400)
 
+    try:
         return JsonResponse({
-            'accounts': accounts,
-            'transaction_counts': transaction_counts,
-            'percentages': percentages,
-            'total_transactions': total_transactions,
+            'granularity': granularity,
+            'group_by': group_by,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            **spending_series(request.user, start, end, granularity, group_by, max_points),
+            'last_synced_at': last_synced_at(request.user),
         })
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
-    
-# get spending stats
-@login_required
-@require_GET
-def get_spending_statistics(request):
+
+# one part of the insights summary, only that part is built
+def summary_part(request, part):
     if not request.user.is_authenticated:
         return JsonResponse({'error': 'User is not authenticated.'}, status=401)
 
     try:
-        # fetch all transactions
-        transactions = fetch_transactions(request.user)
-
-        if not transactions:
-            return JsonResponse({
-                "highest_received_transaction": None,
-                "highest_spent_transaction": None,
-                "transaction_count": 0
-            })
-
-        # separate received & sent transactions
-        received_transactions = [txn for txn in transactions if txn['is_received']]
-        spent_transactions = [txn for txn in transactions if not txn['is_received']]
+        summary = insights_summary(request.user, parts=[part])
+        return JsonResponse({**summary[part], 'last_synced_at': last_synced_at(request.user)})
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
 
-        # get highest received and sent
-        highest_received_transaction = max(received_transactions, key=lambda txn: txn['amount'], default=None)
-        highest_spent_transaction = max(spent_transactions, key=lambda txn: txn['amount'], default=None)
+# get category breakdown data
+@login_required
+@require_GET
+def get_category_breakdown(request):
+    return summary_part(request, 'category_breakdown')
 
-        transaction_count = len(transactions)
+# get account breakdown
+@login_required
+@require_GET
+def get_account_breakdown(request):
+    return summary_part(request, 'account_breakdown')
 
-        return JsonResponse({
-            'highest_received_transaction': highest_received_transaction,
-            'highest_spent_transaction': highest_spent_transaction,
-            'transaction_count': transaction_count
-        })
-    
-    except Exception as e:
-        return JsonResponse({"error": str(e)}, status=500)
+# get spending stats
+@login_required
+@require_GET
+def get_spending_statistics(request):
+    return summary_part(request, 'spending_statistics')
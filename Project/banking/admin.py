@@ -1,3 +1,12 @@
 from django.contrib import admin
+from banking.models import PlaidItem
 
-# Register your models here.
+# linked plaid items, the access token stays out of the list
+class PlaidItemAdmin(admin.ModelAdmin):
+    model = PlaidItem
+
+    list_display = ('user', 'institution_name', 'item_id', 'status', 'error', 'last_synced_at')
+    list_filter = ('status',)
+    readonly_fields = ('item_id', 'cursor', 'last_synced_at', 'created_at')
+
+admin.site.register(PlaidItem, PlaidItemAdmin)
@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from django.db.models import Max, Q
+from django.utils import timezone
+from banking.models import BalanceSnapshot, LIABILITY_TYPES
+from analytics.engine import lttb
+
+# parse a balance from plaid, None when it is missing
+def to_decimal(value):
+    if value is None:
+        return None
+    try:
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+# store today's balance for each account, replacing an earlier snapshot from today
+# - balances maps account id -> Decimal, accounts without one (None) are skipped,
+#   so they are left out of the net worth until plaid reports a balance
+def record_snapshots(user_id, balances, day=None):
+    day = day or timezone.localdate()
+    snapshots = [
+        BalanceSnapshot(account_id=account_id, user_id=user_id, date=day, balance=balance)
+        for account_id, balance in balances.items()
+        if balance is not None
+    ]
+    BalanceSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['account', 'date'],
+        update_fields=['balance'],
+    )
+
+# daily net worth between two dates from stored snapshots
+# - an account keeps its last known balance on days it was not synced
+# - only days where a balance changed are returned, balances from before the range count from its start
+def net_worth_series(user, start, end):
+    snapshots = BalanceSnapshot.objects.filter(user=user)
+
+    # each account's last snapshot before the range opens it
+    in_range = Q(date__gte=start, date__lte=end)
+    for row in snapshots.filter(date__lt=start).values('account_id').annotate(last=Max('date')):
+        in_range |= Q(account_id=row['account_id'], date=row['last'])
+
+    rows = snapshots.filter(in_range)
+    rows = rows.values('account_id', 'account__account_type', 'date', 'balance').order_by('date')
+
+    latest = {}
+    series = []
+    def add_point(day):
+        assets = sum((balance for balance, liability in latest.values() if not liability), Decimal('0'))
+        liabilities = sum((balance for balance, liability in latest.values() if liability), Decimal('0'))
+        point = {
+            "date": day.isoformat(),
+            "assets": float(assets),
+            "liabilities": float(liabilities),
+            "net_worth": float(assets - liabilities),
+        }
+        if series and series[-1]["date"] == point["date"]:
+            series[-1] = point
+        else:
+            series.append(point)
+
+    for row in rows:
+        liability = row['account__account_type'] in LIABILITY_TYPES
+        latest[row['account_id']] = (row['balance'], liability)
+        add_point(max(row['date'], start))
+    return series
+
+# keep the shape of a long net worth series in at most max_points points (LTTB)
+def downsample_series(series, max_points):
+    kept = lttb(
+        [date.fromisoformat(point["date"]).toordinal() for point in series],
+        [point["net_worth"] for point in series],
+        max_points,
+    )
+    return [series[i] for i in kept]
+
+# default chart range, the last n days
+def default_range(days=90):
+    end = timezone.localdate()
+    return end - timedelta(days=days), end
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from banking.models import PlaidItem
+from banking.utils.webhook_simulator import WebhookSimulator
+
+# post signed webhooks to the local receiver
+# - signs with a throwaway key that only this process trusts, see WebhookSimulator
+# - development only, refuses to run unless DEBUG is on
+class Command(BaseCommand):
+    help = "Send a signed Plaid webhook (or a burst of them) to the local webhook receiver. Requires DEBUG."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--item-id', help="Plaid item id, defaults to the first linked item.")
+        parser.add_argument('--type', default='TRANSACTIONS', help="webhook_type")
+        parser.add_argument('--code', default='SYNC_UPDATES_AVAILABLE', help="webhook_code")
+        parser.add_argument('--error-code', help="error_code for ITEM ERROR webhooks.")
+        parser.add_argument('--count', type=int, default=1, help="Webhooks to send in a burst.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError("simulate_plaid_webhook only runs with DEBUG on.")
+
+        item_id = options['item_id'] or PlaidItem.objects.filter(
+            item_id__isnull=False).values_list('item_id', flat=True).first()
+        if not item_id:
+            raise CommandError("No item id given and no item has been linked.")
+
+        simulator = WebhookSimulator()
+        fields = {'error': {'error_code': options['error_code']}} if options['error_code'] else {}
+        body = simulator.body(options['type'], options['code'], item_id, **fields)
+
+        client = Client(HTTP_HOST='localhost')
+        url = reverse('plaid_webhook')
+        with simulator.installed():
+            for _ in range(options['count']):
+                response = client.post(
+                    url, data=body, content_type='application/json', HTTP_PLAID_VERIFICATION=simulator.sign(body)
+                )
+                self.stdout.write(f"{response.status_code} {response.content.decode('utf-8')}")
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:09
+
+from django.db import migrations, models
+from accounts.utils.blind_index import blind_index
+
+
+# fill the account id blind index for existing accounts
+def backfill_account_id_index(apps, schema_editor):
+    BankAccount = apps.get_model('banking', 'BankAccount')
+    accounts = list(BankAccount.objects.all())
+    for account in accounts:
+        account.account_id_index = blind_index(account.account_id, 'account_id')
+    BankAccount.objects.bulk_update(accounts, ['account_id_index'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankaccount',
+            name='account_id_index',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_account_id_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import encrypted_model_fields.fields
+
+
+# move each user's single linked bank into its own item
+def copy_user_items(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    PlaidItem = apps.get_model('banking', 'PlaidItem')
+    items = [
+        PlaidItem(
+            user=user,
+            item_id=user.plaid_item_id,
+            access_token=user.plaid_access_token,
+            status='error' if user.plaid_item_error else 'active',
+            error=user.plaid_item_error,
+            cursor=user.plaid_cursor,
+            last_synced_at=user.plaid_last_synced_at,
+        )
+        for user in CustomUser.objects.exclude(plaid_access_token__isnull=True)
+        if user.plaid_access_token
+    ]
+    PlaidItem.objects.bulk_create(items, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0006_plaid_item_id'),
+        ('banking', '0002_account_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaidItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('access_token', encrypted_model_fields.fields.EncryptedTextField()),
+                ('institution_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('institution_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('error', 'Needs attention')], default='active', max_length=20)),
+                ('error', models.CharField(blank=True, max_length=255, null=True)),
+                ('cursor', models.TextField(blank=True, null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plaid_items', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(copy_user_items, migrations.RunPython.noop),
+    ]
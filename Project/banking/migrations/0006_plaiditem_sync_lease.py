@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0005_balance_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plaiditem',
+            name='sync_lease_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='plaiditem',
+            name='sync_token',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:49
+
+import accounts.utils.fields
+from django.db import migrations
+
+
+# accounts linked without a balance were stored as the text 'None'
+def clear_missing_balances(apps, schema_editor):
+    BankAccount = apps.get_model('banking', 'BankAccount')
+    missing = [account.id for account in BankAccount.objects.only('id', 'balance') if account.balance == 'None']
+    BankAccount.objects.filter(id__in=missing).update(balance=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0006_plaiditem_sync_lease'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bankaccount',
+            name='balance',
+            field=accounts.utils.fields.BulkEncryptedCharField(default='0.00', null=True),
+        ),
+        migrations.RunPython(clear_missing_balances, migrations.RunPython.noop),
+    ]
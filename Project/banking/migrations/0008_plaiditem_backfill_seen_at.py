@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0007_bankaccount_balance_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plaiditem',
+            name='backfill_seen_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
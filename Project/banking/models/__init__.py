@@ -1 +1,3 @@
-from .bankAccount import BankAccount
\ No newline at end of file
+from .bankAccount import BankAccount, index_account_id
+from .plaidItem import PlaidItem
+from .balanceSnapshot import BalanceSnapshot, LIABILITY_TYPES
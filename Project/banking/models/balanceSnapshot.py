@@ -0,0 +1,21 @@
+from django.db import models
+from accounts.models.user import CustomUser
+from banking.models.bankAccount import BankAccount
+
+# account types whose balance is owed rather than held
+LIABILITY_TYPES = {'credit', 'Credit Card', 'Loan'}
+
+# an account's balance at the end of a day, one row per account per day
+# - kept as a plain decimal so net worth can be charted without plaid calls or decryption
+class BalanceSnapshot(models.Model):
+    account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name='snapshots')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        unique_together = ('account', 'date')
+        indexes = [models.Index(fields=['user', 'date'], name='snapshot_user_date_idx')]
+
+    def __str__(self):
+        return f"{self.account_id} {self.date}: {self.balance}"
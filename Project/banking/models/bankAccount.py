@@ -1,6 +1,21 @@
 from django.db import models
 from accounts.models.user import CustomUser
 from encrypted_model_fields.fields import EncryptedTextField, EncryptedCharField
+from accounts.utils.blind_index import blind_index
+from accounts.utils.bulk_decrypt import DecryptingQuerySet
+from accounts.utils.fields import BulkEncryptedCharField
+
+# blind index of a plaid account id, account_id itself is encrypted & can't be queried
+def index_account_id(account_id):
+    return blind_index(account_id, 'account_id')
+
+
+class BankAccountQuerySet(DecryptingQuerySet):
+
+    # accounts keyed by account_id_index, loaded without decrypting anything
+    # - look a plaid account up with index_account_id(plaid_account_id)
+    def by_account_index(self):
+        return {account.account_id_index: account for account in self.only('id', 'user_id', 'account_id_index')}
 
 # stores user bank account data
 class BankAccount(models.Model):
@@ -8,19 +23,30 @@ class BankAccount(models.Model):
     bank_name = EncryptedCharField(max_length=255)
     account_name = EncryptedCharField(max_length=255, blank=True, null=True)
     account_id = EncryptedTextField(unique=True)
+    account_id_index = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     account_type = models.CharField(max_length=50, choices=[('checking', 'Checking'), ('savings', 'Savings'), ('credit', 'Credit Card')])
-    balance = EncryptedCharField(max_length=50, default='0.00')
+    balance = BulkEncryptedCharField(max_length=50, default='0.00', null=True) # refreshed with bulk_update, null when plaid has none
     currency = models.CharField(max_length=10, default="GBP")
     last_synced = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    objects = BankAccountQuerySet.as_manager()
+
+    # keep the account id index in step with the encrypted id
+    def save(self, *args, **kwargs):
+        self.account_id_index = index_account_id(self.account_id)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'account_id' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'account_id_index'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.user.username} - {self.bank_name} ({self.account_type})"
 
     @property
     def decrypted_balance(self):
-        return float(self.balance)
+        return None if self.balance is None else float(self.balance)
 
     @decrypted_balance.setter
     def decrypted_balance(self, value):
-        self.balance = str(value)
\ No newline at end of file
+        self.balance = None if value is None else str(value)
\ No newline at end of file
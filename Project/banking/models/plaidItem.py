@@ -0,0 +1,28 @@
+from django.db import models
+from accounts.models.user import CustomUser
+from encrypted_model_fields.fields import EncryptedTextField
+
+# a bank login linked through plaid, a user can link several
+# - each item has its own access token & transactions/sync cursor
+class PlaidItem(models.Model):
+    STATUS_CHOICES = [('active', 'Active'), ('error', 'Needs attention')]
+    BACKFILL_CHOICES = [('pending', 'Pending'), ('running', 'Running'), ('complete', 'Complete'), ('failed', 'Failed')]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='plaid_items')
+    item_id = models.CharField(max_length=255, unique=True, null=True, blank=True) # null for items linked before ids were kept
+    access_token = EncryptedTextField()
+    institution_id = models.CharField(max_length=100, null=True, blank=True)
+    institution_name = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    error = models.CharField(max_length=255, null=True, blank=True) # plaid error code
+    cursor = models.TextField(null=True, blank=True) # transactions/sync position
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    backfill_status = models.CharField(max_length=20, choices=BACKFILL_CHOICES, default='complete') # initial history load
+    backfill_loaded = models.PositiveIntegerField(default=0) # transactions loaded so far
+    backfill_seen_at = models.DateTimeField(null=True, blank=True, editable=False) # last sign of life of a running backfill
+    sync_token = models.CharField(max_length=32, null=True, blank=True, editable=False) # holder of the sync lease
+    sync_lease_until = models.DateTimeField(null=True, blank=True, editable=False) # lease expiry, renewed per page
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.institution_name or self.item_id}"
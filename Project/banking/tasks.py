@@ -0,0 +1,19 @@
+from celery import shared_task
+from banking.models import PlaidItem
+from banking.views.bank_account_view import sync_item_accounts
+
+# refresh one item's account balances & record today's snapshots
+@shared_task(ignore_result=True)
+def refresh_item_balances(item_id):
+    item = PlaidItem.objects.filter(id=item_id).first()
+    if item is None:
+        return {"error": "Item not found."}
+    return {"added": sync_item_accounts(item)}
+
+# queue a balance refresh for every linked item
+# - run daily by celery beat so every account gets a snapshot per day
+@shared_task(ignore_result=True)
+def refresh_all_balances():
+    item_ids = PlaidItem.objects.filter(status='active').values_list('id', flat=True)
+    for item_id in item_ids.iterator():
+        refresh_item_balances.delay(item_id)
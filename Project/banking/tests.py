@@ -0,0 +1,379 @@
+import time
+import uuid
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+import plaid
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from accounts.models import CustomUser
+from banking.models import BalanceSnapshot, BankAccount, PlaidItem, index_account_id
+from banking.utils import RateLimiter, get_shared_plaid_client, plaid_call_stats, reset_plaid_call_stats
+from banking.utils.plaid_pool import PooledApiClient
+from banking.views.bank_account_view import sync_item_accounts
+from banking.utils.webhook_simulator import WebhookSimulator
+
+# webhooks signed by the local simulator, verified by the receiver's real key lookup
+@override_settings(PLAID_WEBHOOK_VERIFY=True)
+class PlaidWebhookTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        self.item = PlaidItem.objects.create(user=self.user, item_id='item-1', access_token='access-1')
+        self.simulator = WebhookSimulator()
+
+        plaid_client = mock.patch('banking.views.webhook_view.get_plaid_client', return_value=self.simulator)
+        plaid_client.start()
+        self.addCleanup(plaid_client.stop)
+        enqueue = mock.patch('banking.views.webhook_view.enqueue', return_value=True)
+        self.enqueue = enqueue.start()
+        self.addCleanup(enqueue.stop)
+
+    def post(self, body, token):
+        return self.client.post('/plaid-webhook/', data=body, content_type='application/json', HTTP_PLAID_VERIFICATION=token)
+
+    def assertRejected(self, body, token):
+        response = self.post(body, token)
+        self.assertEqual(response.status_code, 401, response.content)
+        self.enqueue.assert_not_called()
+
+    def test_valid_webhook_queues_one_sync(self):
+        body = self.simulator.body(item_id='item-1')
+        response = self.post(body, self.simulator.sign(body))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "queued"})
+
+        # the rest of a burst is absorbed by the queued sync
+        response = self.post(body, self.simulator.sign(body))
+        self.assertEqual(response.json(), {"status": "coalesced"})
+        self.assertEqual(self.enqueue.call_count, 1)
+        self.assertEqual(self.enqueue.call_args.args[1:3], ((self.item.id,), {'force': True}))
+
+    def test_item_error_is_recorded(self):
+        body = self.simulator.body('ITEM', 'ERROR', 'item-1', error={'error_code': 'ITEM_LOGIN_REQUIRED'})
+        response = self.post(body, self.simulator.sign(body))
+        self.assertEqual(response.json(), {"status": "recorded"})
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.status, self.item.error), ('error', 'ITEM_LOGIN_REQUIRED'))
+
+    def test_old_webhook(self):
+        body = self.simulator.body(item_id='item-1')
+        self.assertRejected(body, self.simulator.sign(body, issued_at=int(time.time()) - 10 * 60))
+
+    def test_expired_key(self):
+        self.simulator.expired_at = int(time.time())
+        body = self.simulator.body(item_id='item-1')
+        self.assertRejected(body, self.simulator.sign(body))
+
+    def test_tampered_body(self):
+        body = self.simulator.body(item_id='item-1')
+        token = self.simulator.sign(body)
+        self.assertRejected(self.simulator.body(item_id='item-2'), token)
+
+    def test_tampered_signature(self):
+        body = self.simulator.body(item_id='item-1')
+        header, claims, _ = self.simulator.sign(body).split('.')
+        _, _, signature = WebhookSimulator().sign(body).split('.')
+        self.assertRejected(body, f"{header}.{claims}.{signature}")
+
+    def test_wrong_key_id_is_looked_up_once(self):
+        body = self.simulator.body(item_id='item-1')
+        token = self.simulator.sign(body, header={'alg': 'ES256', 'kid': str(uuid.uuid4()), 'typ': 'JWT'})
+        self.assertRejected(body, token)
+        self.assertRejected(body, token)
+        self.assertEqual(len(self.simulator.lookups), 1)
+
+    def test_plaid_errors_are_not_server_errors(self):
+        body = self.simulator.body(item_id='item-1')
+        with mock.patch.object(
+            self.simulator, 'webhook_verification_key_get', side_effect=plaid.ApiException(status=500, reason="Server error")
+        ):
+            self.assertRejected(body, self.simulator.sign(body))
+
+        # a plaid outage is not remembered as an unknown key
+        response = self.post(body, self.simulator.sign(body))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PLAID_WEBHOOK_KEY_LOOKUPS_PER_MINUTE=2)
+    def test_key_lookups_are_capped(self):
+        body = self.simulator.body(item_id='item-1')
+        for _ in range(4):
+            self.assertRejected(body, self.simulator.sign(body, header={'alg': 'ES256', 'kid': str(uuid.uuid4())}))
+        self.assertEqual(len(self.simulator.lookups), 2)
+
+    def test_key_without_coordinates(self):
+        key = {'kid': self.simulator.key_id, 'expired_at': None}
+        body = self.simulator.body(item_id='item-1')
+        with mock.patch.object(self.simulator, 'verification_key', return_value=key):
+            self.assertRejected(body, self.simulator.sign(body))
+
+    def test_malformed_tokens(self):
+        body = self.simulator.body(item_id='item-1')
+        body_hash = self.simulator.sign(body).split('.')[1]
+        kid = self.simulator.key_id
+        tokens = [
+            '',
+            'not-a-token',
+            'a.b',
+            'a.b.c.d',
+            '%%%.%%%.%%%',
+            'é.é.é',
+            self.simulator.sign(body, header=['ES256', kid]),
+            self.simulator.sign(body, header={'alg': 'HS256', 'kid': kid}),
+            self.simulator.sign(body, header={'alg': 'none', 'kid': kid}),
+            self.simulator.sign(body, header={'alg': 'ES256'}),
+            self.simulator.sign(body, header={'alg': 'ES256', 'kid': 5}),
+            self.simulator.sign(body, header={'alg': 'ES256', 'kid': '../../etc'}),
+            self.simulator.sign(body, claims=['iat']),
+            self.simulator.sign(body, claims={'request_body_sha256': body_hash}),
+            self.simulator.sign(body, claims={'iat': 'now', 'request_body_sha256': body_hash}),
+            self.simulator.sign(body, claims={'iat': True, 'request_body_sha256': body_hash}),
+            self.simulator.sign(body, claims={'iat': int(time.time())}),
+            self.simulator.sign(body, claims={'iat': int(time.time()), 'request_body_sha256': 'é'}),
+            self.simulator.sign(body).rsplit('.', 1)[0] + '.AAAA',
+        ]
+        for token in tokens:
+            with self.subTest(token=token):
+                self.assertRejected(body, token)
+
+    def test_simulator_command_requires_debug(self):
+        with self.assertRaises(CommandError):
+            call_command('simulate_plaid_webhook', item_id='item-1', stdout=StringIO())
+
+    @override_settings(DEBUG=True)
+    def test_simulator_command_keeps_its_key_local(self):
+        out = StringIO()
+        call_command('simulate_plaid_webhook', item_id='item-1', count=2, stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), ['200 {"status": "queued"}', '200 {"status": "coalesced"}'])
+        # the key was never fetched, so nothing was cached for other processes to trust
+        self.assertEqual(self.simulator.lookups, [])
+
+
+# linking a bank, the public token exchange
+class ExchangePublicTokenTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        self.other = CustomUser.objects.create_user('other', 'other@example.com', 'Password1!')
+        self.item = PlaidItem.objects.create(user=self.other, item_id='item-1', access_token='access-1')
+
+        self.plaid = mock.Mock()
+        self.plaid.item_public_token_exchange.return_value = mock.Mock(access_token='access-2', item_id='item-1')
+        plaid_client = mock.patch('banking.views.plaid_client.get_plaid_client', return_value=self.plaid)
+        plaid_client.start()
+        self.addCleanup(plaid_client.stop)
+        enqueue = mock.patch('banking.views.plaid_client.enqueue', return_value=True)
+        enqueue.start()
+        self.addCleanup(enqueue.stop)
+        accounts = mock.patch('banking.views.bank_account_view.sync_item_accounts')
+        self.sync_item_accounts = accounts.start()
+        self.addCleanup(accounts.stop)
+
+    def exchange(self):
+        return self.client.post('/exchange-public-token/', data={'public_token': 'public-1'}, content_type='application/json')
+
+    def test_another_users_item_is_not_taken_over(self):
+        self.client.force_login(self.user)
+        response = self.exchange()
+
+        self.assertEqual(response.status_code, 409)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.user, self.other)
+        self.assertEqual(self.item.access_token, 'access-1')
+        self.sync_item_accounts.assert_not_called()
+
+    def test_relinking_an_item_restarts_it(self):
+        PlaidItem.objects.filter(id=self.item.id).update(cursor='c1', backfill_status='complete')
+        self.client.force_login(self.other)
+        response = self.exchange()
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.access_token, self.item.cursor, self.item.backfill_status), ('access-2', None, 'pending'))
+        self.assertEqual(PlaidItem.objects.count(), 1)
+
+
+class RateLimiterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_limiters_with_one_name_share_a_budget(self):
+        # as two processes would, each with its own limiter over the shared cache
+        first, second = RateLimiter(3, 'plaid'), RateLimiter(3, 'plaid')
+        with mock.patch('banking.utils.rate_limit.time.time', return_value=1000.0), \
+                mock.patch('banking.utils.rate_limit.time.sleep', side_effect=StopIteration) as sleep:
+            first.acquire()
+            second.acquire()
+            first.acquire()
+            with self.assertRaises(StopIteration):
+                second.acquire()
+            # until the next window
+            sleep.assert_called_once_with(1.0)
+            RateLimiter(3, 'plaid-fleet').acquire()
+
+    def test_rates_below_one_per_second(self):
+        limiter = RateLimiter(0.5, 'plaid')
+        with mock.patch('banking.utils.rate_limit.time.time', return_value=1001.0), \
+                mock.patch('banking.utils.rate_limit.time.sleep', side_effect=StopIteration) as sleep:
+            limiter.acquire()
+            with self.assertRaises(StopIteration):
+                limiter.acquire()
+            sleep.assert_called_once_with(1.0)
+
+
+# retries, timeouts & counters of the shared plaid client
+@override_settings(PLAID_MAX_RETRIES=3, PLAID_RETRY_BACKOFF=0.5, PLAID_RETRY_MAX_BACKOFF=10.0)
+class PlaidPoolTests(TestCase):
+
+    def setUp(self):
+        reset_plaid_call_stats()
+        self.addCleanup(reset_plaid_call_stats)
+        for name, value in (('_rate_limiter', None), ('_rate_limiter_set', True)):
+            patcher = mock.patch(f'banking.utils.plaid_pool.{name}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        sleep = mock.patch('banking.utils.plaid_pool.time.sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+        self.api = PooledApiClient(plaid.Configuration(host=plaid.Environment.Sandbox))
+
+    def answer(self, *responses):
+        patcher = mock.patch('plaid.api_client.ApiClient.call_api', side_effect=responses)
+        call_api = patcher.start()
+        self.addCleanup(patcher.stop)
+        return call_api
+
+    def error(self, status, retry_after=None):
+        error = plaid.ApiException(status=status, reason="Error")
+        error.headers = {'Retry-After': retry_after} if retry_after else None
+        return error
+
+    def test_idempotent_calls_are_retried(self):
+        call_api = self.answer(self.error(503), self.error(429), 'response')
+        self.assertEqual(self.api.call_api('/transactions/sync', 'POST'), 'response')
+        self.assertEqual(call_api.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        # jittered, below the doubling ceiling
+        self.assertLessEqual(self.sleep.call_args_list[0].args[0], 0.5)
+        self.assertLessEqual(self.sleep.call_args_list[1].args[0], 1.0)
+        # default timeouts are filled in
+        self.assertEqual(call_api.call_args.kwargs['_request_timeout'], (5.0, 30.0))
+
+    def test_retries_are_capped(self):
+        call_api = self.answer(*[self.error(500)] * 5)
+        with self.assertRaises(plaid.ApiException):
+            self.api.call_api('/accounts/get', 'POST')
+        self.assertEqual(call_api.call_count, 4)
+
+    def test_other_calls_are_sent_once(self):
+        call_api = self.answer(self.error(503), 'response')
+        with self.assertRaises(plaid.ApiException):
+            self.api.call_api('/item/public_token/exchange', 'POST')
+        call_api.assert_called_once()
+        self.sleep.assert_not_called()
+
+    def test_client_errors_are_not_retried(self):
+        call_api = self.answer(self.error(400), 'response')
+        with self.assertRaises(plaid.ApiException):
+            self.api.call_api('/transactions/sync', 'POST')
+        call_api.assert_called_once()
+
+    def test_retry_after_is_honoured(self):
+        self.answer(self.error(429, '2'), self.error(429, '600'), 'response')
+        self.api.call_api('/transactions/sync', 'POST')
+        # up to the maximum backoff
+        self.assertEqual([c.args[0] for c in self.sleep.call_args_list], [2.0, 10.0])
+
+    def test_calls_are_counted(self):
+        self.answer(self.error(503), 'response', self.error(400))
+        self.api.call_api('/transactions/sync', 'POST')
+        with self.assertRaises(plaid.ApiException):
+            self.api.call_api('/transactions/sync', 'POST')
+
+        stats = plaid_call_stats()['/transactions/sync']
+        self.assertEqual((stats['calls'], stats['retries'], stats['errors']), (2, 1, 1))
+        self.assertAlmostEqual(stats['avg_seconds'], stats['total_seconds'] / 2)
+        reset_plaid_call_stats()
+        self.assertEqual(plaid_call_stats(), {})
+
+    def test_client_is_rebuilt_after_a_fork(self):
+        for name in ('_client', '_client_pid'):
+            patcher = mock.patch(f'banking.utils.plaid_pool.{name}', None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with mock.patch('banking.utils.plaid_pool.os.getpid', return_value=100):
+            client = get_shared_plaid_client()
+            self.assertIs(get_shared_plaid_client(), client)
+        with mock.patch('banking.utils.plaid_pool.os.getpid', return_value=101):
+            self.assertIsNot(get_shared_plaid_client(), client)
+
+
+# accounts & balances from plaid's accounts/get
+class SyncItemAccountsTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        self.item = PlaidItem.objects.create(user=self.user, item_id='item-1', access_token='access-1')
+        self.plaid = mock.Mock()
+        plaid_client = mock.patch('banking.views.bank_account_view.get_plaid_client', return_value=self.plaid)
+        plaid_client.start()
+        self.addCleanup(plaid_client.stop)
+
+    def link(self, *balances):
+        accounts = [
+            {'account_id': f'acc-{i}', 'name': f'Account {i}', 'type': 'depository', 'subtype': 'checking',
+             'balances': {'current': balance, 'iso_currency_code': 'GBP'}}
+            for i, balance in enumerate(balances)
+        ]
+        self.plaid.accounts_get.return_value.to_dict.return_value = {'accounts': accounts}
+        return sync_item_accounts(self.item)
+
+    def test_account_without_a_balance(self):
+        self.assertEqual(self.link(None, 120.5), 2)
+        balances = [row['balance'] for row in BankAccount.objects.decrypted_values('balance')]
+        self.assertEqual(sorted(balances, key=str), ['120.50', None])
+        # only the account with a balance counts towards net worth
+        self.assertEqual(list(BalanceSnapshot.objects.values_list('balance', flat=True)), [Decimal('120.50')])
+
+        self.client.force_login(self.user)
+        response = self.client.get('/get-account-balance/', {'start': '2000-01-01'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(sorted((account['balance'] for account in response.json()['accounts']), key=str), [120.5, None])
+        self.assertEqual(response.json()['net_worth'][-1]['net_worth'], 120.5)
+
+
+# plaid account ids are matched through their blind index
+class AccountIdIndexTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        self.account = BankAccount.objects.create(
+            user=self.user, bank_name='Bank', account_name='Current', account_id='acc-1', account_type='checking'
+        )
+
+    def stored_index(self):
+        return BankAccount.objects.values_list('account_id_index', flat=True).get()
+
+    def test_index_is_kept_in_step(self):
+        self.assertEqual(self.stored_index(), index_account_id('acc-1'))
+        self.assertNotEqual(index_account_id('acc-1'), index_account_id('acc-2'))
+
+        self.account.account_id = 'acc-2'
+        self.account.save(update_fields=['account_id'])
+        self.assertEqual(self.stored_index(), index_account_id('acc-2'))
+
+        # saves of other fields leave it alone
+        self.account.bank_name = 'Other bank'
+        self.account.save(update_fields=['bank_name'])
+        self.assertEqual(self.stored_index(), index_account_id('acc-2'))
+
+    def test_lookup_decrypts_nothing(self):
+        with mock.patch('encrypted_model_fields.fields.EncryptedMixin.from_db_value', side_effect=AssertionError) as decrypt:
+            accounts = BankAccount.objects.filter(user=self.user).by_account_index()
+        decrypt.assert_not_called()
+        self.assertEqual(accounts[index_account_id('acc-1')].id, self.account.id)
+        self.assertNotIn(index_account_id('acc-2'), accounts)
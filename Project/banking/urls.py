@@ -8,4 +8,6 @@ urlpatterns = [
     path('sync-bank-accounts/', sync_bank_accounts, name='sync_bank_accounts'),
     path('get-account-balance/', get_account_balance, name='get_account_balance'),
     path('delete-bank-account/<int:account_id>/', delete_bank_account, name='delete_bank_account'),
+    path('plaid-webhook/', plaid_webhook, name='plaid_webhook'),
+    path('backfill-status/', get_backfill_status, name='get_backfill_status'),
 ]
\ No newline at end of file
@@ -0,0 +1,3 @@
+from .concurrency import run_per_item
+from .plaid_pool import get_shared_plaid_client, plaid_call_stats, reset_plaid_call_stats, set_plaid_rate_limit
+from .rate_limit import RateLimiter
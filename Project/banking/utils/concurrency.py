@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+
+# Per-item fan out
+# - plaid calls for a user's items are independent & mostly waiting on the network,
+#   so they run on a bounded thread pool and take about as long as the slowest item
+# - each worker thread has its own database connection, closed when its item is done
+
+def _call_safely(func, item):
+    try:
+        return func(item)
+    except Exception as e:
+        return e
+
+def _call_in_thread(func, item):
+    try:
+        return func(item)
+    finally:
+        connections.close_all()
+
+# call func for every item, returns (item, result) pairs in item order
+# - a raised exception is returned as the item's result
+def run_per_item(func, items, workers=None):
+    items = list(items)
+    workers = min(workers or settings.PLAID_ITEM_WORKERS, len(items))
+    if workers <= 1:
+        return [(item, _call_safely(func, item)) for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_call_in_thread, func, item) for item in items]
+        results = []
+        for item, future in zip(items, futures):
+            try:
+                results.append((item, future.result()))
+            except Exception as e:
+                results.append((item, e))
+        return results
@@ -0,0 +1,150 @@
+import logging
+import os
+import random
+import threading
+import time
+import plaid
+import urllib3
+from django.conf import settings
+from plaid.api import plaid_api
+from plaid.api_client import ApiClient
+from banking.utils.rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Shared Plaid client
+# - one client (and urllib3 pool) per process, so connections are kept alive between calls
+# - rebuilt after a fork, pooled sockets must not be shared with the parent
+# - idempotent calls are retried with jittered backoff on 429 & 5xx responses
+# - every request, retries included, passes the shared rate limiter when one is set
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# read-only endpoints that are safe to send twice
+# - token exchange & link token creation are left out, a retry could consume or create a second token
+IDEMPOTENT_PATHS = {
+    '/accounts/get',
+    '/accounts/balance/get',
+    '/auth/get',
+    '/categories/get',
+    '/institutions/get_by_id',
+    '/item/get',
+    '/transactions/get',
+    '/transactions/sync',
+    '/webhook_verification_key/get',
+}
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+_rate_limiter = None
+_rate_limiter_set = False
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+# per endpoint latency counters for this process
+def _record(path, elapsed, retries, failed):
+    with _stats_lock:
+        entry = _stats.setdefault(path, {'calls': 0, 'errors': 0, 'retries': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+        entry['calls'] += 1
+        entry['retries'] += retries
+        entry['total_seconds'] += elapsed
+        entry['max_seconds'] = max(entry['max_seconds'], elapsed)
+        if failed:
+            entry['errors'] += 1
+
+def plaid_call_stats():
+    with _stats_lock:
+        stats = {path: dict(entry) for path, entry in _stats.items()}
+    for entry in stats.values():
+        entry['avg_seconds'] = entry['total_seconds'] / entry['calls']
+    return stats
+
+def reset_plaid_call_stats():
+    with _stats_lock:
+        _stats.clear()
+
+# limit this process's plaid requests to a budget of `rate` per second, None for no limit
+# - processes setting the same name share the budget, see RateLimiter
+# - defaults to PLAID_REQUESTS_PER_SECOND
+def set_plaid_rate_limit(rate, name='plaid'):
+    global _rate_limiter, _rate_limiter_set
+    _rate_limiter = RateLimiter(rate, name) if rate else None
+    _rate_limiter_set = True
+
+def _wait_for_rate_limit():
+    if not _rate_limiter_set:
+        set_plaid_rate_limit(settings.PLAID_REQUESTS_PER_SECOND)
+    if _rate_limiter is not None:
+        _rate_limiter.acquire()
+
+# delay before the next attempt, honours Retry-After when plaid sends one
+def _backoff(attempt, error):
+    retry_after = error.headers.get('Retry-After') if error.headers else None
+    if retry_after:
+        try:
+            return min(float(retry_after), settings.PLAID_RETRY_MAX_BACKOFF)
+        except ValueError:
+            pass
+    # full jitter so workers that failed together do not retry together
+    ceiling = min(settings.PLAID_RETRY_BACKOFF * (2 ** attempt), settings.PLAID_RETRY_MAX_BACKOFF)
+    return random.uniform(0, ceiling)
+
+
+# api client with default timeouts, retries & latency counters
+class PooledApiClient(ApiClient):
+
+    def call_api(self, resource_path, method, *args, **kwargs):
+        if not kwargs.get('_request_timeout'):
+            kwargs['_request_timeout'] = (settings.PLAID_CONNECT_TIMEOUT, settings.PLAID_READ_TIMEOUT)
+        max_retries = settings.PLAID_MAX_RETRIES if resource_path in IDEMPOTENT_PATHS else 0
+
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            _wait_for_rate_limit()
+            try:
+                response = super().call_api(resource_path, method, *args, **kwargs)
+            except plaid.ApiException as e:
+                if e.status in RETRY_STATUSES and attempt < max_retries:
+                    delay = _backoff(attempt, e)
+                    logger.warning("Plaid %s returned %s, retrying in %.2fs", resource_path, e.status, delay)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                _record(resource_path, time.perf_counter() - start, attempt, True)
+                raise
+            except Exception:
+                _record(resource_path, time.perf_counter() - start, attempt, True)
+                raise
+            elapsed = time.perf_counter() - start
+            _record(resource_path, elapsed, attempt, False)
+            logger.debug("Plaid %s took %.3fs (%d retries)", resource_path, elapsed, attempt)
+            return response
+
+
+def _build_client():
+    configuration = plaid.Configuration(
+        host=plaid.Environment.Sandbox,
+        api_key={
+            "clientId": settings.PLAID_CLIENT_ID,
+            "secret": settings.PLAID_SECRET,
+        },
+    )
+    configuration.connection_pool_maxsize = settings.PLAID_POOL_SIZE
+    # only retry connects in urllib3, nothing has reached plaid yet so any call is safe
+    configuration.retries = urllib3.Retry(total=None, connect=2, read=0, status=0, redirect=0, backoff_factor=0.2)
+    return plaid_api.PlaidApi(PooledApiClient(configuration))
+
+# process wide plaid client, safe to share between threads
+def get_shared_plaid_client():
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = _build_client()
+                _client_pid = pid
+    return _client
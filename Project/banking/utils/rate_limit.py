@@ -0,0 +1,29 @@
+import time
+from django.core.cache import cache
+
+# request budget shared by every process & thread through the cache
+# - requests are counted per window under one cache key, so with a shared CACHE_URL
+#   (redis, memcached) all workers together send at most `rate` per second
+# - windows are a second long, or long enough for one request at rates below one per second
+# - acquire() blocks until a request may be sent, waiting for the next window when this one is spent
+class RateLimiter:
+
+    def __init__(self, rate, name='default'):
+        self.rate = float(rate)
+        self.window = max(1.0, 1 / self.rate)
+        self.limit = max(1, int(self.rate * self.window))
+        self.prefix = f"rate-limit:{name}:"
+
+    def acquire(self):
+        while True:
+            now = time.time()
+            window = int(now // self.window)
+            key = f"{self.prefix}{window}"
+            cache.add(key, 0, timeout=int(self.window) + 1)
+            try:
+                if cache.incr(key) <= self.limit:
+                    return
+            except ValueError:
+                # the window's key expired between add & incr
+                continue
+            time.sleep((window + 1) * self.window - now)
@@ -0,0 +1,80 @@
+import base64
+import hashlib
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+import plaid
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+from banking.views.webhook_view import WebhookVerificationError
+
+# Local Plaid webhook simulator
+# - signs webhooks the way plaid does, with a throwaway P-256 key
+# - installed() answers the receiver's key lookups in this process only,
+#   nothing is written to the shared key cache, so no other process trusts the key
+# - it can also stand in for the plaid client, so tests run the receiver's real key lookup
+#   (& its caching, against the test cache)
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+class WebhookSimulator:
+
+    def __init__(self):
+        self.private_key = ec.generate_private_key(ec.SECP256R1())
+        self.key_id = str(uuid.uuid4())
+        self.expired_at = None
+        self.lookups = []
+
+    # the JWK plaid's /webhook_verification_key/get would return
+    def verification_key(self):
+        numbers = self.private_key.public_key().public_numbers()
+        return {
+            'alg': 'ES256', 'crv': 'P-256', 'kid': self.key_id, 'kty': 'EC', 'use': 'sig',
+            'x': _b64url(numbers.x.to_bytes(32, 'big')),
+            'y': _b64url(numbers.y.to_bytes(32, 'big')),
+            'created_at': int(time.time()), 'expired_at': self.expired_at,
+        }
+
+    # stands in for the plaid client's key endpoint, unknown key ids get plaid's 400
+    def webhook_verification_key_get(self, request):
+        self.lookups.append(request.key_id)
+        if request.key_id != self.key_id:
+            raise plaid.ApiException(status=400, reason="INVALID_WEBHOOK_VERIFICATION_KEY_ID")
+        return SimpleNamespace(key=SimpleNamespace(to_dict=self.verification_key))
+
+    # the receiver's key lookup, without plaid or the cache
+    def get_verification_key(self, key_id):
+        if key_id != self.key_id:
+            raise WebhookVerificationError("Unknown verification key.")
+        return self.verification_key()
+
+    @contextmanager
+    def installed(self):
+        with mock.patch('banking.views.webhook_view.get_verification_key', self.get_verification_key):
+            yield self
+
+    # webhook body for a payload
+    def body(self, webhook_type='TRANSACTIONS', webhook_code='SYNC_UPDATES_AVAILABLE', item_id=None, **fields):
+        payload = {'webhook_type': webhook_type, 'webhook_code': webhook_code, 'item_id': item_id, 'environment': 'sandbox'}
+        payload.update(fields)
+        return json.dumps(payload).encode('utf-8')
+
+    # the Plaid-Verification JWT for a body
+    # - header & claims can be overridden to build bad tokens
+    def sign(self, body, issued_at=None, header=None, claims=None):
+        header = header if header is not None else {'alg': 'ES256', 'kid': self.key_id, 'typ': 'JWT'}
+        claims = claims if claims is not None else {
+            'iat': int(time.time()) if issued_at is None else issued_at,
+            'request_body_sha256': hashlib.sha256(body).hexdigest(),
+        }
+        header_b64 = _b64url(json.dumps(header).encode('utf-8'))
+        claims_b64 = _b64url(json.dumps(claims).encode('utf-8'))
+        der = self.private_key.sign(f"{header_b64}.{claims_b64}".encode('ascii'), ec.ECDSA(hashes.SHA256()))
+        r, s = decode_dss_signature(der)
+        return f"{header_b64}.{claims_b64}.{_b64url(r.to_bytes(32, 'big') + s.to_bytes(32, 'big'))}"
@@ -1,2 +1,3 @@
 from .plaid_client import *
-from .bank_account_view import *
\ No newline at end of file
+from .bank_account_view import *
+from .webhook_view import *
\ No newline at end of file
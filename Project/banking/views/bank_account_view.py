@@ -1,13 +1,93 @@
 from django.http import JsonResponse
 from banking.views.plaid_client import get_plaid_client
-from banking.models import BankAccount
+from banking.models import BankAccount, PlaidItem, index_account_id
+from banking.balances import default_range, downsample_series, net_worth_series, record_snapshots, to_decimal
+from analytics.engine import parse_max_points
+from banking.utils import run_per_item
 from plaid.model.accounts_get_request import AccountsGetRequest
 from datetime import datetime
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST, require_GET
 from django.views.decorators.csrf import csrf_protect
 
+# store one plaid item's new accounts & refresh the balances of known ones
+# - also records today's balance snapshot of every account, returns how many accounts were added
+def sync_item_accounts(item):
+    client = get_plaid_client()
+
+    # fetch accounts from api
+    request_data = AccountsGetRequest(access_token=item.access_token)
+    response = client.accounts_get(request_data)
+    plaid_accounts = response.to_dict().get("accounts", [])
+
+    # compare blind indexes so no stored account has to be decrypted
+    existing_accounts = BankAccount.objects.filter(user_id=item.user_id).by_account_index()
+    new_accounts = []
+    updated_accounts = []
+
+    account_type_mapping = {
+        "depository": {"checking": "Checking", "savings": "Savings"},
+        "credit": "Credit Card",
+        "loan": "Loan",
+        "investment": "Investment",
+        "other": "Other",
+    }
+
+    # collect account data
+    for account in plaid_accounts:
+        account_id = account["account_id"]
+        account_id_index = index_account_id(account_id)
+        balance = to_decimal(account["balances"]["current"])
+
+        # known account, only its balance changes
+        existing = existing_accounts.get(account_id_index)
+        if existing is not None:
+            if balance is not None:
+                existing.balance = str(balance)
+                existing.last_synced = timezone.now() # bulk_update skips auto_now
+                updated_accounts.append(existing)
+            continue
+
+        plaid_type = account["type"]
+        plaid_subtype = account.get("subtype", "")
+
+        account_type = account_type_mapping.get(plaid_type, "Other")
+        if isinstance(account_type, dict):
+            account_type = account_type.get(plaid_subtype, "Other")
+
+        # create account model
+        new_accounts.append(
+            BankAccount(
+                user_id=item.user_id,
+                bank_name=account.get("official_name", "Unknown Bank"),
+                account_name=account.get("name", ""),
+                account_id=account_id,
+                account_id_index=account_id_index, # bulk_create skips save()
+                account_type=account_type,
+                balance=None if balance is None else str(balance),
+                currency=account["balances"].get("iso_currency_code", "GBP"),
+                last_synced=datetime.utcnow(),
+                is_active=True
+            )
+        )
+
+    # save to database
+    with db_transaction.atomic():
+        BankAccount.objects.bulk_create(new_accounts)
+        BankAccount.objects.bulk_update(updated_accounts, ['balance', 'last_synced'])
+
+        # today's balances, so balance history never needs plaid
+        record_snapshots(item.user_id, {
+            account.id: to_decimal(account.balance) for account in new_accounts + updated_accounts if account.id is not None
+        })
+
+    return len(new_accounts)
+
 # sync bank account data from api
+# - every linked item is fetched at once, see run_per_item
 @login_required
 @require_POST
 def sync_bank_accounts(request):
@@ -16,89 +96,78 @@ def sync_bank_accounts(request):
 
     # connect to api
     try:
-        client = get_plaid_client()
-        access_token = request.user.plaid_access_token
-        if not access_token:
+        items = list(PlaidItem.objects.filter(user=request.user))
+        if not items:
             return JsonResponse({"error": "Access token not found for user."}, status=400)
 
-        # fetch accounts from api
-        request_data = AccountsGetRequest(access_token=access_token)
-        response = client.accounts_get(request_data)
-        plaid_accounts = response.to_dict().get("accounts", [])
-
-        existing_accounts = set(BankAccount.objects.filter(user=request.user).values_list('account_id', flat=True))
-        new_accounts = []
+        results = run_per_item(sync_item_accounts, items)
+        errors = [str(result) for _, result in results if isinstance(result, Exception)]
+        if len(errors) == len(items):
+            return JsonResponse({"error": errors[0]}, status=500)
 
-        account_type_mapping = {
-            "depository": {"checking": "Checking", "savings": "Savings"},
-            "credit": "Credit Card",
-            "loan": "Loan",
-            "investment": "Investment",
-            "other": "Other",
-        }
-
-        # collect account data
-        for account in plaid_accounts:
-            account_id = account["account_id"]
-            if account_id not in existing_accounts:
-                plaid_type = account["type"]
-                plaid_subtype = account.get("subtype", "")
-
-                account_type = account_type_mapping.get(plaid_type, "Other")
-                if isinstance(account_type, dict):
-                    account_type = account_type.get(plaid_subtype, "Other")
-
-                # create account model
-                new_accounts.append(
-                    BankAccount(
-                        user=request.user,
-                        bank_name=account.get("official_name", "Unknown Bank"),
-                        account_name=account.get("name", ""),
-                        account_id=account_id,
-                        account_type=account_type,
-                        balance=str(account["balances"]["current"]),
-                        currency=account["balances"].get("iso_currency_code", "GBP"),
-                        last_synced=datetime.utcnow(),
-                        is_active=True
-                    )
-                )
-
-        # save to database
-        BankAccount.objects.bulk_create(new_accounts)
-
-        return JsonResponse({"success": f"{len(new_accounts)} accounts synced."})
+        synced = sum(result for _, result in results if not isinstance(result, Exception))
+        return JsonResponse({"success": f"{synced} accounts synced.", "errors": errors})
 
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
     
 # get account balance from database
+# - with start and/or end (YYYY-MM-DD) a net worth series from stored snapshots is included
 @login_required
 @require_GET
 def get_account_balance(request):
     if not request.user.is_authenticated:
         return JsonResponse({"error": "User is not authenticated."}, status=401)
 
+    # validate the optional date range
+    series_range = None
+    if 'start' in request.GET or 'end' in request.GET:
+        default_start, default_end = default_range()
+        try:
+            start = parse_date(request.GET['start']) if request.GET.get('start') else default_start
+            end = parse_date(request.GET['end']) if request.GET.get('end') else default_end
+        except ValueError:
+            start = end = None
+        if start is None or end is None or start > end:
+            return JsonResponse({"error": "Invalid date range."}, status=400)
+        series_range = (start, end)
+
+    # optional downsampling of the net worth series
+    try:
+        max_points = parse_max_points(request.GET.get('max_points'))
+    except ValueError:
+        return JsonResponse({"error": "max_points must be a number of at least 3."}, status=400)
+
     # fetch bank account data
     try:
         accounts = BankAccount.objects.filter(user=request.user)
         if not accounts.exists():
             return JsonResponse({"message": "No accounts detected."})
         
+        # decrypt columns in bulk
+        rows = accounts.decrypted_values(
+            'id', 'bank_name', 'account_name', 'account_type', 'balance', 'currency', 'last_synced', 'is_active'
+        )
+
         accounts_list = [
             {
-                "id": acc.id,
-                "bank_name": acc.bank_name,
-                "account_name": acc.account_name,
-                "account_type": acc.account_type,
-                "balance": acc.decrypted_balance,
-                "currency": acc.currency,
-                "last_synced": acc.last_synced.isoformat(),
-                "is_active": acc.is_active,
+                "id": acc['id'],
+                "bank_name": acc['bank_name'],
+                "account_name": acc['account_name'],
+                "account_type": acc['account_type'],
+                "balance": None if acc['balance'] is None else float(acc['balance']),
+                "currency": acc['currency'],
+                "last_synced": acc['last_synced'].isoformat(),
+                "is_active": acc['is_active'],
             }
-            for acc in accounts
+            for acc in rows
         ]
 
-        return JsonResponse({"accounts": accounts_list})
+        response = {"accounts": accounts_list}
+        if series_range:
+            net_worth = net_worth_series(request.user, *series_range)
+            response["net_worth"] = downsample_series(net_worth, max_points) if max_points else net_worth
+        return JsonResponse(response)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
     
@@ -114,4 +183,26 @@ def delete_bank_account(request, account_id):
     except BankAccount.DoesNotExist:
         return JsonResponse({'error': 'Bank account not found'}, status=404)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+# progress of loading newly linked banks' history, polled by the home page
+@login_required
+@require_GET
+def get_backfill_status(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "User is not authenticated."}, status=401)
+
+    items = PlaidItem.objects.filter(user=request.user).values(
+        'id', 'institution_name', 'backfill_status', 'backfill_loaded'
+    )
+    items = [
+        {
+            "id": item['id'],
+            "institution": item['institution_name'] or "Bank",
+            "status": item['backfill_status'],
+            "loaded": item['backfill_loaded'],
+        }
+        for item in items
+    ]
+    loading = any(item['status'] in ('pending', 'running') for item in items)
+    return JsonResponse({"items": items, "loading": loading})
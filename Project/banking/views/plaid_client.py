@@ -1,5 +1,3 @@
-from plaid.api import plaid_api
-import plaid
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
@@ -10,32 +8,30 @@ from plaid.model.link_token_create_request import LinkTokenCreateRequest
 from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
 from plaid.model.products import Products
 from plaid.model.country_code import CountryCode
-from plaid.api_client import ApiClient
+from banking.models import PlaidItem
+from banking.utils import get_shared_plaid_client
+from Project.celery import enqueue
 
 
-# initialise plaid client
+# plaid client, shared by the whole process so connections are reused
 def get_plaid_client():
-    configuration = plaid.Configuration(
-        host=plaid.Environment.Sandbox,
-        api_key={
-            "clientId": settings.PLAID_CLIENT_ID,
-            "secret": settings.PLAID_SECRET,
-        },
-    )
-    api_client = ApiClient(configuration)
-    return plaid_api.PlaidApi(api_client)
+    return get_shared_plaid_client()
 
 
 # create link token
 @require_GET
 def create_link_token(request):
     plaid_client = get_plaid_client()
+    link_options = {}
+    if settings.PLAID_WEBHOOK_URL:
+        link_options['webhook'] = settings.PLAID_WEBHOOK_URL
     request_data = LinkTokenCreateRequest(
         user={"client_user_id": str(request.user.id if request.user.is_authenticated else "guest_user")},
         client_name="Finance App",
         products=[Products("auth"), Products("transactions")],
         country_codes=[CountryCode("GB")],
         language="en",
+        **link_options,
     )
     response = plaid_client.link_token_create(request_data)
     return JsonResponse({"link_token": response.link_token})
@@ -61,8 +57,42 @@ def exchange_public_token(request):
             return JsonResponse({"success": False, "error": "Access token not received."}, status=400)
 
         if request.user.is_authenticated:
-            request.user.plaid_access_token = access_token
-            request.user.save()
+            # imported here as they import this module
+            from banking.views.bank_account_view import sync_item_accounts
+            from transactions.tasks import backfill_item_history
+
+            # each linked bank is its own item, relinking one starts it from its full history
+            # - an item belongs to the user who linked it, another user's link is refused
+            #   rather than moving the item & its access token to them
+            if PlaidItem.objects.filter(item_id=exchange_response.item_id).exclude(user=request.user).exists():
+                return JsonResponse({"success": False, "error": "This bank is linked to another account."}, status=409)
+
+            institution = data.get("institution") or {}
+            item, _ = PlaidItem.objects.update_or_create(
+                item_id=exchange_response.item_id,
+                user=request.user,
+                defaults={
+                    "access_token": access_token,
+                    "institution_id": institution.get("institution_id"),
+                    "institution_name": institution.get("name"),
+                    "status": "active",
+                    "error": None,
+                    "cursor": None,
+                    "last_synced_at": None,
+                    "backfill_status": "pending",
+                    "backfill_loaded": 0,
+                },
+            )
+
+            # accounts first, transactions are matched to them as they are stored
+            # - the history loads in the background so the app can be used straight away
+            # - without a broker the item stays pending & the next scheduled sync queues it
+            sync_item_accounts(item)
+            if not enqueue(backfill_item_history, (item.id,)):
+                return JsonResponse({
+                    "success": True,
+                    "message": "Access token saved, your history will load with the next scheduled sync.",
+                })
             return JsonResponse({"success": True, "message": "Access token saved successfully!"})
         else:
             return JsonResponse({"success": False, "error": "User is not authenticated."}, status=401)
@@ -0,0 +1,202 @@
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.conf import settings
+from django.core.cache import cache
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+from plaid.model.webhook_verification_key_get_request import WebhookVerificationKeyGetRequest
+from banking.models import PlaidItem
+from banking.views.plaid_client import get_plaid_client
+from Project.celery import enqueue
+import base64
+import hashlib
+import hmac
+import json
+import plaid
+import re
+import time
+
+# webhook codes that mean new transaction data is ready
+SYNC_WEBHOOK_CODES = {'SYNC_UPDATES_AVAILABLE', 'DEFAULT_UPDATE', 'INITIAL_UPDATE', 'HISTORICAL_UPDATE'}
+
+# plaid rejects webhooks older than five minutes
+MAX_WEBHOOK_AGE = 5 * 60
+
+# key ids plaid could not give a key for are not looked up again for this long
+UNKNOWN_KEY_TIMEOUT = 10 * 60
+
+# plaid's key ids are uuids, anything else is not looked up
+KEY_ID_PATTERN = re.compile(r'[A-Za-z0-9-]{1,64}')
+
+class WebhookVerificationError(Exception):
+    pass
+
+def _b64url_decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+# new key ids looked up this minute, across processes when the cache is shared
+# - caps the plaid calls unauthenticated requests can cause with made up key ids
+def _allow_key_lookup():
+    window = f"plaid-webhook-key-lookups:{int(time.time() // 60)}"
+    cache.add(window, 0, timeout=120)
+    try:
+        return cache.incr(window) <= settings.PLAID_WEBHOOK_KEY_LOOKUPS_PER_MINUTE
+    except ValueError:
+        return False
+
+# fetch plaid's public key for a key id, cached until it expires
+# - key ids plaid rejects are remembered, so repeating one does not reach plaid again
+def get_verification_key(key_id):
+    cache_key = f"plaid-webhook-key:{key_id}"
+    key = cache.get(cache_key)
+    if key is not None:
+        return key
+    if cache.get(f"plaid-webhook-unknown-key:{key_id}"):
+        raise WebhookVerificationError("Unknown verification key.")
+    if not _allow_key_lookup():
+        raise WebhookVerificationError("Too many verification key lookups.")
+
+    try:
+        response = get_plaid_client().webhook_verification_key_get(WebhookVerificationKeyGetRequest(key_id=key_id))
+        key = response.key.to_dict()
+    except plaid.ApiException as e:
+        # a 4xx means plaid has no such key, anything else may work on plaid's retry
+        if e.status and 400 <= e.status < 500:
+            cache.set(f"plaid-webhook-unknown-key:{key_id}", True, timeout=UNKNOWN_KEY_TIMEOUT)
+        raise WebhookVerificationError("Unknown verification key.")
+    except Exception:
+        raise WebhookVerificationError("Verification key could not be fetched.")
+
+    if not key.get('expired_at'):
+        cache.set(cache_key, key, timeout=24 * 60 * 60)
+    return key
+
+# EC P-256 public key from plaid's JWK
+def _public_key(key):
+    try:
+        return ec.EllipticCurvePublicNumbers(
+            int.from_bytes(_b64url_decode(key['x']), 'big'),
+            int.from_bytes(_b64url_decode(key['y']), 'big'),
+            ec.SECP256R1(),
+        ).public_key()
+    except (KeyError, TypeError, ValueError):
+        raise WebhookVerificationError("Invalid verification key.")
+
+# check the Plaid-Verification JWT against the raw request body
+# - ES256 signature by plaid's key, issued in the last five minutes, body hash matches
+# - anything unexpected in the token is a verification error, never a server error
+def verify_webhook(body, token):
+    if not token:
+        raise WebhookVerificationError("Missing Plaid-Verification header.")
+    try:
+        header_b64, claims_b64, signature_b64 = token.split('.')
+        header = json.loads(_b64url_decode(header_b64))
+        claims = json.loads(_b64url_decode(claims_b64))
+        signature = _b64url_decode(signature_b64)
+        signed = f"{header_b64}.{claims_b64}".encode('ascii')
+    except ValueError:
+        raise WebhookVerificationError("Malformed verification token.")
+    if not isinstance(header, dict) or not isinstance(claims, dict) or len(signature) != 64:
+        raise WebhookVerificationError("Malformed verification token.")
+
+    if header.get('alg') != 'ES256':
+        raise WebhookVerificationError("Unexpected verification algorithm.")
+    key_id = header.get('kid')
+    if not isinstance(key_id, str) or not KEY_ID_PATTERN.fullmatch(key_id):
+        raise WebhookVerificationError("Invalid verification key id.")
+
+    key = get_verification_key(key_id)
+    if key.get('expired_at'):
+        raise WebhookVerificationError("Verification key has expired.")
+
+    # verify the signature
+    der_signature = encode_dss_signature(
+        int.from_bytes(signature[:32], 'big'),
+        int.from_bytes(signature[32:], 'big'),
+    )
+    try:
+        _public_key(key).verify(der_signature, signed, ec.ECDSA(hashes.SHA256()))
+    except InvalidSignature:
+        raise WebhookVerificationError("Invalid webhook signature.")
+
+    # reject replays & modified bodies
+    issued_at = claims.get('iat')
+    if not isinstance(issued_at, (int, float)) or isinstance(issued_at, bool):
+        raise WebhookVerificationError("Malformed verification token.")
+    if time.time() - issued_at > MAX_WEBHOOK_AGE:
+        raise WebhookVerificationError("Webhook is too old.")
+    body_hash = claims.get('request_body_sha256')
+    if not isinstance(body_hash, str) or not hmac.compare_digest(
+        hashlib.sha256(body).hexdigest().encode('ascii'), body_hash.encode('utf-8')
+    ):
+        raise WebhookVerificationError("Webhook body does not match its signature.")
+
+# queue one sync per item for a burst of webhooks
+# - the first webhook in a window schedules the sync, the rest are absorbed by it
+# - returns 'queued', 'coalesced' or 'unavailable' when the broker cannot be reached
+def schedule_item_sync(item):
+    # imported here as transactions.sync imports this package
+    from transactions.tasks import sync_item_transactions
+
+    window = settings.PLAID_WEBHOOK_COALESCE_SECONDS
+    coalesce_key = f"plaid-webhook-sync:{item.item_id}"
+    if cache.add(coalesce_key, True, timeout=window):
+        # forced, plaid has told us there is new data
+        if enqueue(sync_item_transactions, (item.id,), {'force': True}, countdown=window):
+            return 'queued'
+        # let plaid's retry of this webhook try again
+        cache.delete(coalesce_key)
+        return 'unavailable'
+    return 'coalesced'
+
+# act on a verified webhook payload
+def handle_webhook_event(payload):
+    webhook_type = payload.get('webhook_type')
+    webhook_code = payload.get('webhook_code')
+    item_id = payload.get('item_id')
+
+    item = PlaidItem.objects.filter(item_id=item_id).first() if item_id else None
+    if item is None:
+        return {"status": "ignored", "reason": "Unknown item."}
+
+    if webhook_type == 'TRANSACTIONS' and webhook_code in SYNC_WEBHOOK_CODES:
+        return {"status": schedule_item_sync(item)}
+
+    # record item errors so they can be shown & syncing can be repaired
+    if webhook_type == 'ITEM' and webhook_code == 'ERROR':
+        error = payload.get('error') or {}
+        item.status = 'error'
+        item.error = error.get('error_code') or 'ERROR'
+        item.save(update_fields=['status', 'error'])
+        return {"status": "recorded"}
+
+    if webhook_type == 'ITEM' and webhook_code == 'LOGIN_REPAIRED':
+        item.status = 'active'
+        item.error = None
+        item.save(update_fields=['status', 'error'])
+        schedule_item_sync(item)
+        return {"status": "recorded"}
+
+    return {"status": "ignored"}
+
+# receive plaid webhooks
+@csrf_exempt
+@require_POST
+def plaid_webhook(request):
+    if settings.PLAID_WEBHOOK_VERIFY:
+        try:
+            verify_webhook(request.body, request.headers.get('Plaid-Verification'))
+        except WebhookVerificationError as e:
+            return JsonResponse({"error": str(e)}, status=401)
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON body."}, status=400)
+
+    # a non-200 answer makes plaid send the webhook again later
+    result = handle_webhook_event(payload)
+    return JsonResponse(result, status=503 if result["status"] == "unavailable" else 200)
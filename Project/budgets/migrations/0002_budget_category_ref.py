@@ -0,0 +1,34 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+from accounts.utils.blind_index import blind_index
+
+
+# point budgets at their category row, adding rows for names without one
+def encode_budget_categories(apps, schema_editor):
+    Budget = apps.get_model('budgets', 'Budget')
+    Category = apps.get_model('transactions', 'Category')
+    for budget in Budget.objects.exclude(category=''):
+        name_index = blind_index(budget.category, 'category')
+        category, _ = Category.objects.get_or_create(
+            user_id=budget.user_id, name_index=name_index, defaults={'name': budget.category}
+        )
+        Budget.objects.filter(id=budget.id).update(category_ref=category)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_category_table'),
+        ('budgets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='category_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='budgets', to='transactions.category'),
+        ),
+        migrations.RunPython(encode_budget_categories, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from accounts.models import CustomUser
-from transactions.models import Transaction
+from django.db.models import Sum
+from transactions.models import Category, Transaction
+from transactions.categories import category_tree
 from django.utils.timezone import now
 from django.core.validators import MinValueValidator
 from decimal import Decimal
@@ -13,21 +15,22 @@ class Budget(models.Model):
     target_amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
     time_period = models.CharField(max_length=10, choices=[("weekly", "Weekly"), ("monthly", "Monthly"), ("annually", "Annually")])
     category = models.CharField(max_length=255)
+    category_ref = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='budgets')
     created_date = models.DateField(auto_now_add=True)
     last_reset_date = models.DateField(default=now)
 
+    # spending in the budget's category & its detailed categories
+    # - an indexed lookup on the transactions' category ids, nothing is decrypted
+    def spending(self):
+        if self.category_ref_id is None:
+            return Transaction.objects.none()
+        return Transaction.objects.filter(
+            user_id=self.user_id, is_received=False, category_ref__in=category_tree([self.category_ref_id])
+        )
+
     # find current amount
     def get_current_amount(self):
-        all_transactions = Transaction.objects.filter(user=self.user)
-        
-        # filter transactions
-        filtered_transactions = [
-            t for t in all_transactions 
-            if t.category == self.category and t.is_received == False
-        ]
-
-        # calc total spent
-        total_spent = sum(abs(float(t.amount)) for t in filtered_transactions)
+        total_spent = self.spending().aggregate(total=Sum('abs_amount'))['total'] or Decimal('0')
         return min(total_spent, self.target_amount)
     
     def save(self, *args, **kwargs):
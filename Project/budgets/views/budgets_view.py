@@ -6,7 +6,8 @@ from django.views.decorators.http import require_POST, require_GET
 import json
 from alerts.models import Message
 from budgets.models import Budget
-from transactions.models import Transaction
+from transactions.categories import resolve_categories
+from django.db.models import Count, Sum
 from django.utils import timezone
 from decimal import Decimal
 
@@ -54,7 +55,8 @@ def add_budget(request):
             name=data['name'],
             target_amount=float(data['target_amount']),
             time_period=data['time_period'],
-            category=data['category']
+            category=data['category'],
+            category_ref_id=resolve_categories(request.user.id, [data['category']]).get(data['category'])
         )
 
         return JsonResponse({'success': True, 'budget': {
@@ -94,6 +96,7 @@ def edit_budget(request, budget_id):
         data = json.loads(request.body)
         for field in ['name', 'target_amount', 'time_period', 'category']:
             setattr(budget, field, float(data[field]) if 'amount' in field else data[field])
+        budget.category_ref_id = resolve_categories(request.user.id, [budget.category]).get(budget.category)
         budget.save()
         return JsonResponse({"message": "Budget updated successfully", "current_amount": float(budget.current_amount)})
     except Exception as e:
@@ -126,15 +129,11 @@ def update_budget_progress(request, budget_id):
             budget.last_reset_date = today
             budget.save()
 
-        transactions = Transaction.objects.filter(user=request.user)
-
-        filtered_transactions = [
-            x for x in transactions
-            if x.category == budget.category and not x.is_received and x.date >= budget.last_reset_date
-        ]
-        
-        # calculate total spent
-        total_spent = sum(abs(Decimal(t.amount)) for t in filtered_transactions)
+        # calculate total spent since the last reset
+        spent = budget.spending().filter(date__gte=budget.last_reset_date).aggregate(
+            total=Sum('abs_amount'), count=Count('id')
+        )
+        total_spent = spent['total'] or Decimal('0')
 
         # update budget values if needed
         if budget.current_amount != min(total_spent, budget.target_amount):
@@ -158,7 +157,7 @@ def update_budget_progress(request, budget_id):
         return JsonResponse({
             'success': True, 
             'current_amount': float(budget.current_amount),
-            'total_transactions': len(filtered_transactions),
+            'total_transactions': spent['count'],
             'total_spent': total_spent,
             'is_approaching_limit': is_approaching_limit,
         })
@@ -16,12 +16,12 @@ async function initializePlaid() {
     }
 }
 // loads all data after successful bank connection
-async function handlePlaidSuccess(public_token) {
+async function handlePlaidSuccess(public_token, metadata) {
     try {
         const response = await fetch('/exchange-public-token/', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ public_token }),
+            body: JSON.stringify({ public_token, institution: metadata?.institution }),
         });
 
         if (!response.ok) throw new Error('Failed to save access token.');
@@ -78,17 +78,6 @@ function renderBalances(accounts) {
 // ===========================
 // fetch transactions
 // ===========================
-// Get all transactions for graph
-async function getAllTransactionsInsights() {
-    try {
-        const response = await fetch('/get-all-transactions-insights/');
-        const data = await response.json();
-        return data.transactions;
-    } catch (error) {
-        console.error('Error fetching transactions:', error);
-    }
-}
-
 async function fetchTransactions() {
     try {
         const { transactions } = await fetchData('/get-all-transactions/');
@@ -255,6 +244,17 @@ async function fetchData(url) {
     return await response.json();
 }
 
+// local YYYY-MM-DD, toISOString would shift the day to UTC
+function toISODate(date) {
+    const pad = value => String(value).padStart(2, '0');
+    return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+}
+
+function fromISODate(value) {
+    const [year, month, day] = value.split('-').map(Number);
+    return new Date(year, month - 1, day);
+}
+
 function getCSRFToken() {
     return document.cookie.split('; ').reduce((acc, cookie) => {
         const [key, value] = cookie.split('=');
@@ -353,6 +353,33 @@ async function loadAllData() {
     if (document.getElementById('balance-container')) showBalance();
 }
 
+// ===========================
+// History Backfill Progress
+// ===========================
+// poll while a newly linked bank's history loads, then reload the data
+async function pollBackfillStatus() {
+    const statusEl = document.getElementById('backfill-status');
+    try {
+        const { items, loading } = await fetchData('/backfill-status/');
+        if (!loading) {
+            if (statusEl && !statusEl.classList.contains('hidden')) {
+                statusEl.classList.add('hidden');
+                await loadAllData();
+            }
+            return;
+        }
+
+        const loaded = items.reduce((total, item) => total + item.loaded, 0);
+        if (statusEl) {
+            statusEl.textContent = `Loading transaction history... ${loaded} transactions so far`;
+            statusEl.classList.remove('hidden');
+        }
+        setTimeout(pollBackfillStatus, 3000);
+    } catch (err) {
+        handleError('Error checking history progress', err);
+    }
+}
+
 // check token
 document.addEventListener('DOMContentLoaded', async () => {
     try {
@@ -573,53 +600,30 @@ document.getElementById('transaction-type').addEventListener('change', (e) => {
 
 // create bar chart
 async function createBarChart() {
-    const transactions = await getAllTransactionsInsights();
-    const dailySpending = {};
-
-    // find the date last week
-    const sevenDaysAgo = new Date();
-    sevenDaysAgo.setDate(sevenDaysAgo.getDate() - 7);
-
-    // filter and sum amounts
-    transactions.forEach((transaction) => {
-        const date = new Date(transaction.date);
-        
-        // only consider this weeks transactions
-        if (date >= sevenDaysAgo) {
-            const formattedDate = date.toLocaleDateString('default', { 
-                month: 'short', 
-                day: 'numeric' 
-            });
-
-            if (!dailySpending[formattedDate]) {
-                dailySpending[formattedDate] = 0;
-            }
-            
-            // only add spend transactions
-            if (!transaction.is_received) {
-                dailySpending[formattedDate] += Math.abs(transaction.amount);
-            }
-        }
+    // daily spending for the last 7 days, bucketed by the server
+    const sixDaysAgo = new Date();
+    sixDaysAgo.setDate(sixDaysAgo.getDate() - 6);
+    const params = new URLSearchParams({
+        start: toISODate(sixDaysAgo),
+        end: toISODate(new Date()),
+        granularity: 'day',
+        group_by: 'direction',
     });
 
-    // show daa for all 7 days
-    const last7Days = [];
-    for (let i = 6; i >= 0; i--) {
-        const date = new Date();
-        date.setDate(date.getDate() - i);
-        const formattedDate = date.toLocaleDateString('default', { 
-            month: 'short', 
-            day: 'numeric' 
-        });
-        
-        last7Days.push({
-            date: formattedDate,
-            spending: dailySpending[formattedDate] || 0
-        });
+    let series;
+    try {
+        series = await fetchData(`/spending-series/?${params}`);
+    } catch (error) {
+        console.error('Error fetching spending series:', error);
+        return;
     }
+    const spending = series.series.find(group => group.name === 'spending');
 
-    const labels = last7Days.map(day => day.date);
-    const data = last7Days.map(day => day.spending);
+    const labels = series.labels.map(day => fromISODate(day).toLocaleDateString('default', {
+        month: 'short',
+        day: 'numeric'
+    }));
+    const data = spending ? spending.values : labels.map(() => 0);
 
     // format bars
     const generateColors = (count) => {
@@ -726,6 +730,7 @@ document.addEventListener("DOMContentLoaded", async () => {
         connectSection.style.display = "none";
         appContent.classList.remove("hidden");
         await loadAllData();
+        pollBackfillStatus();
     } else {
         connectSection.style.display = "flex";
         appContent.classList.add("hidden");
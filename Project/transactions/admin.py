@@ -1,3 +1,12 @@
 from django.contrib import admin
+from transactions.models import SyncLog
 
-# Register your models here.
+# per item outcomes of fleet syncs
+class SyncLogAdmin(admin.ModelAdmin):
+    model = SyncLog
+
+    list_display = ('run_id', 'user', 'item', 'status', 'submitted', 'duration_ms', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('run_id',)
+
+admin.site.register(SyncLog, SyncLogAdmin)
@@ -0,0 +1,66 @@
+from collections import Counter
+from django.db.models import F, Q
+from accounts.utils.blind_index import blind_index
+from transactions.models import Category
+
+# Per-user category table
+# - each category name is stored once per user, transactions & budgets point at it by id,
+#   so category filters & budget totals are integer lookups instead of decrypting rows
+# - every path that adds, edits or removes transactions reports the change here,
+#   so listing categories never scans or decrypts transactions
+
+# names differing only in case or surrounding spaces are one category
+def normalize_category(name):
+    return name.strip().casefold()
+
+def category_index(name):
+    return blind_index(normalize_category(name), 'category')
+
+# ids for category names, creating the ones the user does not have yet
+# - `parents` maps a detailed category name to its primary category name
+# - a new category keeps the first spelling seen, every spelling maps to its id
+def resolve_categories(user_id, names, parents=None):
+    parents = parents or {}
+    names = {name for name in set(names) | set(parents.values()) if name}
+    wanted = {category_index(name): name for name in names}
+    if not wanted:
+        return {}
+
+    ids = dict(Category.objects.filter(user_id=user_id, name_index__in=wanted).values_list('name_index', 'id'))
+
+    # primary categories first so detailed ones can point at them
+    # - ignore_conflicts covers a concurrent insert of the same name
+    for detailed in (False, True):
+        missing = [
+            Category(
+                user_id=user_id, name=name, name_index=index,
+                parent_id=ids[category_index(parents[name])] if detailed else None,
+            )
+            for index, name in wanted.items() if index not in ids and (name in parents) == detailed
+        ]
+        if missing:
+            Category.objects.bulk_create(missing, ignore_conflicts=True)
+            ids.update(Category.objects.filter(
+                user_id=user_id, name_index__in=[category.name_index for category in missing]
+            ).values_list('name_index', 'id'))
+
+    return {name: ids[category_index(name)] for name in names}
+
+# ids of categories & their detailed categories, for category_ref__in filters
+# - `category_ids` can be a list or a values('id') queryset
+def category_tree(category_ids):
+    return Category.objects.filter(Q(id__in=category_ids) | Q(parent_id__in=category_ids)).values('id')
+
+# category_ref filter for a category name, matches nothing if the user does not have it
+def category_filter(user_id, name):
+    named = Category.objects.filter(user_id=user_id, name_index=category_index(name)).values('id')
+    return Q(category_ref__in=category_tree(named))
+
+# apply count changes for a user, `changes` maps category name -> +/- count
+def adjust_category_counts(user_id, changes):
+    changes = {name: delta for name, delta in Counter(changes).items() if name and delta}
+    if not changes:
+        return
+
+    for name, category_id in resolve_categories(user_id, changes).items():
+        Category.objects.filter(id=category_id).update(transaction_count=F('transaction_count') + changes[name])
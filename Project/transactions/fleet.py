@@ -0,0 +1,79 @@
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from banking.models import PlaidItem
+from banking.utils import run_per_item
+from transactions.models import SyncLog
+from transactions.sync import sync_item
+
+# Fleet syncing
+# - incremental syncs for every linked item, run by the sync_all_items command & sync_fleet task
+# - items are sharded across a thread pool in chunks, plaid requests share the fleet rate limit
+# - each item still syncs at most once at a time (sync_item's lock) & outcomes go to SyncLog
+
+# running history loads whose worker stopped without finishing
+# - a running load marks backfill_seen_at when an attempt starts & after every page, so one unseen
+#   for longer than a sync lease plus a retry wait is no longer running & counts as pending
+def stalled_backfills():
+    cutoff = timezone.now() - timedelta(seconds=settings.PLAID_SYNC_LOCK_TIMEOUT + settings.PLAID_SYNC_RETRY_SECONDS)
+    return PlaidItem.objects.filter(
+        Q(backfill_seen_at__isnull=True) | Q(backfill_seen_at__lt=cutoff), backfill_status='running'
+    )
+
+# active items not synced since the given time (all active items without one)
+# - items still loading their history are left to the backfill task, stalled loads
+#   included, they count as pending & sync_fleet queues them again
+def stale_items(since=None):
+    items = PlaidItem.objects.filter(status='active').exclude(backfill_status__in=('pending', 'running'))
+    if since is not None:
+        items = items.filter(Q(last_synced_at__isnull=True) | Q(last_synced_at__lt=since))
+    return items.order_by('id')
+
+# sync one item & describe the outcome as an unsaved log row
+def _sync_and_log(item, run_id, force):
+    start = time.perf_counter()
+    result = sync_item(item, force=force)
+    return SyncLog(
+        run_id=run_id,
+        user_id=item.user_id,
+        item_id=item.id,
+        status="error" if "error" in result else result.get("status", "synced"),
+        submitted=result.get("submitted", 0),
+        error=result.get("error"),
+        duration_ms=int((time.perf_counter() - start) * 1000),
+    )
+
+# sync the given items, `workers` at a time, returns (run id, counts by status)
+# - on_chunk is called with the running counts after each chunk
+def sync_items(items, workers, chunk_size=None, force=False, on_chunk=None):
+    run_id = uuid.uuid4().hex
+    chunk_size = chunk_size or workers * 50
+    counts = {}
+
+    chunk = []
+    for item in items.iterator(chunk_size=chunk_size):
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            _sync_chunk(chunk, run_id, workers, force, counts)
+            chunk = []
+            if on_chunk is not None:
+                on_chunk(counts)
+    if chunk:
+        _sync_chunk(chunk, run_id, workers, force, counts)
+        if on_chunk is not None:
+            on_chunk(counts)
+    return run_id, counts
+
+def _sync_chunk(chunk, run_id, workers, force, counts):
+    results = run_per_item(lambda item: _sync_and_log(item, run_id, force), chunk, workers=workers)
+    logs = []
+    for item, log in results:
+        # a failure outside sync_item, e.g. a lost database connection
+        if isinstance(log, Exception):
+            log = SyncLog(run_id=run_id, user_id=item.user_id, item_id=item.id, status="error", error=str(log))
+        logs.append(log)
+        counts[log.status] = counts.get(log.status, 0) + 1
+    SyncLog.objects.bulk_create(logs)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from transactions.models import Transaction
+from accounts.utils.envelope import envelope_enabled
+
+# move existing transactions between per-field and envelope storage
+# - run with --to envelope after turning ENVELOPE_ENCRYPTION on, or
+#   --to fields after turning it off
+# - rows are rewritten through bulk_update, which lays them out for the current setting
+class Command(BaseCommand):
+    help = "Convert stored transactions to envelope or per-field encryption."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', choices=['envelope', 'fields'], required=True)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        to_envelope = options['to'] == 'envelope'
+        batch_size = options['batch_size']
+        if to_envelope != envelope_enabled():
+            raise CommandError(
+                f"ENVELOPE_ENCRYPTION is {'on' if envelope_enabled() else 'off'}, "
+                f"set it to match --to {options['to']} first."
+            )
+
+        # only rows still in the other layout
+        pending = Transaction.objects.filter(envelope__isnull=to_envelope).order_by('id')
+        converted = 0
+        last_id = 0
+
+        while True:
+            batch = list(pending.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+
+            with db_transaction.atomic():
+                Transaction.objects.bulk_update(batch, ['name', 'amount', 'category'])
+
+            converted += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"{converted} transactions converted...")
+
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} transactions to {options['to']} storage."))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:59
+
+import accounts.utils.envelope
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_deletedtransaction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='envelope',
+            field=accounts.utils.envelope.EnvelopeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='amount',
+            field=accounts.utils.envelope.SealedCharField(default='0.00', null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='category',
+            field=accounts.utils.envelope.SealedTextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='name',
+            field=accounts.utils.envelope.SealedCharField(null=True),
+        ),
+    ]
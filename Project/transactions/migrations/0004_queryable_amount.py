@@ -0,0 +1,46 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:00
+
+from decimal import Decimal, InvalidOperation
+from django.db import migrations, models
+import transactions.models.transaction
+
+
+# fill the unsigned amount for existing transactions
+def backfill_abs_amount(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    batch = []
+    for txn in Transaction.objects.only('id', 'amount', 'envelope').iterator(chunk_size=1000):
+        try:
+            txn.abs_amount = abs(Decimal(str(txn.amount)))
+        except (InvalidOperation, TypeError):
+            continue
+        batch.append(txn)
+        if len(batch) >= 1000:
+            Transaction.objects.bulk_update(batch, ['abs_amount'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['abs_amount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_transaction_envelope'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='abs_amount',
+            field=transactions.models.transaction.AmountMagnitudeField(decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.RunPython(backfill_abs_amount, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'date'], name='transaction_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'bank_account', 'date'], name='transaction_user_account_idx'),
+        ),
+    ]
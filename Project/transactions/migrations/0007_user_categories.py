@@ -0,0 +1,47 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import encrypted_model_fields.fields
+from collections import Counter
+from accounts.utils.blind_index import blind_index
+
+
+# count the categories of existing transactions
+def backfill_user_categories(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    UserCategory = apps.get_model('transactions', 'UserCategory')
+    counts = Counter()
+    for txn in Transaction.objects.only('id', 'user_id', 'category', 'envelope').iterator(chunk_size=2000):
+        if txn.category:
+            counts[(txn.user_id, txn.category)] += 1
+    UserCategory.objects.bulk_create([
+        UserCategory(user_id=user_id, name=name, name_index=blind_index(name, 'category'), transaction_count=count)
+        for (user_id, name), count in counts.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transactions', '0006_synclog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', encrypted_model_fields.fields.EncryptedCharField()),
+                ('name_index', models.CharField(editable=False, max_length=64)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='categories', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'name_index')},
+            },
+        ),
+        migrations.RunPython(backfill_user_categories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from accounts.utils.blind_index import blind_index
+
+
+# point every transaction at its category row, adding rows for names without one
+def encode_transaction_categories(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Category = apps.get_model('transactions', 'Category')
+    ids = {
+        (user_id, name_index): pk
+        for pk, user_id, name_index in Category.objects.values_list('id', 'user_id', 'name_index')
+    }
+
+    batch = []
+    for txn in Transaction.objects.only('id', 'user_id', 'category', 'envelope').iterator(chunk_size=2000):
+        if not txn.category:
+            continue
+        key = (txn.user_id, blind_index(txn.category, 'category'))
+        if key not in ids:
+            ids[key] = Category.objects.create(user_id=txn.user_id, name=txn.category, name_index=key[1]).id
+        txn.category_ref_id = ids[key]
+        batch.append(txn)
+        if len(batch) >= 2000:
+            Transaction.objects.bulk_update(batch, ['category_ref'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['category_ref'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transactions', '0007_user_categories'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='UserCategory',
+            new_name='Category',
+        ),
+        migrations.AlterModelOptions(
+            name='category',
+            options={'verbose_name_plural': 'categories'},
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='transactions.category'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='category_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='transactions.category'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category_ref', 'date'], name='transaction_user_category_idx'),
+        ),
+        migrations.RunPython(encode_transaction_categories, migrations.RunPython.noop),
+    ]
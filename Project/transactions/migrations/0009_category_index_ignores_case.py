@@ -0,0 +1,75 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import migrations
+from django.db.models.functions import Coalesce
+from accounts.utils.blind_index import blind_index
+
+
+# categories are indexed ignoring case & surrounding spaces, as transactions.categories.category_index
+# - categories that now share an index are merged into the oldest one, the users' rollups are rebuilt
+def merge_categories_ignoring_case(apps, schema_editor):
+    Category = apps.get_model('transactions', 'Category')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Budget = apps.get_model('budgets', 'Budget')
+    SpendingRollup = apps.get_model('analytics', 'SpendingRollup')
+
+    groups = defaultdict(list)
+    for category in Category.objects.order_by('id').iterator(chunk_size=2000):
+        groups[(category.user_id, blind_index(category.name.strip().casefold(), 'category'))].append(category)
+
+    merged_users = set()
+    for (user_id, index), (kept, *merged) in groups.items():
+        merged_ids = [category.id for category in merged]
+        updates = {'name_index': index}
+        if merged_ids:
+            Transaction.objects.filter(category_ref_id__in=merged_ids).update(category_ref_id=kept.id)
+            Budget.objects.filter(category_ref_id__in=merged_ids).update(category_ref_id=kept.id)
+            Category.objects.filter(id=kept.id, parent_id__in=merged_ids).update(parent_id=None)
+            Category.objects.filter(parent_id__in=merged_ids).update(parent_id=kept.id)
+            Category.objects.filter(id__in=merged_ids).delete()
+            updates['transaction_count'] = kept.transaction_count + sum(category.transaction_count for category in merged)
+            merged_users.add(user_id)
+        Category.objects.filter(id=kept.id).update(**updates)
+
+    if not merged_users:
+        return
+    SpendingRollup.objects.filter(user_id__in=merged_users).delete()
+    rows = Transaction.objects.filter(user_id__in=merged_users).annotate(
+        rollup_category=Coalesce('category_ref__parent_id', 'category_ref_id')
+    ).values(
+        'id', 'user_id', 'date', 'abs_amount', 'is_received', 'bank_account_id', 'rollup_category'
+    ).iterator(chunk_size=2000)
+
+    # daily & monthly count, total & largest transaction, as analytics/0001 computes them
+    buckets = {}
+    for row in rows:
+        amount = row['abs_amount'] or Decimal('0')
+        for period, start in (('day', row['date']), ('month', row['date'].replace(day=1))):
+            key = (row['user_id'], period, start, row['rollup_category'], row['bank_account_id'], row['is_received'])
+            count, total, largest, largest_id = buckets.get(key, (0, Decimal('0'), None, None))
+            if largest is None or amount > largest:
+                largest, largest_id = amount, row['id']
+            buckets[key] = (count + 1, total + amount, largest, largest_id)
+
+    rollups = []
+    for key, (count, total, largest, largest_id) in buckets.items():
+        user_id, period, start, category_id, bank_account_id, is_received = key
+        rollups.append(SpendingRollup(
+            user_id=user_id, period=period, period_start=start, category_id=category_id,
+            bank_account_id=bank_account_id, is_received=is_received,
+            transaction_count=count, total=total, max_amount=largest, max_transaction_id=largest_id,
+        ))
+    SpendingRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_category_table'),
+        ('budgets', '0002_budget_category_ref'),
+        ('analytics', '0001_spending_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_categories_ignoring_case, migrations.RunPython.noop),
+    ]
@@ -1,2 +1,4 @@
 from .transaction import Transaction
-from .deletedTransaction import DeletedTransaction
\ No newline at end of file
+from .deletedTransaction import DeletedTransaction
+from .syncLog import SyncLog
+from .category import Category
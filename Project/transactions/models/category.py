@@ -0,0 +1,24 @@
+from django.db import models
+from accounts.models.user import CustomUser
+from accounts.utils.bulk_decrypt import DecryptingQuerySet
+from encrypted_model_fields.fields import EncryptedCharField
+
+# a user's categories, each stored once & referenced by id from transactions & budgets
+# - plaid's detailed categories sit under their primary category through `parent`
+# - transaction_count is how many transactions use the category by name, kept up to date
+#   by sync & the transaction views, see transactions.categories
+class Category(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='categories')
+    name = EncryptedCharField(max_length=255)
+    name_index = models.CharField(max_length=64, editable=False) # blind index of the name ignoring case, see category_index
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    transaction_count = models.IntegerField(default=0)
+
+    objects = DecryptingQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('user', 'name_index')
+        verbose_name_plural = 'categories'
+
+    def __str__(self):
+        return f"{self.user_id} - {self.name} ({self.transaction_count})"
@@ -0,0 +1,17 @@
+from django.db import models
+from accounts.models.user import CustomUser
+from banking.models import PlaidItem
+
+# outcome of one item's sync during a fleet run, see sync_all_items
+class SyncLog(models.Model):
+    run_id = models.CharField(max_length=32, db_index=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    item = models.ForeignKey(PlaidItem, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20) # synced, fresh, reused, error ...
+    submitted = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.run_id} - {self.item_id}: {self.status}"
@@ -1,18 +1,87 @@
+from decimal import Decimal, InvalidOperation
 from django.core.exceptions import ValidationError
 from django.db import models
 from accounts.models.user import CustomUser
-from encrypted_model_fields.fields import EncryptedTextField, EncryptedCharField
+from accounts.utils.bulk_decrypt import DecryptingQuerySet
+from accounts.utils.envelope import EnvelopeField, SealedCharField, SealedTextField, get_sealed_fields, store_instance
+from transactions.models.category import Category
+
+# unsigned value of an amount, None when it is not a number
+def amount_magnitude(amount):
+    try:
+        return abs(Decimal(str(amount)))
+    except (InvalidOperation, TypeError):
+        return None
+
+# unsigned amount kept beside the ciphertext so filters & sorting run in SQL
+# - derived from `amount` whenever the row is saved or bulk created,
+#   bulk updates set it in TransactionQuerySet
+class AmountMagnitudeField(models.DecimalField):
+
+    def pre_save(self, model_instance, add):
+        value = amount_magnitude(model_instance.amount)
+        setattr(model_instance, self.attname, value)
+        return value
+
+# bulk writes that keep the envelope & abs_amount in step with the sealed fields
+# - bulk_update & update() skip pre_save, which is where both are derived
+class TransactionQuerySet(DecryptingQuerySet):
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        sealed = {field.name for field in get_sealed_fields(self.model)}
+        if not sealed & set(fields):
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+
+        # write the stored layout, then give the objects their values back
+        opened = [{name: getattr(obj, name) for name in sealed} for obj in objs]
+        written = set(fields) | {'abs_amount'}
+        for obj in objs:
+            obj.abs_amount = amount_magnitude(obj.amount)
+            written.update(store_instance(obj))
+        try:
+            return super().bulk_update(objs, written, batch_size=batch_size)
+        finally:
+            for obj, values in zip(objs, opened):
+                obj.__dict__.update(values)
+
+    # plain sealed values are written row by row through bulk_update
+    # - bulk_update's own CASE expressions come back through here & go straight to SQL
+    def update(self, **kwargs):
+        sealed = {field.name for field in get_sealed_fields(self.model)}
+        if not any(name in sealed and not hasattr(value, 'resolve_expression') for name, value in kwargs.items()):
+            return super().update(**kwargs)
+
+        rows = list(self)
+        for row in rows:
+            for name, value in kwargs.items():
+                setattr(row, name, value)
+        self.model.objects.db_manager(self.db).bulk_update(rows, list(kwargs))
+        return len(rows)
+
 
 # class to manage transactions
 class Transaction(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     bank_account = models.ForeignKey("banking.BankAccount", on_delete=models.CASCADE)
-    name = EncryptedCharField(max_length=255)
-    amount = EncryptedCharField(max_length=10, default='0.00')
+    name = SealedCharField(max_length=255, null=True)
+    amount = SealedCharField(max_length=10, default='0.00', null=True)
+    abs_amount = AmountMagnitudeField(max_digits=12, decimal_places=2, null=True, editable=False)
     date = models.DateField()
-    category = EncryptedTextField(max_length=100, blank=True, null=True)
+    category = SealedTextField(max_length=100, blank=True, null=True)
+    category_ref = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions') # most specific category, for filters & budgets
     is_received = models.BooleanField(default=False)
     transaction_id = models.CharField(max_length=255, unique=True) # plaid id
+    envelope = EnvelopeField() # name, amount & category when ENVELOPE_ENCRYPTION is on
+
+    objects = TransactionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date', 'id'], name='transaction_user_date_idx'),
+            models.Index(fields=['user', 'bank_account', 'date'], name='transaction_user_account_idx'),
+            models.Index(fields=['user', 'category_ref', 'date'], name='transaction_user_category_idx'),
+        ]
 
     # prevent negative value amounts
     def clean(self):
@@ -22,6 +91,13 @@ class Transaction(models.Model):
         except ValueError:
             raise ValidationError({'amount': 'Invalid amount value.'})
 
+    # a partial save of sealed fields has to rewrite the envelope too
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'name', 'amount', 'category'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'name', 'amount', 'abs_amount', 'category', 'envelope'}
+        super().save(*args, **kwargs)
+
     # return info as string
     def __str__(self):
         return f"{self.name} - £{self.decrypted_amount:.2f} - {self.date}"
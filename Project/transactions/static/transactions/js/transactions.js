@@ -1,5 +1,6 @@
-let currentPage = 1;
-let totalPages = 1;
+let pageNumber = 1;
+let nextCursor = null;
+let prevCursor = null;
 
 // fetch today's date
 function getTodayDate() {
@@ -7,10 +8,10 @@ function getTodayDate() {
     return today.toISOString().split('T')[0];
 }
 
-// fetch transactions
-async function fetchTransactions(page = 1) {
+// fetch transactions, an empty cursor loads the newest page
+async function fetchTransactions(cursor = '') {
     const queryParams = new URLSearchParams({
-        page,
+        cursor,
         search: document.getElementById('search-input').value || '',
         category: document.getElementById('category').value,
         start_date: document.getElementById('start_date').value || '',
@@ -25,8 +26,9 @@ async function fetchTransactions(page = 1) {
         const response = await fetch(`/get-all-transactions/?${queryParams.toString()}`);
         const data = await response.json();
         renderTransactions(data.transactions);
-        currentPage = data.page;
-        totalPages = data.total_pages;
+        nextCursor = data.next_cursor;
+        prevCursor = data.prev_cursor;
+        if (!cursor) pageNumber = 1;
         updatePaginationControls();
     } catch (error) {
         console.error('Error fetching transactions:', error);
@@ -124,9 +126,9 @@ function renderTransactions(transactions) {
 
 // update pagination
 function updatePaginationControls() {
-    document.getElementById('page-info').innerText = `Page ${currentPage} of ${totalPages}`;
-    document.getElementById('prev-page').disabled = currentPage === 1;
-    document.getElementById('next-page').disabled = currentPage === totalPages;
+    document.getElementById('page-info').innerText = `Page ${pageNumber}`;
+    document.getElementById('prev-page').disabled = !prevCursor;
+    document.getElementById('next-page').disabled = !nextCursor;
 }
 
 // add transaction to the list
@@ -296,20 +298,28 @@ document.addEventListener('DOMContentLoaded', () => {
     fetchTransactions();
 
     // update pages
-    document.getElementById('prev-page').addEventListener('click', () => fetchTransactions(currentPage - 1));
-    document.getElementById('next-page').addEventListener('click', () => fetchTransactions(currentPage + 1));
+    document.getElementById('prev-page').addEventListener('click', () => {
+        if (!prevCursor) return;
+        pageNumber -= 1;
+        fetchTransactions(prevCursor);
+    });
+    document.getElementById('next-page').addEventListener('click', () => {
+        if (!nextCursor) return;
+        pageNumber += 1;
+        fetchTransactions(nextCursor);
+    });
     document.getElementById('filter-form').addEventListener('submit', e => {
         e.preventDefault();
-        fetchTransactions(1);
+        fetchTransactions();
     });
-    document.getElementById('search-input').addEventListener('input', () => fetchTransactions(1));
+    document.getElementById('search-input').addEventListener('input', () => fetchTransactions());
     const clearFiltersBtn = document.getElementById('clear-filters-btn');
     if (clearFiltersBtn) {
         clearFiltersBtn.addEventListener('click', () => {
             const filterForm = document.getElementById('filter-form');
             filterForm.reset();
             document.getElementById('end_date').value = getTodayDate();
-            fetchTransactions(1);
+            fetchTransactions();
         });
     }
 
@@ -0,0 +1,359 @@
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from collections import Counter
+from datetime import timedelta
+from itertools import chain
+import io
+import plaid
+import uuid
+from plaid.model.transactions_sync_request import TransactionsSyncRequest
+from banking.models import BankAccount, PlaidItem, index_account_id
+from banking.utils import run_per_item
+from banking.views.plaid_client import get_plaid_client
+from analytics.rollups import forget_transactions, record_transactions
+from transactions.categories import adjust_category_counts, resolve_categories
+from transactions.models import Transaction, DeletedTransaction
+
+# when the user's data was last pulled from plaid, for staleness display
+# - the least recently synced item, so the date never overstates freshness
+def last_synced_at(user):
+    synced_at = PlaidItem.objects.filter(user=user).aggregate(oldest=Min('last_synced_at'))['oldest']
+    return synced_at.isoformat() if synced_at else None
+
+# primary & detailed category names from plaid's personal finance category
+# - detailed is None when plaid does not give one
+def plaid_category_path(txn):
+    category = txn.personal_finance_category
+    if not category or not category.primary:
+        return 'Uncategorized', None
+    primary = category.primary.replace('_', ' ')
+    detailed = (getattr(category, 'detailed', None) or '').replace('_', ' ')
+    return primary, detailed if detailed and detailed != primary else None
+
+# restarts allowed when plaid's data keeps changing during one sync
+MAX_PAGINATION_RESTARTS = 5
+
+# page through transactions/sync from a cursor, one response at a time
+# - the caller applies each page & commits its cursor before asking for the next one,
+#   so when the data changes mid pagination the request is repeated from the last
+#   committed cursor, no page already written is fetched or applied again
+def iter_sync_pages(client, access_token, start_cursor, count):
+    cursor = start_cursor
+    restarts = 0
+    while True:
+        options = {'cursor': cursor} if cursor else {}
+        try:
+            response = client.transactions_sync(
+                TransactionsSyncRequest(access_token=access_token, count=count, **options)
+            )
+        except plaid.ApiException as e:
+            if 'TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION' not in str(e.body) or restarts >= MAX_PAGINATION_RESTARTS:
+                raise
+            restarts += 1
+            continue
+        yield response
+
+        cursor = response.next_cursor
+        if not response.has_more:
+            return
+
+# Staged inserts
+# - a page's new rows are loaded into a temporary staging table & moved across in one INSERT ... SELECT
+# - the SELECT skips ids the user deleted with NOT EXISTS against the tombstones, ids already stored
+#   are skipped by ON CONFLICT DO NOTHING, so neither is looked up from python
+# - on postgres the staging table is filled with COPY, elsewhere with executemany
+# - must run inside a transaction, the staging table is emptied before it returns
+STAGE_TABLE = 'transaction_stage'
+
+def _stage_fields():
+    return [field for field in Transaction._meta.concrete_fields if not field.primary_key]
+
+# INSERT ... SELECT from the staging table, returning the plaid ids actually inserted
+def staged_insert_sql():
+    quote = connection.ops.quote_name
+    table = quote(Transaction._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in _stage_fields())
+    transaction_id = quote(Transaction._meta.get_field('transaction_id').column)
+    user_id = quote(Transaction._meta.get_field('user').column)
+    deleted = quote(DeletedTransaction._meta.db_table)
+    deleted_transaction_id = quote(DeletedTransaction._meta.get_field('transaction_id').column)
+    deleted_user_id = quote(DeletedTransaction._meta.get_field('user').column)
+    return (
+        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {STAGE_TABLE} stage "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {deleted} deleted "
+        f"WHERE deleted.{deleted_user_id} = stage.{user_id} AND deleted.{deleted_transaction_id} = stage.{transaction_id}) "
+        f"ON CONFLICT ({transaction_id}) DO NOTHING RETURNING {transaction_id}"
+    )
+
+# insert new rows, skipping ids already stored or deleted by the user
+# - returns the set of plaid ids inserted
+def insert_transactions(rows, batch_size):
+    if not rows:
+        return set()
+    if connection.vendor == 'postgresql':
+        return copy_insert_transactions(rows)
+
+    fields = _stage_fields()
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    batch_size = batch_size or len(rows)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} AS "
+            f"SELECT {columns} FROM {connection.ops.quote_name(Transaction._meta.db_table)} WHERE 1 = 0"
+        )
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(
+                f"INSERT INTO {STAGE_TABLE} ({columns}) VALUES ({placeholders})",
+                [_prep_row(row, fields) for row in rows[start:start + batch_size]],
+            )
+        cursor.execute(staged_insert_sql())
+        inserted = {row[0] for row in cursor.fetchall()}
+        cursor.execute(f"DELETE FROM {STAGE_TABLE}")
+    return inserted
+
+# values are prepared by the fields themselves, so encryption & envelopes match the ORM
+def _prep_row(row, fields):
+    return [field.get_db_prep_save(field.pre_save(row, True), connection) for field in fields]
+
+# one COPY value in postgres' text format
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+# COPY rows into the staging table, then the staged INSERT ... SELECT
+def copy_insert_transactions(rows):
+    fields = _stage_fields()
+    table = connection.ops.quote_name(Transaction._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in _prep_row(row, fields)) + '\n')
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} ON COMMIT DELETE ROWS "
+            f"AS SELECT {columns} FROM {table} WITH NO DATA"
+        )
+        cursor.copy_expert(f"COPY {STAGE_TABLE} ({columns}) FROM STDIN", buffer)
+        cursor.execute(staged_insert_sql())
+        inserted = {row[0] for row in cursor.fetchall()}
+        cursor.execute(f"DELETE FROM {STAGE_TABLE}")
+    return inserted
+
+# Single-flight syncing
+# - one sync per item at a time, held as a lease on the item's row: a conditional UPDATE takes it
+#   only when it is free or expired, so it holds across processes & hosts on any database
+# - the lease is renewed after every page & only its holder can clear it, both in one UPDATE
+# - callers that find a sync running return in_progress at once, tasks that must run re-queue
+# - a sync that finished within PLAID_SYNC_FRESHNESS_SECONDS is reused, unless forced
+
+def _recently_synced(item):
+    synced_at = item.last_synced_at
+    window = timedelta(seconds=settings.PLAID_SYNC_FRESHNESS_SECONDS)
+    return synced_at is not None and timezone.now() - synced_at < window
+
+def _lease_until():
+    return timezone.now() + timedelta(seconds=settings.PLAID_SYNC_LOCK_TIMEOUT)
+
+# take the item's sync lease, false while another sync holds it
+def acquire_sync_lock(item, token):
+    free = Q(sync_token__isnull=True) | Q(sync_lease_until__lt=timezone.now())
+    return PlaidItem.objects.filter(free, id=item.id).update(sync_token=token, sync_lease_until=_lease_until()) == 1
+
+# extend our lease, false if it ran out & another sync took it
+def renew_sync_lock(item, token):
+    return PlaidItem.objects.filter(id=item.id, sync_token=token).update(sync_lease_until=_lease_until()) == 1
+
+def release_sync_lock(item, token):
+    PlaidItem.objects.filter(id=item.id, sync_token=token).update(sync_token=None, sync_lease_until=None)
+
+class SyncLockLost(Exception):
+    pass
+
+# sync every linked item of a user
+# - items are synced at the same time, so a user waits about as long as their slowest bank
+def sync_transactions(user, force=False, batch_size=None):
+    items = list(PlaidItem.objects.filter(user=user))
+    if not items:
+        return {"error": "Access token not found for user."}
+
+    results = run_per_item(lambda item: sync_item(item, force, batch_size), items)
+    return {
+        "items": {
+            item.id: {"error": str(result)} if isinstance(result, Exception) else result
+            for item, result in results
+        }
+    }
+
+# sync one item's transactions with database, at most once at a time per item
+# - force runs a sync even if one just finished, for webhooks announcing new data
+# - progress is called with the number of rows written after each page
+def sync_item(item, force=False, batch_size=None, progress=None):
+    if not force and item.status == 'error':
+        return {"status": "needs_attention", "error": item.error}
+    if not force and _recently_synced(item):
+        return {"status": "fresh"}
+
+    token = uuid.uuid4().hex
+    if not acquire_sync_lock(item, token):
+        return {"status": "in_progress"}
+
+    try:
+        # the holder before us may have just finished
+        item.refresh_from_db(fields=['access_token', 'cursor', 'last_synced_at'])
+        if not force and _recently_synced(item):
+            return {"status": "reused"}
+        return _run_sync(item, token, batch_size, progress)
+    finally:
+        release_sync_lock(item, token)
+
+# pull changes from plaid into the database, a page at a time
+# - resumes from the item's stored cursor so only changes are downloaded
+# - each page is written with its cursor in one transaction, so an interrupted sync
+#   resumes after the last page written & memory is bounded by one page
+# - a page is only committed while our lease still holds
+def _run_sync(item, token, batch_size=None, progress=None):
+    try:
+        # connect to the API
+        client = get_plaid_client()
+        access_token = item.access_token
+        if not access_token:
+            return {"error": "Access token not found for user."}
+
+        batch_size = batch_size or settings.PLAID_SYNC_BATCH_SIZE
+        totals = {"submitted": 0, "skipped": 0, "pages": 0}
+
+        # get all bank accounts for the user, keyed by account id index
+        bank_accounts = BankAccount.objects.filter(user_id=item.user_id).by_account_index()
+
+        for response in iter_sync_pages(client, access_token, item.cursor, batch_size):
+            submitted, skipped = apply_sync_page(item, bank_accounts, response, batch_size, token)
+            totals["submitted"] += submitted
+            totals["skipped"] += skipped
+            totals["pages"] += 1
+            if progress is not None:
+                progress(submitted)
+
+        item.last_synced_at = timezone.now()
+        item.save(update_fields=['last_synced_at'])
+
+        # submitted rows include ones already stored, the insert ignores those
+        return {"status": "synced", **totals}
+
+    except Exception as e:
+        error_message = f"Error in sync_transactions: {str(e)}"
+        return {"error": error_message}
+
+# write one transactions/sync page & move the stored cursor past it
+# - added rows are inserted, modified rows updated in place, removed rows deleted
+# - with a lease token the page is rolled back if the lease was lost
+def apply_sync_page(item, bank_accounts, response, batch_size, token=None):
+    user_id = item.user_id
+    account_indexes = {}
+    new_transactions = []
+    processed_count = 0
+    skipped_count = 0
+
+    # category ids for the page, each row points at its most specific category
+    paths = {txn.transaction_id: plaid_category_path(txn) for txn in chain(response.added, response.modified)}
+    category_ids = resolve_categories(
+        user_id,
+        [name for path in paths.values() for name in path if name],
+        {detailed: primary for primary, detailed in paths.values() if detailed},
+    )
+
+    def category_ref_id(txn):
+        primary, detailed = paths[txn.transaction_id]
+        return category_ids[detailed or primary]
+
+    # transactions the user deleted & rows already stored are skipped by the insert itself
+    for txn in response.added:
+        # find matching bank account, hashing each plaid account id once
+        if txn.account_id not in account_indexes:
+            account_indexes[txn.account_id] = index_account_id(txn.account_id)
+        matching_account = bank_accounts.get(account_indexes[txn.account_id])
+
+        if not matching_account:
+            skipped_count += 1
+            continue
+
+        # create transaction
+        try:
+            new_transaction = Transaction(
+                user_id=user_id,
+                bank_account=matching_account,
+                name=txn.name.strip(),
+                amount=str(txn.amount),
+                date=txn.date,
+                category=paths[txn.transaction_id][0],
+                category_ref_id=category_ref_id(txn),
+                is_received=txn.amount < 0,
+                transaction_id=txn.transaction_id
+            )
+
+            # create transaction and log id
+            new_transactions.append(new_transaction)
+            processed_count += 1
+        except Exception as e:
+            continue
+
+    categories = Counter()
+
+    with db_transaction.atomic():
+        # insert new transactions, only the rows actually inserted count towards rollups & categories
+        inserted_ids = insert_transactions(new_transactions, batch_size)
+        if inserted_ids:
+            categories.update(txn.category for txn in new_transactions if txn.transaction_id in inserted_ids)
+            record_transactions(Transaction.objects.filter(transaction_id__in=inserted_ids))
+
+        # apply edits & reversals to stored transactions
+        modified_by_id = {txn.transaction_id: txn for txn in response.modified}
+        modified_rows = Transaction.objects.filter(user_id=user_id, transaction_id__in=modified_by_id)
+        forget_transactions(modified_rows)
+        modified_stored = list(modified_rows)
+        for stored in modified_stored:
+            txn = modified_by_id[stored.transaction_id]
+            categories[stored.category] -= 1
+            stored.name = txn.name.strip()
+            stored.amount = str(txn.amount)
+            stored.date = txn.date
+            stored.category = paths[txn.transaction_id][0]
+            stored.category_ref_id = category_ref_id(txn)
+            stored.is_received = txn.amount < 0
+            categories[stored.category] += 1
+        # bulk_update also rewrites abs_amount & the envelope from the new values
+        Transaction.objects.bulk_update(
+            modified_stored, ['name', 'amount', 'date', 'category', 'category_ref', 'is_received'], batch_size=batch_size
+        )
+        record_transactions(modified_rows)
+
+        # drop transactions plaid no longer reports
+        # - their ids are kept like user deletions, so an add seen again later cannot bring them back
+        removed_ids = [txn.transaction_id for txn in response.removed]
+        if removed_ids:
+            DeletedTransaction.objects.bulk_create(
+                [DeletedTransaction(user_id=user_id, transaction_id=transaction_id) for transaction_id in removed_ids],
+                batch_size=batch_size, ignore_conflicts=True,
+            )
+            removed_rows = Transaction.objects.filter(user_id=user_id, transaction_id__in=removed_ids)
+            categories.subtract(row['category'] for row in removed_rows.decrypted_values('category'))
+            forget_transactions(removed_rows)
+            removed_rows.delete()
+
+        adjust_category_counts(user_id, categories)
+
+        # the next page (or sync) starts from here
+        if token is not None and not renew_sync_lock(item, token):
+            raise SyncLockLost("Sync lease expired & was taken by another sync.")
+        item.cursor = response.next_cursor
+        item.save(update_fields=['cursor'])
+
+    return processed_count, skipped_count
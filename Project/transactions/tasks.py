@@ -0,0 +1,74 @@
+from celery import shared_task
+from celery.exceptions import MaxRetriesExceededError
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from banking.utils import set_plaid_rate_limit
+from accounts.models import CustomUser
+from banking.models import PlaidItem
+from transactions.fleet import stale_items, stalled_backfills, sync_items
+from transactions.sync import sync_item, sync_transactions
+
+# sync all of one user's linked items from plaid
+# - items already syncing or synced moments ago are skipped, unless forced
+@shared_task(ignore_result=True)
+def sync_user_transactions(user_id, force=False):
+    user = CustomUser.objects.filter(id=user_id).first()
+    if user is None:
+        return {"error": "User not found."}
+    return sync_transactions(user, force=force)
+
+# sync one linked item, used when plaid reports changes to it
+# - a forced sync that finds one running comes back later, the running one may predate the changes
+@shared_task(bind=True, ignore_result=True, max_retries=20)
+def sync_item_transactions(self, item_id, force=False):
+    item = PlaidItem.objects.filter(id=item_id).first()
+    if item is None:
+        return {"error": "Item not found."}
+    result = sync_item(item, force=force)
+    if force and result.get("status") == "in_progress":
+        raise self.retry(countdown=settings.PLAID_SYNC_RETRY_SECONDS)
+    return result
+
+# load a newly linked item's history in the background
+# - progress is kept on the item for the home page to poll, see get_backfill_status
+# - when another sync holds the item the load comes back later & stays running meanwhile,
+#   so the fleet sync neither syncs the item nor queues the load again, it is left pending
+#   for the fleet sync to queue once the retries run out
+@shared_task(bind=True, ignore_result=True, max_retries=20)
+def backfill_item_history(self, item_id):
+    items = PlaidItem.objects.filter(id=item_id)
+    item = items.first()
+    if item is None:
+        return {"error": "Item not found."}
+
+    items.update(backfill_status='running', backfill_loaded=0, backfill_seen_at=timezone.now())
+    result = sync_item(
+        item, force=True,
+        progress=lambda loaded: items.update(backfill_loaded=F('backfill_loaded') + loaded, backfill_seen_at=timezone.now()),
+    )
+    if result.get("status") == "in_progress":
+        try:
+            raise self.retry(countdown=settings.PLAID_SYNC_RETRY_SECONDS)
+        except MaxRetriesExceededError:
+            items.update(backfill_status='pending')
+            return result
+
+    items.update(backfill_status='complete' if result.get("status") == "synced" else 'failed')
+    return result
+
+# sync stale items in this worker under the fleet rate limit, see sync_all_items
+# - scheduled by celery beat every PLAID_SYNC_INTERVAL_MINUTES
+# - history loads the linking request could not queue are queued again first,
+#   with loads whose worker died part way, see stalled_backfills
+@shared_task(ignore_result=True)
+def sync_fleet(since_minutes=None):
+    stalled_backfills().update(backfill_status='pending')
+    for item_id in PlaidItem.objects.filter(backfill_status='pending').values_list('id', flat=True):
+        backfill_item_history.delay(item_id)
+
+    set_plaid_rate_limit(settings.PLAID_FLEET_REQUESTS_PER_SECOND, 'plaid-fleet')
+    since = timezone.now() - timedelta(minutes=since_minutes) if since_minutes else None
+    run_id, counts = sync_items(stale_items(since), settings.PLAID_FLEET_WORKERS)
+    return {"run_id": run_id, "counts": counts}
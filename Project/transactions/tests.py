@@ -1,3 +1,535 @@
-from django.test import TestCase
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+import plaid
+from django.conf import settings
+from unittest import skipUnless
+from django.db import connection, transaction as db_transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from celery.exceptions import MaxRetriesExceededError, Retry
+from kombu.exceptions import OperationalError
+from Project.celery import app
+from accounts.models import CustomUser
+from accounts.utils.bulk_decrypt import decrypt_column
+from banking.models import BankAccount, PlaidItem
+from transactions.categories import resolve_categories
+from transactions.fleet import stale_items, stalled_backfills
+from transactions.models import Category, DeletedTransaction, Transaction
+from transactions.sync import (
+    acquire_sync_lock, copy_insert_transactions, insert_transactions, release_sync_lock, renew_sync_lock, staged_insert_sql,
+    sync_item,
+)
+from transactions.views.transactions_view import TRANSACTION_FIELDS
+from transactions.tasks import backfill_item_history, sync_fleet, sync_item_transactions, sync_user_transactions
 
-# Create your tests here.
+# a transactions/sync response page & one added transaction in it
+def sync_page(added=(), modified=(), removed=(), next_cursor='c1', has_more=False):
+    return SimpleNamespace(
+        added=list(added), modified=list(modified), removed=list(removed), next_cursor=next_cursor, has_more=has_more
+    )
+
+def plaid_transaction(transaction_id, amount, account_id='acc-1', name='Shop'):
+    return SimpleNamespace(
+        transaction_id=transaction_id, amount=amount, name=name, account_id=account_id, date=date(2024, 1, 5),
+        personal_finance_category=SimpleNamespace(primary='FOOD_AND_DRINK', detailed=None),
+    )
+
+def plaid_error(code):
+    error = plaid.ApiException(status=400, reason=code)
+    error.body = json.dumps({'error_code': code})
+    return error
+
+# stands in for the plaid client, answers transactions/sync from pages keyed by cursor
+# - a list of answers is used in turn & an exception answer is raised
+class FakePlaidClient:
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.cursors = []
+
+    def transactions_sync(self, request):
+        cursor = request['cursor'] if 'cursor' in request else None
+        self.cursors.append(cursor)
+        answer = self.pages[cursor]
+        if isinstance(answer, list):
+            answer = answer.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+# celery tasks run in process, as the worker would run them
+class EagerCeleryTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # celery reads its settings under the CELERY_ namespace
+        previous = app.conf.task_always_eager
+        app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+        self.addCleanup(app.conf.update, CELERY_TASK_ALWAYS_EAGER=previous)
+
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        self.account = BankAccount.objects.create(
+            user=self.user, bank_name='Bank', account_name='Current', account_id='acc-1', account_type='checking'
+        )
+        self.item = PlaidItem.objects.create(user=self.user, item_id='item-1', access_token='access-1')
+        self.plaid = FakePlaidClient({None: sync_page([plaid_transaction('t1', 5), plaid_transaction('t2', -20)])})
+        patcher = mock.patch('transactions.sync.get_plaid_client', return_value=self.plaid)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class BackgroundSyncTests(EagerCeleryTestCase):
+
+    def test_sync_now_queues_a_sync(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/sync-transactions/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.json()['queued'])
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.cursor, 'c1')
+        self.assertIsNotNone(self.item.last_synced_at)
+
+    def test_sync_now_without_a_broker(self):
+        self.client.force_login(self.user)
+        with mock.patch.object(sync_user_transactions, 'apply_async', side_effect=OperationalError("Connection refused")):
+            response = self.client.post('/sync-transactions/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(response.json()['queued'])
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_fleet_sync_loads_pending_backfills(self):
+        PlaidItem.objects.filter(id=self.item.id).update(backfill_status='pending')
+        sync_fleet.delay(since_minutes=30)
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.backfill_status, 'complete')
+        self.assertEqual(self.item.backfill_loaded, 2)
+        # the backfill's sync is the only one, the fleet skipped the loading item
+        self.assertEqual(self.plaid.cursors, [None])
+
+    def test_backfill_waits_for_a_running_sync(self):
+        acquire_sync_lock(self.item, 'first')
+        with mock.patch.object(backfill_item_history, 'retry', side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                backfill_item_history(self.item.id)
+        retry.assert_called_once_with(countdown=settings.PLAID_SYNC_RETRY_SECONDS)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.backfill_status, 'running')
+
+        # out of retries it is left for the fleet sync, never marked complete
+        with mock.patch.object(backfill_item_history, 'retry', side_effect=MaxRetriesExceededError()):
+            backfill_item_history(self.item.id)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.backfill_status, 'pending')
+        self.assertEqual(self.plaid.cursors, [])
+
+    def test_fleet_sync_restarts_stalled_backfills(self):
+        # a backfill waiting to retry is still running, one whose worker died is not
+        lease = settings.PLAID_SYNC_LOCK_TIMEOUT + settings.PLAID_SYNC_RETRY_SECONDS
+        PlaidItem.objects.filter(id=self.item.id).update(
+            backfill_status='running', backfill_seen_at=timezone.now() - timedelta(seconds=lease - 60)
+        )
+        self.assertFalse(stalled_backfills().exists())
+        sync_fleet.delay(since_minutes=30)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.backfill_status, 'running')
+        self.assertEqual(self.plaid.cursors, [])
+
+        PlaidItem.objects.filter(id=self.item.id).update(backfill_seen_at=timezone.now() - timedelta(seconds=lease + 60))
+        self.assertEqual(list(stalled_backfills()), [self.item])
+        # not synced as a settled item, it still has its history to load
+        self.assertFalse(stale_items().exists())
+        sync_fleet.delay(since_minutes=30)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.backfill_status, self.item.backfill_loaded), ('complete', 2))
+        self.assertIsNotNone(self.item.backfill_seen_at)
+        self.assertEqual(self.plaid.cursors, [None])
+
+    def test_failed_backfill(self):
+        self.plaid.pages = {None: plaid_error('ITEM_LOGIN_REQUIRED')}
+        backfill_item_history(self.item.id)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.backfill_status, 'failed')
+
+    def test_fleet_sync_skips_recently_synced_items(self):
+        sync_fleet.delay(since_minutes=30)
+        sync_fleet.delay(since_minutes=30)
+        self.assertEqual(self.plaid.cursors, [None])
+
+    def test_one_scheduled_sync(self):
+        tasks = [entry['task'] for entry in settings.CELERY_BEAT_SCHEDULE.values()]
+        self.assertEqual([task for task in tasks if task.startswith('transactions.')], ['transactions.tasks.sync_fleet'])
+
+
+class SyncLockTests(EagerCeleryTestCase):
+
+    def test_one_sync_per_item(self):
+        self.assertTrue(acquire_sync_lock(self.item, 'first'))
+        self.assertFalse(acquire_sync_lock(self.item, 'second'))
+        self.assertEqual(sync_item(self.item), {"status": "in_progress"})
+        self.assertEqual(self.plaid.cursors, [])
+
+        # only the holder can release
+        release_sync_lock(self.item, 'second')
+        self.assertFalse(acquire_sync_lock(self.item, 'second'))
+        release_sync_lock(self.item, 'first')
+        self.assertTrue(acquire_sync_lock(self.item, 'second'))
+
+    def test_expired_lease_is_taken_over(self):
+        acquire_sync_lock(self.item, 'first')
+        PlaidItem.objects.filter(id=self.item.id).update(sync_lease_until=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(acquire_sync_lock(self.item, 'second'))
+        self.assertFalse(renew_sync_lock(self.item, 'first'))
+
+    def test_sync_releases_its_lease(self):
+        self.assertEqual(sync_item(self.item)['status'], 'synced')
+        self.item.refresh_from_db()
+        self.assertIsNone(self.item.sync_token)
+        self.assertEqual(sync_item(self.item), {"status": "fresh"})
+
+    def test_page_is_rolled_back_when_the_lease_is_lost(self):
+        with mock.patch('transactions.sync.renew_sync_lock', return_value=False):
+            self.assertIn('error', sync_item(self.item))
+        self.item.refresh_from_db()
+        self.assertIsNone(self.item.cursor)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_forced_sync_comes_back_while_one_runs(self):
+        acquire_sync_lock(self.item, 'first')
+        with mock.patch.object(sync_item_transactions, 'retry', side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                sync_item_transactions(self.item.id, force=True)
+        retry.assert_called_once_with(countdown=settings.PLAID_SYNC_RETRY_SECONDS)
+
+
+class SyncPaginationTests(EagerCeleryTestCase):
+
+    def test_changes_mid_pagination_resume_from_the_committed_cursor(self):
+        self.plaid.pages = {
+            None: sync_page([plaid_transaction('t1', 5), plaid_transaction('t2', -20)], next_cursor='c1', has_more=True),
+            'c1': [
+                plaid_error('TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION'),
+                sync_page(removed=[SimpleNamespace(transaction_id='t1')], next_cursor='c2'),
+            ],
+        }
+        self.assertEqual(sync_item(self.item)['status'], 'synced')
+
+        # the first page is not fetched or applied twice
+        self.assertEqual(self.plaid.cursors, [None, 'c1', 'c1'])
+        self.assertEqual(list(Transaction.objects.values_list('transaction_id', flat=True)), ['t2'])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.cursor, 'c2')
+
+    def test_removed_transactions_stay_removed(self):
+        self.plaid.pages = {
+            None: sync_page([plaid_transaction('t1', 5)], next_cursor='c1', has_more=True),
+            'c1': sync_page(removed=[SimpleNamespace(transaction_id='t1')], next_cursor='c2', has_more=True),
+            'c2': sync_page([plaid_transaction('t1', 5)], next_cursor='c3'),
+        }
+        sync_item(self.item)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertTrue(DeletedTransaction.objects.filter(user=self.user, transaction_id='t1').exists())
+
+    def test_transactions_are_matched_to_accounts_by_index(self):
+        self.plaid.pages = {None: sync_page([plaid_transaction('t1', 5), plaid_transaction('t2', 7, account_id='acc-unknown')])}
+        result = sync_item(self.item)
+        self.assertEqual((result['submitted'], result['skipped']), (1, 1))
+        self.assertEqual(list(Transaction.objects.values_list('transaction_id', 'bank_account')), [('t1', self.account.id)])
+
+    def test_other_plaid_errors_stop_the_sync(self):
+        self.plaid.pages = {None: plaid_error('ITEM_LOGIN_REQUIRED')}
+        self.assertIn('error', sync_item(self.item))
+        self.assertEqual(self.plaid.cursors, [None])
+
+
+# new rows pass through the staging table, tombstones & stored ids are skipped in SQL
+class StagedInsertTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        self.other = CustomUser.objects.create_user('other', 'other@example.com', 'Password1!')
+        self.account = BankAccount.objects.create(
+            user=self.user, bank_name='Bank', account_name='Current', account_id='acc-1', account_type='checking'
+        )
+        Transaction.objects.create(**self.values('stored'))
+        DeletedTransaction.objects.create(user=self.user, transaction_id='deleted')
+        # another user's tombstone does not hide this user's row
+        DeletedTransaction.objects.create(user=self.other, transaction_id='new')
+
+    def values(self, transaction_id):
+        return dict(
+            user=self.user, bank_account=self.account, name='Shop', amount='-5.00', date=date(2024, 1, 5),
+            category='Food', transaction_id=transaction_id,
+        )
+
+    def rows(self):
+        return [Transaction(**self.values(transaction_id)) for transaction_id in ('new', 'stored', 'deleted')]
+
+    def assertInserted(self, inserted):
+        self.assertEqual(inserted, {'new'})
+        self.assertEqual(sorted(Transaction.objects.values_list('transaction_id', flat=True)), ['new', 'stored'])
+        # values are prepared by the fields, as the ORM would store them
+        txn = Transaction.objects.get(transaction_id='new')
+        self.assertEqual((txn.name, txn.amount, txn.abs_amount), ('Shop', '-5.00', Decimal('5.00')))
+
+    def test_staged_insert_sql(self):
+        sql = staged_insert_sql()
+        self.assertIn('WHERE NOT EXISTS (SELECT 1 FROM "transactions_deletedtransaction"', sql)
+        self.assertIn('ON CONFLICT ("transaction_id") DO NOTHING RETURNING "transaction_id"', sql)
+
+    def test_tombstones_are_not_looked_up(self):
+        with db_transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            inserted = insert_transactions(self.rows(), batch_size=2)
+        self.assertFalse([query['sql'] for query in queries if query['sql'].startswith('SELECT')])
+        self.assertInserted(inserted)
+
+    @skipUnless(connection.vendor == 'postgresql', "COPY needs postgres")
+    def test_copy_insert(self):
+        with db_transaction.atomic():
+            inserted = copy_insert_transactions(self.rows())
+        self.assertInserted(inserted)
+
+
+class TransactionFilterTests(EagerCeleryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        sync_item(self.item)
+        self.client.force_login(self.user)
+
+    def get(self, **params):
+        return self.client.get('/get-all-transactions/', {'cursor': '', **params})
+
+    def test_category_filter_ignores_case(self):
+        for name in ('FOOD AND DRINK', 'food and drink', ' Food And Drink '):
+            with self.subTest(name=name):
+                response = self.get(category=name)
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(len(response.json()['transactions']), 2)
+        self.assertEqual(self.get(category='travel').json()['transactions'], [])
+
+    def test_categories_are_one_row_per_name_ignoring_case(self):
+        self.assertEqual(
+            resolve_categories(self.user.id, ['food and drink', 'Food and Drink']),
+            dict.fromkeys(['food and drink', 'Food and Drink'], Category.objects.get(user=self.user).id),
+        )
+
+    def test_bad_filters(self):
+        for params in (
+            {'start_date': '2024-13-01'}, {'end_date': 'yesterday'}, {'min_price': 'abc'}, {'max_price': 'nan'},
+            {'type': 'both'}, {'bank_account': 'x'}, {'category': '   '}, {'category': 'x' * 256},
+        ):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn(next(iter(params)), response.json()['error'])
+
+
+# bulk writes keep the envelope & abs_amount in step with the amount, under either layout
+class TransactionStorageTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        self.account = BankAccount.objects.create(
+            user=self.user, bank_name='Bank', account_name='Current', account_id='acc-1', account_type='checking'
+        )
+
+    def create(self):
+        return Transaction.objects.create(
+            user=self.user, bank_account=self.account, name='Shop', amount='-5.00', date=date(2024, 1, 5),
+            category='Food', transaction_id='t1',
+        )
+
+    def assertStored(self, amount, enveloped):
+        txn = Transaction.objects.get()
+        self.assertEqual((txn.name, txn.amount, txn.category), ('Shop', amount, 'Food'))
+        self.assertEqual(txn.abs_amount, abs(Decimal(amount)))
+        envelope = Transaction.objects.values_list('envelope', flat=True).get()
+        self.assertEqual(envelope is not None, enveloped)
+        self.assertEqual(Transaction.objects.decrypted_values('amount'), [{'amount': amount}])
+        # amount filters run on abs_amount
+        magnitude = abs(Decimal(amount))
+        self.assertTrue(Transaction.objects.filter(abs_amount__gte=magnitude - 1, abs_amount__lte=magnitude + 1).exists())
+        self.assertFalse(Transaction.objects.filter(abs_amount__lte=magnitude - 1).exists())
+
+    def test_bulk_update(self):
+        for enveloped in (False, True):
+            with self.subTest(enveloped=enveloped), override_settings(ENVELOPE_ENCRYPTION=enveloped):
+                txn = self.create()
+                txn.amount = '-12.50'
+                Transaction.objects.bulk_update([txn], ['amount'])
+                # the object keeps its opened values
+                self.assertEqual(txn.amount, '-12.50')
+                self.assertStored('-12.50', enveloped)
+                Transaction.objects.all().delete()
+
+    def test_update(self):
+        for enveloped in (False, True):
+            with self.subTest(enveloped=enveloped), override_settings(ENVELOPE_ENCRYPTION=enveloped):
+                self.create()
+                self.assertEqual(Transaction.objects.filter(transaction_id='t1').update(amount='-30.25'), 1)
+                self.assertStored('-30.25', enveloped)
+                Transaction.objects.all().delete()
+
+
+# category counts are kept as transactions change, listing categories reads only the counts
+class CategoryCountTests(EagerCeleryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        sync_item(self.item)
+        self.client.force_login(self.user)
+
+    def categories(self):
+        # nothing is asked of plaid
+        cursors = list(self.plaid.cursors)
+        with mock.patch('banking.utils.plaid_pool.PooledApiClient.call_api', side_effect=AssertionError) as call_api:
+            response = self.client.get('/get-categories/')
+        call_api.assert_not_called()
+        self.assertEqual(self.plaid.cursors, cursors)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def post(self, url, data):
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_counts_follow_sync(self):
+        self.assertEqual(self.categories(), ['FOOD AND DRINK'])
+        moved = plaid_transaction('t1', 5)
+        moved.personal_finance_category = SimpleNamespace(primary='TRAVEL', detailed='TRAVEL_FLIGHTS')
+        self.plaid.pages['c1'] = sync_page(modified=[moved], next_cursor='c2')
+        sync_item(self.item, force=True)
+        self.assertEqual(self.categories(), ['FOOD AND DRINK', 'TRAVEL'])
+
+        self.plaid.pages['c2'] = sync_page(removed=[SimpleNamespace(transaction_id='t2')], next_cursor='c3')
+        sync_item(self.item, force=True)
+        self.assertEqual(self.categories(), ['TRAVEL'])
+        counts = Category.objects.filter(user=self.user).decrypted_values('name', 'transaction_count')
+        self.assertEqual(
+            {row['name']: row['transaction_count'] for row in counts}, {'FOOD AND DRINK': 0, 'TRAVEL': 1, 'TRAVEL FLIGHTS': 0}
+        )
+
+    def test_counts_follow_manual_changes(self):
+        self.post('/add-transaction/', {
+            'name': 'Train', 'amount': 12, 'date': '2024-01-06', 'category': 'Travel',
+            'bank_account': self.account.id, 'transaction_id': 'manual-1',
+        })
+        self.assertEqual(self.categories(), ['FOOD AND DRINK', 'Travel'])
+
+        manual = Transaction.objects.get(transaction_id='manual-1')
+        self.post(f'/edit-transaction/{manual.id}/', {'category': 'food and drink'})
+        self.assertEqual(self.categories(), ['FOOD AND DRINK'])
+
+        for txn in Transaction.objects.all():
+            self.post(f'/delete-transaction/{txn.id}/', {})
+        self.assertEqual(self.categories(), [])
+
+
+# the transaction list, filtered, ordered & paged in SQL
+class TransactionListTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('saver', 'saver@example.com', 'Password1!')
+        self.account = BankAccount.objects.create(
+            user=self.user, bank_name='Bank', account_name='Current', account_id='acc-1', account_type='checking'
+        )
+        # 60 transactions two a day, spent & received in turn, amounts 1 to 60
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, bank_account=self.account, name=f'Shop {i}', amount=str(i if i % 2 else -i),
+                date=date(2024, 1, 1) + timedelta(days=i // 2), is_received=bool(i % 2), transaction_id=f't{i}',
+            )
+            for i in range(1, 61)
+        ])
+        self.client.force_login(self.user)
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [txn['name'] for txn in response.json()['transactions']]
+
+    def test_pages_newest_first(self):
+        first = self.client.get('/get-all-transactions/')
+        self.assertEqual(first.json()['total_pages'], 2)
+        self.assertEqual(self.names(first), [f'Shop {i}' for i in range(60, 10, -1)])
+        self.assertEqual(self.names(self.client.get('/get-all-transactions/', {'page': 2})), [f'Shop {i}' for i in range(10, 0, -1)])
+
+    # the page sends cursor='' for its first page
+    def test_keyset_pages(self):
+        first = self.client.get('/get-all-transactions/', {'cursor': ''}).json()
+        self.assertIsNone(first['prev_cursor'])
+        self.assertEqual([txn['name'] for txn in first['transactions']], [f'Shop {i}' for i in range(60, 10, -1)])
+
+        second = self.client.get('/get-all-transactions/', {'cursor': first['next_cursor']}).json()
+        self.assertEqual([txn['name'] for txn in second['transactions']], [f'Shop {i}' for i in range(10, 0, -1)])
+        self.assertIsNone(second['next_cursor'])
+
+        back = self.client.get('/get-all-transactions/', {'cursor': second['prev_cursor']}).json()
+        self.assertEqual(back['transactions'], first['transactions'])
+        self.assertIsNone(back['prev_cursor'])
+        self.assertEqual(back['next_cursor'], first['next_cursor'])
+
+    def test_only_the_page_is_decrypted(self):
+        with mock.patch('accounts.utils.bulk_decrypt.decrypt_column', wraps=decrypt_column) as decrypt:
+            self.client.get('/get-all-transactions/')
+        self.assertLessEqual(sum(len(list(call.args[0])) for call in decrypt.call_args_list), 50 * len(TRANSACTION_FIELDS))
+
+    def test_filters(self):
+        cases = (
+            ({'min_price': '10', 'max_price': '12.5'}, [12, 11, 10]),
+            ({'type': 'received', 'max_price': '5'}, [5, 3, 1]),
+            ({'type': 'sent', 'max_price': '5'}, [4, 2]),
+            ({'start_date': '2024-01-30'}, [60, 59, 58]),
+            ({'end_date': '2024-01-03', 'type': 'sent'}, [4, 2]),
+            ({'bank_account': str(self.account.id), 'min_price': '59'}, [60, 59]),
+            ({'bank_account': str(self.account.id + 1)}, []),
+        )
+        for params, amounts in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.names(self.client.get('/get-all-transactions/', params)), [f'Shop {i}' for i in amounts])
+
+
+# each item keeps its transactions/sync cursor & later syncs apply only the changes since
+class SyncCursorTests(EagerCeleryTestCase):
+
+    def test_later_syncs_resume_from_the_stored_cursor(self):
+        sync_item(self.item)
+        self.plaid.pages['c1'] = sync_page(
+            added=[plaid_transaction('t3', 12)],
+            modified=[plaid_transaction('t1', 8, name='Cafe')],
+            removed=[SimpleNamespace(transaction_id='t2')],
+            next_cursor='c2',
+        )
+        self.assertEqual(sync_item(self.item, force=True)['status'], 'synced')
+
+        self.assertEqual(self.plaid.cursors, [None, 'c1'])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.cursor, 'c2')
+        rows = {row['transaction_id']: row for row in Transaction.objects.decrypted_values('transaction_id', 'name', 'abs_amount')}
+        self.assertEqual(sorted(rows), ['t1', 't3'])
+        # modified in place
+        self.assertEqual((rows['t1']['name'], rows['t1']['abs_amount']), ('Cafe', Decimal('8')))
+
+    def test_a_failed_page_keeps_the_cursor(self):
+        self.plaid.pages['c1'] = sync_page([plaid_transaction('t3', 12)], next_cursor='c2')
+        sync_item(self.item)
+        with mock.patch('transactions.sync.adjust_category_counts', side_effect=RuntimeError("database went away")):
+            self.assertIn('error', sync_item(self.item, force=True))
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.cursor, 'c1')
+        self.assertFalse(Transaction.objects.filter(transaction_id='t3').exists())
+
+        # the next sync picks the page up again
+        sync_item(self.item, force=True)
+        self.assertEqual(self.plaid.cursors, [None, 'c1', 'c1'])
+        self.assertTrue(Transaction.objects.filter(transaction_id='t3').exists())
@@ -4,6 +4,7 @@ from transactions.views import *
 # transaction urls
 urlpatterns = [
     path('get-all-transactions/', get_all_transactions, name='get_all_transactions'),
+    path('sync-transactions/', sync_transactions_now, name='sync_transactions_now'),
     path('get-categories/', get_categories, name='get_categories'),
     path('get-bank-accounts/', get_bank_accounts, name='get_bank_accounts'),
     path('transactions/', transactions_page, name='transactions'),
@@ -1,11 +1,19 @@
 from django.core.paginator import Paginator
 from banking.views.plaid_client import *
-from transactions.models import Transaction, DeletedTransaction
+from transactions.models import Transaction, DeletedTransaction, Category
+from transactions.categories import adjust_category_counts, category_filter, resolve_categories
+from analytics.rollups import forget_transactions, record_transactions
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_POST, require_GET
 from django.contrib.auth.decorators import login_required
-from datetime import datetime
-from plaid.model.transactions_sync_request import TransactionsSyncRequest
+from datetime import date, datetime
+from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import Q
+import base64
+from transactions.sync import sync_transactions, last_synced_at
+from transactions.tasks import sync_user_transactions
+from Project.celery import enqueue
 from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
 from banking.models.bankAccount import BankAccount
@@ -15,6 +23,133 @@ from banking.models.bankAccount import BankAccount
 def transactions_page(request):
     return render(request, 'transactions/transactions.html')
 
+# columns needed to display a transaction
+TRANSACTION_FIELDS = (
+    'id', 'name', 'abs_amount', 'date', 'category', 'is_received', 'bank_account_id', 'bank_account__account_name', 'transaction_id'
+)
+
+# format a transaction row for the frontend
+def format_transaction(txn):
+    return {
+        'id': txn['id'],
+        'name': txn['name'].strip(),
+        'amount': float(txn['abs_amount'] or 0),
+        'date': txn['date'].strftime('%Y-%m-%d'),
+        'category': txn['category'] or 'Uncategorized',
+        'is_received': txn['is_received'],
+        'bank_account_id': txn['bank_account_id'],
+        'account_name': txn['bank_account__account_name'],
+        'transaction_id': txn['transaction_id']
+    }
+
+PAGE_SIZE = 50
+
+# opaque keyset cursor pointing at a (date, id) position in the list
+def encode_cursor(txn, direction):
+    payload = json.dumps({'d': txn['date'], 'i': txn['id'], 'dir': direction})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+# raised for cursors that were not made by encode_cursor
+class InvalidCursor(Exception):
+    pass
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        direction = 'prev' if payload.get('dir') == 'prev' else 'next'
+        return date.fromisoformat(payload['d']), int(payload['i']), direction
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise InvalidCursor("Invalid cursor.") from e
+
+# rows strictly after a (date, id) position, in the order of travel
+# - the date__lte bound lets the (user, date, id) index do a range scan
+def seek_transactions(queryset, day, pk, direction):
+    if direction == 'prev':
+        queryset = queryset.filter(Q(date__gte=day) & (Q(date__gt=day) | Q(id__gt=pk)))
+        return queryset.order_by('date', 'id')
+    queryset = queryset.filter(Q(date__lte=day) & (Q(date__lt=day) | Q(id__lt=pk)))
+    return queryset.order_by('-date', '-id')
+
+# read one keyset page, newest first
+# - match filters decrypted rows, the scan then continues chunk by chunk until the page is full
+def keyset_page(queryset, cursor=None, match=None):
+    direction = 'next'
+    if cursor:
+        day, pk, direction = decode_cursor(cursor)
+        ordered = seek_transactions(queryset, day, pk, direction)
+    else:
+        ordered = queryset.order_by('-date', '-id')
+
+    page = []
+    chunk_query = ordered
+    while len(page) <= PAGE_SIZE:
+        chunk = [format_transaction(txn) for txn in chunk_query[:PAGE_SIZE + 1].decrypted_values(*TRANSACTION_FIELDS)]
+        page += [txn for txn in chunk if match is None or match(txn)]
+        if match is None or len(chunk) <= PAGE_SIZE:
+            break
+        last = chunk[-1]
+        chunk_query = seek_transactions(queryset, date.fromisoformat(last['date']), last['id'], direction)
+
+    has_more = len(page) > PAGE_SIZE
+    page = page[:PAGE_SIZE]
+    if direction == 'prev':
+        page.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, bool(cursor)
+
+    return {
+        'transactions': page,
+        'next_cursor': encode_cursor(page[-1], 'next') if page and has_next else None,
+        'prev_cursor': encode_cursor(page[0], 'prev') if page and has_prev else None,
+    }
+
+# raised for filter values that can't be parsed
+class InvalidFilter(Exception):
+    pass
+
+# parse one filter value, InvalidFilter names the parameter
+def filter_value(params, key, parse):
+    try:
+        return parse(params[key])
+    except (ValueError, ArithmeticError) as e:
+        raise InvalidFilter(f"Invalid {key}.") from e
+
+def parse_price(value):
+    price = Decimal(value)
+    if not price.is_finite():
+        raise ValueError(value)
+    return price
+
+def parse_type(value):
+    if value.lower() not in ('received', 'sent'):
+        raise ValueError(value)
+    return value.lower() == 'received'
+
+def parse_category(value):
+    if not value.strip() or len(value) > 255:
+        raise ValueError(value)
+    return value
+
+# apply the filters that can run in the database
+# - categories are matched by id ignoring case, including the category's detailed categories
+def filter_transactions(queryset, params, user_id):
+    if params.get('start_date'):
+        queryset = queryset.filter(date__gte=filter_value(params, 'start_date', date.fromisoformat))
+    if params.get('end_date'):
+        queryset = queryset.filter(date__lte=filter_value(params, 'end_date', date.fromisoformat))
+    if params.get('min_price'):
+        queryset = queryset.filter(abs_amount__gte=filter_value(params, 'min_price', parse_price))
+    if params.get('max_price'):
+        queryset = queryset.filter(abs_amount__lte=filter_value(params, 'max_price', parse_price))
+    if params.get('type'):
+        queryset = queryset.filter(is_received=filter_value(params, 'type', parse_type))
+    if params.get('bank_account'):
+        queryset = queryset.filter(bank_account_id=filter_value(params, 'bank_account', int))
+    if params.get('category'):
+        queryset = queryset.filter(category_filter(user_id, filter_value(params, 'category', parse_category)))
+    return queryset
+
 # get all transactions
 @require_GET
 @login_required
@@ -23,69 +158,44 @@ def get_all_transactions(request):
         return JsonResponse({"error": "User is not authenticated."}, status=401)
 
     try:
-        # sync transactions with api
-        sync_transactions(request.user)
-
-        # prevent duplicate transactions
-        transactions_query = Transaction.objects.filter(user=request.user, bank_account__isnull=False).distinct()
-
-        # fetch transactions from database
-        transactions = transactions_query.values(
-            'id', 'name', 'amount', 'date', 'category', 'is_received', 'bank_account_id','bank_account__account_name', 'transaction_id'
-        )
-
-        if not transactions:
-            return JsonResponse({"transactions": [], "page": 1, "total_pages": 1})
-
-        # format transactions
-        formatted_transactions = [
-            {
-                'id': txn['id'],
-                'name': txn['name'].strip(),
-                'amount': abs(float(txn['amount'])),
-                'date': txn['date'].strftime('%Y-%m-%d'),
-                'category': txn['category'] or 'Uncategorized',
-                'is_received': txn['is_received'],
-                'bank_account_id': txn['bank_account_id'],
-                'account_name': txn['bank_account__account_name'],
-                'transaction_id': txn['transaction_id']
-            }
-            for txn in transactions
-        ]
-
-        # searching and filtering
-        filters = {
-            'search': lambda txn: request.GET.get('search', '').lower() in txn['name'].lower(),
-            'category': lambda txn: txn['category'].lower() == request.GET.get('category', '').lower(),
-            'start_date': lambda txn: txn['date'] >= request.GET.get('start_date', ''),
-            'end_date': lambda txn: txn['date'] <= request.GET.get('end_date', ''),
-            'min_price': lambda txn: txn['amount'] >= float(request.GET.get('min_price', 0)),
-            'max_price': lambda txn: txn['amount'] <= float(request.GET.get('max_price', float('inf'))),
-            'type': lambda txn: txn['is_received'] == (request.GET.get('type', '').lower() == 'received'),
-            'bank_account': lambda txn: txn['bank_account_id'] == int(request.GET.get('bank_account')) if request.GET.get('bank_account') else True,
-        }
-
-        for key, condition in filters.items():
-            if request.GET.get(key):
-                formatted_transactions = [txn for txn in formatted_transactions if condition(txn)]
-
-        # sort transactions in descending order
-        sorted_transactions = sorted(
-            formatted_transactions,
-            key=lambda x: datetime.strptime(x['date'], '%Y-%m-%d'),
-            reverse=True
-        )
+        # filter & sort in the database, newest first
+        transactions_query = Transaction.objects.filter(user=request.user, bank_account__isnull=False)
+        transactions_query = filter_transactions(transactions_query, request.GET, request.user.id).order_by('-date', '-id')
+
+        # name is encrypted so search still runs on decrypted rows
+        search = request.GET.get('search', '').lower()
+
+        # keyset pagination, each page is one range scan from the cursor
+        if 'cursor' in request.GET:
+            match = (lambda txn: search in txn['name'].lower()) if search else None
+            page = keyset_page(transactions_query, request.GET.get('cursor'), match)
+            page['last_synced_at'] = last_synced_at(request.user)
+            return JsonResponse(page)
+
+        if search:
+            transactions = [format_transaction(txn) for txn in transactions_query.decrypted_values(*TRANSACTION_FIELDS)]
+            transactions = [txn for txn in transactions if search in txn['name'].lower()]
+            paginator = Paginator(transactions, PAGE_SIZE)
+        else:
+            # only the requested page is read & decrypted
+            paginator = Paginator(transactions_query, PAGE_SIZE)
 
         # paginate results (50 transactions per page)
-        paginator = Paginator(sorted_transactions, 50)
         page_number = request.GET.get('page', 1)
         page_obj = paginator.get_page(page_number)
 
+        page_transactions = page_obj.object_list
+        if not isinstance(page_transactions, list):
+            page_transactions = [format_transaction(txn) for txn in page_transactions.decrypted_values(*TRANSACTION_FIELDS)]
+
         return JsonResponse({
-            'transactions': list(page_obj),
+            'transactions': page_transactions,
             'page': page_obj.number,
             'total_pages': paginator.num_pages,
+            'last_synced_at': last_synced_at(request.user),
         })
+    except (InvalidCursor, InvalidFilter) as e:
+        return JsonResponse({"error": str(e)}, status=400)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
@@ -98,39 +208,14 @@ def get_categories(request):
         return JsonResponse({"error": "User is not authenticated."}, status=401)
 
     try:
-        # get API transactions
-        client = get_plaid_client()
-        access_token = request.user.plaid_access_token
-        if not access_token:
-            return JsonResponse({"error": "Access token not found for user."}, status=400)
-
-        cursor = None
-        plaid_categories = set() # set to avoid duplications
-
-        while True:
-            request_data = TransactionsSyncRequest(
-                access_token=access_token, cursor=cursor
-            ) if cursor else TransactionsSyncRequest(access_token=access_token)
-            response = client.transactions_sync(request_data)
-
-            # find categories from transactions
-            for txn in response.added:
-                if txn.personal_finance_category and txn.personal_finance_category.primary:
-                    plaid_categories.add(txn.personal_finance_category.primary.replace('_', ' '))
-                else:
-                    plaid_categories.add('Uncategorized')
-
-            cursor = response.next_cursor
-            if not response.has_more:
-                break
-
-        # fetch categories from custom transactions in database
-        db_categories = Transaction.objects.filter(user=request.user).values_list('category', flat=True)
-        db_categories = set(filter(None, db_categories))
+        # categories in use, counted as transactions are stored so none are scanned here
+        rows = Category.objects.filter(
+            user=request.user, parent__isnull=True, transaction_count__gt=0
+        ).decrypted_values('name')
 
-        # combine & sort categories
-        all_categories = sorted(plaid_categories.union(db_categories))
-        return JsonResponse(list(all_categories), safe=False)
+        # sort categories
+        all_categories = sorted(row['name'] for row in rows)
+        return JsonResponse(all_categories, safe=False)
 
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
@@ -183,16 +268,20 @@ def add_transaction(request):
             amount = abs(amount)
 
         # save transaction
-        transaction = Transaction.objects.create(
-            user=request.user,
-            bank_account=bank_account,
-            name=name,
-            amount=str(amount),
-            date=date,
-            category=category,
-            is_received=is_received,
-            transaction_id=transaction_id
-        )
+        with db_transaction.atomic():
+            transaction = Transaction.objects.create(
+                user=request.user,
+                bank_account=bank_account,
+                name=name,
+                amount=str(amount),
+                date=date,
+                category=category,
+                category_ref_id=resolve_categories(request.user.id, [category]).get(category),
+                is_received=is_received,
+                transaction_id=transaction_id
+            )
+            adjust_category_counts(request.user.id, {category: 1})
+            record_transactions(Transaction.objects.filter(id=transaction.id))
 
         # return success response
         return JsonResponse({
@@ -209,96 +298,23 @@ def add_transaction(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
-# sync transactions with database
-def sync_transactions(user):
-    try:
-        # connect to the API
-        client = get_plaid_client()
-        access_token = user.plaid_access_token
-        if not access_token:
-            return {"error": "Access token not found for user."}
-
-        cursor = None
-        new_transactions = []
-        processed_count = 0
-        skipped_count = 0
-
-        # get all bank accounts for the user
-        bank_accounts = BankAccount.objects.filter(user=user)
-
-        # use a set to track transaction IDs
-        existing_transaction_ids = set(
-            Transaction.objects.filter(user=user).values_list('transaction_id', flat=True)
-        )
-
-        # include deleted ones
-        deleted_transaction_ids = set(
-            DeletedTransaction.objects.filter(user=user).values_list('transaction_id', flat=True)
-        )
-
-        # combine deleted & non-deleted transactions
-        ignored_transaction_ids = existing_transaction_ids.union(deleted_transaction_ids)
-
-        # collect transactions from api
-        while True:
-            request_data = TransactionsSyncRequest(
-                access_token=access_token, cursor=cursor
-            ) if cursor else TransactionsSyncRequest(access_token=access_token)
-
-            response = client.transactions_sync(request_data)
-            plaid_transactions = response.added
-
-            # use transaction id to prvent duplication
-            for txn in plaid_transactions:
-                if txn.transaction_id in ignored_transaction_ids:
-                    skipped_count += 1
-                    continue
-
-                # find matching bank account
-                matching_account = next((account for account in bank_accounts if account.account_id == txn.account_id), None)
-
-                if not matching_account:
-                    skipped_count += 1
-                    continue
-
-                # determine category using personal_finance_category.primary if available
-                if txn.personal_finance_category and txn.personal_finance_category.primary:
-                    category = txn.personal_finance_category.primary.replace('_', ' ')
-                else:
-                    category = 'Uncategorized'
-                
-                # create transaction
-                try:
-                    new_transaction = Transaction(
-                        user=user,
-                        bank_account=matching_account,
-                        name=txn.name.strip(),
-                        amount=str(txn.amount),
-                        date=txn.date,
-                        category=category,
-                        is_received=txn.amount < 0,
-                        transaction_id=txn.transaction_id
-                    )
-                    
-                    # create transaction and log id
-                    new_transactions.append(new_transaction)
-                    existing_transaction_ids.add(txn.transaction_id)
-                    processed_count += 1
-                except Exception as e:
-                    continue
-
-            if not response.has_more:
-                break
-            cursor = response.next_cursor
-
-        # bulk create new transactions
-        if new_transactions:
-            Transaction.objects.bulk_create(new_transactions)
+# queue a background sync instead of syncing during the request
+@csrf_protect
+@require_POST
+@login_required
+def sync_transactions_now(request):
+    if not request.user.has_linked_bank:
+        return JsonResponse({"error": "Access token not found for user."}, status=400)
+
+    # the scheduled sync still runs if the broker cannot be reached
+    if not enqueue(sync_user_transactions, (request.user.id,)):
+        return JsonResponse({
+            "queued": False,
+            "message": "Sync could not be queued, it will run with the next scheduled sync.",
+            "last_synced_at": last_synced_at(request.user),
+        }, status=202)
+    return JsonResponse({"queued": True, "last_synced_at": last_synced_at(request.user)}, status=202)
 
-    except Exception as e:
-        error_message = f"Error in sync_transactions: {str(e)}"
-        return {"error": error_message}
-    
 # delete transaction
 @csrf_protect
 @require_POST
@@ -311,11 +327,14 @@ def delete_transaction(request, transaction_id):
         txn = get_object_or_404(Transaction, id=transaction_id, user=request.user)
 
         # save deleted transaction for tracking
-        DeletedTransaction.objects.get_or_create(
-            user=request.user,
-            transaction_id=txn.transaction_id
-        )
-        txn.delete()
+        with db_transaction.atomic():
+            DeletedTransaction.objects.get_or_create(
+                user=request.user,
+                transaction_id=txn.transaction_id
+            )
+            adjust_category_counts(request.user.id, {txn.category: -1})
+            forget_transactions(Transaction.objects.filter(id=txn.id))
+            txn.delete()
 
         return JsonResponse({'success': True})
     except Exception as e:
@@ -332,6 +351,7 @@ def edit_transaction(request, transaction_id):
     transaction = get_object_or_404(Transaction, id=transaction_id, user=request.user)
     try:
         data = json.loads(request.body)
+        old_category = transaction.category
         
         # updated fields
         for field in ['name', 'amount', 'date', 'is_received', 'category']:
@@ -343,7 +363,14 @@ def edit_transaction(request, transaction_id):
                 else:
                     setattr(transaction, field, data[field])
 
-        transaction.save()
+        with db_transaction.atomic():
+            if transaction.category != old_category:
+                transaction.category_ref_id = resolve_categories(request.user.id, [transaction.category]).get(transaction.category)
+            forget_transactions(Transaction.objects.filter(id=transaction.id))
+            transaction.save()
+            record_transactions(Transaction.objects.filter(id=transaction.id))
+            if transaction.category != old_category:
+                adjust_category_counts(request.user.id, {old_category: -1, transaction.category: 1})
 
         return JsonResponse({
             "success": True,